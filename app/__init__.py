@@ -12,8 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-# from .agent import seo_agent
-from .agent import root_agent
+from typing import Any
 
-# __all__ = ["seo_agent"]
 __all__ = ["root_agent"]
+
+
+def __getattr__(name: str) -> Any:
+    # The agent graph pulls in ADK, genai and SerpAPI: build it on first access
+    # rather than on `import app`.
+    if name == "root_agent":
+        from .agent import root_agent
+
+        return root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
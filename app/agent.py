@@ -1,18 +1,35 @@
-from google.adk import Agent
-from google.adk.tools import google_search
 from dotenv import load_dotenv
 
 from .sub_agents.search_agent.agent import search_agent
 from .sub_agents.company_info_agent.agent import company_info_agent
 from .sub_agents.gso_analyser_agent.agent import gso_analyzer
 from .sub_agents.gso_improver.agent import gso_improver
-import os
-from google.adk.agents import SequentialAgent
+from .utils.scheduler import Stage, StageSchedulerAgent
 
 
 load_dotenv()
 
 
-root_agent = SequentialAgent(
-    name="seo_agent", sub_agents=[search_agent, company_info_agent]
+# Each stage starts as soon as the state keys it reads are available:
+# gso_analyzer only needs top_10_results and runs alongside the company pipeline.
+root_agent = StageSchedulerAgent(
+    name="seo_agent",
+    stages=[
+        Stage(agent=search_agent, outputs=["top_10_results", "other_results"]),
+        Stage(
+            agent=gso_analyzer,
+            inputs=["top_10_results"],
+            outputs=["summary_best_brands_content"],
+        ),
+        Stage(
+            agent=company_info_agent,
+            inputs=["other_results"],
+            outputs=["product_pages", "companies_filtered"],
+        ),
+        Stage(
+            agent=gso_improver,
+            inputs=["companies_filtered", "summary_best_brands_content"],
+            outputs=["recommendations"],
+        ),
+    ],
 )
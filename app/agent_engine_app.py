@@ -18,37 +18,122 @@ import datetime
 import json
 import logging
 import os
+import uuid
+from collections.abc import Iterator
 from typing import Any
 
 import google.auth
 import vertexai
 from google.adk.artifacts import GcsArtifactService
 from google.cloud import logging as google_cloud_logging
-from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider, export
+from opentelemetry import metrics, trace
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+from opentelemetry.sdk.trace import TracerProvider
 from vertexai import agent_engines
 from vertexai.preview.reasoning_engines import AdkApp
 
-from app.agent import root_agent
 from app.utils.gcs import create_bucket_if_not_exists
-from app.utils.tracing import CloudTraceLoggingSpanExporter
+from app.utils.pipeline_cache import (
+    STALE,
+    PipelineResultCache,
+    collect_outputs,
+    pipeline_locale,
+)
+from app.utils.tracing import (
+    CloudLoggingMetricExporter,
+    CloudTraceLoggingSpanExporter,
+    FlushingBatchSpanProcessor,
+)
 from app.utils.typing import Feedback
 
 
 class AgentEngineApp(AdkApp):
     def set_up(self) -> None:
-        """Set up logging and tracing for the agent engine app."""
+        """Set up logging, tracing, metrics and the pipeline result cache."""
         super().set_up()
+        self.pipeline_cache = PipelineResultCache.from_env()
         logging_client = google_cloud_logging.Client()
         self.logger = logging_client.logger(__name__)
         provider = TracerProvider()
-        processor = export.BatchSpanProcessor(
-            CloudTraceLoggingSpanExporter(
-                project_id=os.environ.get("GOOGLE_CLOUD_PROJECT")
-            )
+        span_exporter = CloudTraceLoggingSpanExporter(
+            project_id=os.environ.get("GOOGLE_CLOUD_PROJECT")
         )
+        processor = FlushingBatchSpanProcessor(span_exporter)
         provider.add_span_processor(processor)
         trace.set_tracer_provider(provider)
+        # Call metrics (see app.utils.telemetry) go to the same Cloud Logging log
+        reader = PeriodicExportingMetricReader(
+            CloudLoggingMetricExporter(span_exporter.logger),
+            export_interval_millis=int(
+                os.getenv("METRICS_EXPORT_INTERVAL_MS", "60000")
+            ),
+        )
+        metrics.set_meter_provider(MeterProvider(metric_readers=[reader]))
+
+    def stream_query(
+        self,
+        *,
+        message: str | dict[str, Any],
+        user_id: str,
+        session_id: str | None = None,
+        **kwargs: Any,
+    ) -> Iterator[dict[str, Any]]:
+        """Stream the response to a message, serving repeated queries from the
+        pipeline result cache.
+
+        Only plain-text queries in a new session use the cache. A cached run is
+        returned as a single event carrying its outputs in its state delta, and
+        `custom_metadata["pipeline_cache"]` set to "fresh" or "stale". A stale
+        run is recomputed in the background for the next caller.
+        """
+        if not self._tmpl_attrs.get("runner"):
+            self.set_up()
+        cache = getattr(self, "pipeline_cache", None)
+        if cache is None or session_id or kwargs or not isinstance(message, str):
+            yield from super().stream_query(
+                message=message, user_id=user_id, session_id=session_id, **kwargs
+            )
+            return
+
+        locale = pipeline_locale()
+        outputs, freshness = cache.get(message, locale)
+        if outputs is not None:
+            if freshness == STALE:
+                cache.refresh_in_background(
+                    message, locale, lambda: self._run_pipeline(message, user_id)
+                )
+            yield self._cached_event(outputs, freshness)
+            return
+
+        outputs = {}
+        for event in super().stream_query(message=message, user_id=user_id):
+            collect_outputs(event, outputs)
+            yield event
+        cache.set(message, locale, outputs)
+
+    def _run_pipeline(self, message: str, user_id: str) -> dict[str, Any]:
+        """Run the agent on `message` in a new session and return its outputs."""
+        outputs: dict[str, Any] = {}
+        for event in super().stream_query(message=message, user_id=user_id):
+            collect_outputs(event, outputs)
+        return outputs
+
+    def _cached_event(self, outputs: dict[str, Any], freshness: str) -> dict[str, Any]:
+        from google.adk.events import Event, EventActions
+        from google.genai import types
+        from vertexai.agent_engines import _utils
+
+        event = Event(
+            author=self._tmpl_attrs["agent"].name,
+            invocation_id=f"e-{uuid.uuid4()}",
+            actions=EventActions(state_delta=outputs),
+            custom_metadata={"pipeline_cache": freshness},
+            content=types.Content(
+                role="model", parts=[types.Part(text=json.dumps(outputs))]
+            ),
+        )
+        return _utils.dump_event_for_json(event)
 
     def register_feedback(self, feedback: dict[str, Any]) -> None:
         """Collect and log feedback."""
@@ -89,6 +174,7 @@ def deploy_agent_engine_app(
     service_account: str | None = None,
 ) -> agent_engines.AgentEngine:
     """Deploy the agent engine app to Vertex AI."""
+    from app.agent import root_agent
 
     staging_bucket_uri = f"gs://{project}-agent-engine"
     artifacts_bucket_name = f"{project}-seo-agent-logs-data"
@@ -1,16 +1,23 @@
 
+import asyncio
+import logging
 import os
-import requests
 import json
-from google.adk.tools import google_search, ToolContext
-from google.genai.types import GenerateContentConfig, UrlContext
-from google.adk.tools.agent_tool import AgentTool
-from google.adk.agents import LlmAgent
-from google import genai
-from bs4 import BeautifulSoup
-from google.adk import Agent
+from urllib.parse import urlsplit
+from google.adk.tools import ToolContext
+from google.genai.types import GenerateContentConfig
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
+
+from app.utils.cache import PersistentCache
+from app.utils.concurrency import gather_bounded
+from app.utils.domains import hostname, registrable_domain
+from app.utils.fetcher import get_fetcher
+from app.utils.genai_clients import agenerate_content
+from app.utils.single_flight import SingleFlight
+from app.utils.streaming import emit_partial_result
+from app.utils.tool_runner import build_stage_agent
+from . import prefilter
 load_dotenv()
 
 class CompanyInfo(BaseModel):
@@ -21,12 +28,10 @@ class CompanyInfo(BaseModel):
 
 class IsProductPage(BaseModel):
     """Whether the page is a product page or not."""
+    url: str = Field(description="The URL being classified, copied exactly as given.")
     is_product_page: bool = Field(description="True if the page is a company product page or homepage, False otherwise.")
 
-# Initialize the generative model once and reuse it.
-# This is more efficient than creating a new model for each function call.
-client = genai.Client()
-model = os.getenv("MODEL", "gemini-2.5-flash")
+STAGE = "company_info_agent"
 
 def fetch_page_content(url: str) -> str:
     """Fetches and extracts text content from a web page.
@@ -36,96 +41,293 @@ def fetch_page_content(url: str) -> str:
     Returns:
         Extracted text content from the page, truncated to 3000 characters.
     """
-    try:
-        resp = requests.get(url, timeout=10, headers={"User-Agent": "Mozilla/5.0 (compatible; SEOAgent/1.0)"})
-        if resp.status_code >= 400 or not resp.text:
-            return ""
-    except Exception:
-        return ""
+    # Truncate to keep token usage low
+    return get_fetcher().fetch_text(url, max_chars=3000)
 
-    try:
-        soup = BeautifulSoup(resp.text, "html.parser")
-        # Remove non-content elements
-        for tag in soup(["script", "style", "noscript"]):
-            tag.decompose()
-        text = soup.get_text(separator=" ", strip=True)
-        # Truncate to keep token usage low
-        return text[:3000]
-    except Exception:
-        return ""
-
-def filter_product_pages(tool_context: ToolContext) -> str:
-    """Fetches content for pages in 'other_results', uses Gemini to analyze if they are
-    product pages, and returns a JSON string of the pages that are.
-    """
-    tools = [
-      {"url_context": {}},
-    ]
-    product_pages = []
-    instruction = """You are a specialist in identifying company product pages and official company websites.
+async def afetch_page_content(url: str) -> str:
+    """Async variant of fetch_page_content, sharing the same connection pool."""
+    return await get_fetcher().afetch_text(url, max_chars=3000)
+
+PRODUCT_PAGE_INSTRUCTION = """You are a specialist in identifying company product pages and official company websites.
     Analyze the provided URL and page content to determine if it represents a company product page
     (e.g., shows products, describes company offerings) or an official company homepage.
     Consider factors like: product listings, company information, service descriptions,
     contact information, about pages, and overall website structure. STRICT Answer ONLY with 'yes' or 'no'"""
 
-    results = tool_context.state.get("other_results", [])
-
-    for result_page in results:
-        link = result_page.get("link")
-        if not link:
-            continue
-        # For each fetched content, call Gemini and analyze
-        prompt = f"{instruction}\n\nURL: {link}"
-        response = client.models.generate_content(
-            model=model,
-            contents=prompt,
-            config=GenerateContentConfig(tools=tools),
+BATCH_PRODUCT_PAGE_INSTRUCTION = """You are a specialist in identifying company product pages and official company websites.
+    For each search result below, use its URL, title and snippet to determine if it represents a company product page
+    (e.g., shows products, describes company offerings) or an official company homepage.
+    Consider factors like: product listings, company information, service descriptions,
+    contact information, about pages, and overall website structure.
+    Return exactly one entry per result, with the URL copied exactly as given."""
+
+# Maximum number of classification calls in flight at once
+PRODUCT_PAGE_MAX_CONCURRENCY = int(os.getenv("PRODUCT_PAGE_MAX_CONCURRENCY", "10"))
+# Fetch undecided pages to look for commerce signals before calling the model
+PREFILTER_FETCH_PAGES = os.getenv("PREFILTER_FETCH_PAGES", "true").lower() == "true"
+PAGE_FETCH_MAX_CONCURRENCY = int(os.getenv("PAGE_FETCH_MAX_CONCURRENCY", "10"))
+# "batch" packs PRODUCT_PAGE_BATCH_SIZE results per call, "per_url" makes one call per URL
+PRODUCT_PAGE_CLASSIFIER_MODE = os.getenv("PRODUCT_PAGE_CLASSIFIER_MODE", "batch")
+PRODUCT_PAGE_BATCH_SIZE = int(os.getenv("PRODUCT_PAGE_BATCH_SIZE", "15"))
+# Concurrent runs classifying the same URL share one model call
+classify_flight = SingleFlight("classify_product_page")
+
+async def classify_product_page(link: str) -> bool:
+    """Asks Gemini whether a single URL is a company product page or homepage.
+
+    Concurrent calls for the same URL share a single model call.
+    """
+    return await classify_flight.ado(link, _classify_product_page, link)
+
+async def _classify_product_page(link: str) -> bool:
+    tools = [
+      {"url_context": {}},
+    ]
+    prompt = f"{PRODUCT_PAGE_INSTRUCTION}\n\nURL: {link}"
+    response = await agenerate_content(
+        STAGE,
+        contents=prompt,
+        config=GenerateContentConfig(tools=tools),
+    )
+    logging.debug(f"Product page verdict for {link}: {response.text}")
+    return bool(response.text and "yes" in response.text.lower())
+
+def _verdict_key(url: str) -> tuple[str, str, str]:
+    # The model may echo a URL with another case, "www." or trailing slash
+    parts = urlsplit(url.strip())
+    return hostname(url.strip()), parts.path.rstrip("/"), parts.query
+
+async def classify_product_pages_batch(result_pages: list[dict]) -> list[bool]:
+    """Classifies several SERP results in a single Gemini call.
+
+    The results' URLs, titles and snippets are sent together and the answer is
+    structured as a list of IsProductPage keyed by URL. URLs missing from the
+    answer, or the whole batch if the answer is malformed, are classified on
+    their own with classify_product_page, concurrently.
+    """
+    entries = "\n".join(
+        f"- URL: {page['link']}\n  Title: {page.get('title') or ''}\n  Snippet: {page.get('snippet') or ''}"
+        for page in result_pages
+    )
+    response = await agenerate_content(
+        STAGE,
+        contents=f"{BATCH_PRODUCT_PAGE_INSTRUCTION}\n\n{entries}",
+        config=GenerateContentConfig(response_mime_type="application/json", response_schema=list[IsProductPage]),
+    )
+    logging.debug(f"Product page batch verdicts: {response.text}")
+    verdicts = {}
+    try:
+        for item in json.loads(response.text or "[]"):
+            verdict = IsProductPage.model_validate(item)
+            verdicts[_verdict_key(verdict.url)] = verdict.is_product_page
+    except (TypeError, ValueError, ValidationError) as e:
+        logging.warning(f"Malformed product page batch answer, classifying per URL: {e}")
+        verdicts = {}
+
+    results = [verdicts.get(_verdict_key(page["link"])) for page in result_pages]
+    missing = [i for i, verdict in enumerate(results) if verdict is None]
+    missing_verdicts = await gather_bounded(
+        lambda i: classify_product_page(result_pages[i]["link"]),
+        missing,
+        limit=PRODUCT_PAGE_MAX_CONCURRENCY,
+    )
+    for i, verdict in zip(missing, missing_verdicts, strict=True):
+        results[i] = verdict
+    return results
+
+async def classify_with_model(result_pages: list[dict]) -> list[bool]:
+    """Classifies SERP results with Gemini, in input order.
+
+    URLs are classified concurrently, with at most PRODUCT_PAGE_MAX_CONCURRENCY calls
+    in flight. In "batch" mode each call classifies PRODUCT_PAGE_BATCH_SIZE results at once.
+    """
+    if PRODUCT_PAGE_CLASSIFIER_MODE == "batch":
+        batch_size = max(1, PRODUCT_PAGE_BATCH_SIZE)
+        batches = [result_pages[i:i + batch_size] for i in range(0, len(result_pages), batch_size)]
+        batch_verdicts = await gather_bounded(
+            classify_product_pages_batch, batches, limit=PRODUCT_PAGE_MAX_CONCURRENCY
         )
-        print(response.text)
-        if response.text and "yes" in response.text.lower():
-            product_pages.append(result_page)
+        return [verdict for batch in batch_verdicts for verdict in batch]
+    return await gather_bounded(
+        lambda result_page: classify_product_page(result_page["link"]),
+        result_pages,
+        limit=PRODUCT_PAGE_MAX_CONCURRENCY,
+    )
+
+async def filter_product_pages(tool_context: ToolContext) -> str:
+    """Fetches content for pages in 'other_results', uses Gemini to analyze if they are
+    product pages, and returns a JSON string of the pages that are.
+
+    Before any model call, URLs are pre-classified locally: domain/URL rules, then the
+    per-domain verdict cache, then commerce signals in the fetched page text. Only one
+    URL per remaining domain is sent to the model. 'product_pages' keeps the SERP order
+    of 'other_results', and 'product_pages_prefilter' reports how many URLs were
+    short-circuited.
+    """
+    results = [r for r in tool_context.state.get("other_results", []) if r.get("link")]
+    verdicts = [None] * len(results)
+    stats = {"total": len(results), "rules": 0, "domain_cache": 0, "page_signals": 0}
+
+    for i, result_page in enumerate(results):
+        verdict = prefilter.rule_verdict(result_page["link"])
+        if verdict is not None:
+            stats["rules"] += 1
+        else:
+            verdict = await asyncio.to_thread(prefilter.cached_domain_verdict, result_page["link"])
+            if verdict is not None:
+                stats["domain_cache"] += 1
+        verdicts[i] = verdict
+
+    if PREFILTER_FETCH_PAGES:
+        undecided = [i for i, verdict in enumerate(verdicts) if verdict is None]
+        texts = await gather_bounded(
+            lambda i: afetch_page_content(results[i]["link"]),
+            undecided,
+            limit=PAGE_FETCH_MAX_CONCURRENCY,
+        )
+        for i, text in zip(undecided, texts, strict=True):
+            verdict = prefilter.page_signal_verdict(text)
+            if verdict is not None:
+                stats["page_signals"] += 1
+                await asyncio.to_thread(prefilter.record_domain_verdict, results[i]["link"], verdict)
+                verdicts[i] = verdict
+
+    # One model call per domain still undecided, shared by all its URLs
+    representatives = {}
+    for i, verdict in enumerate(verdicts):
+        if verdict is None:
+            representatives.setdefault(registrable_domain(results[i]["link"]), i)
+    model_verdicts = await classify_with_model([results[i] for i in representatives.values()])
+    domain_verdicts = dict(zip(representatives, model_verdicts, strict=True))
+    for domain, verdict in domain_verdicts.items():
+        await asyncio.to_thread(prefilter.record_domain_verdict, results[representatives[domain]]["link"], verdict)
+    for i, verdict in enumerate(verdicts):
+        if verdict is None:
+            verdicts[i] = domain_verdicts[registrable_domain(results[i]["link"])]
+
+    stats["sent_to_model"] = len(representatives)
+    stats["short_circuited"] = stats["total"] - stats["sent_to_model"]
+    logging.info(f"Product page pre-filter: {stats}")
+
+    product_pages = [page for page, is_product in zip(results, verdicts, strict=True) if is_product]
     tool_context.state["product_pages"] = product_pages
-    return 'Product pages detection done'
+    tool_context.state["product_pages_prefilter"] = stats
+    return (
+        f"Product pages detection done ({stats['short_circuited']}/{stats['total']} "
+        "URLs resolved without the model)"
+    )
+
+COMPANY_INFO_EXTRACTION_INSTRUCTION = """From the URL, use the google_search and url_context tools to get the following information about the company: "company_name", "num_employees" and "email".
+    If a piece of information is not found, use an empty string "" as the value.
+    """
+
+# Maximum number of company extractions in flight at once
+COMPANY_INFO_MAX_CONCURRENCY = int(os.getenv("COMPANY_INFO_MAX_CONCURRENCY", "5"))
+
+# CompanyInfo records per registrable domain, shared across runs
+company_info_cache = PersistentCache(
+    namespace="company_info",
+    ttl_seconds=float(os.getenv("COMPANY_INFO_CACHE_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("COMPANY_INFO_CACHE_MAX_ENTRIES", "20000")),
+)
+# Concurrent runs looking up the same company share one extraction
+company_info_flight = SingleFlight("company_info")
+
+async def extract_company_info(link: str) -> dict:
+    """Searches for the company behind a URL and structures it as a CompanyInfo dict.
 
-def get_infos_companies(tool_context: ToolContext) -> dict:
+    Concurrent calls for URLs of the same registrable domain share one extraction.
+    """
+    return await company_info_flight.ado(registrable_domain(link), _extract_company_info, link)
+
+async def _extract_company_info(link: str) -> dict:
     tools = [
       {"url_context": {}},
       {"google_search": {}},
     ]
-    companies_info = []
-    extraction_instruction = """From the URL, use the google_search and url_context tools to get the following information about the company: "company_name", "num_employees" and "email".
-    If a piece of information is not found, use an empty string "" as the value.
+    prompt = f" URL: {link} {COMPANY_INFO_EXTRACTION_INSTRUCTION}"
+    response = await agenerate_content(
+        STAGE,
+        contents=prompt,
+        config=GenerateContentConfig(tools=tools)
+    )
+    logging.debug(f"Company info found for {link}: {response.text}")
+    response = await agenerate_content(
+        STAGE,
+        contents=f"Structure the output : {response.text}",
+        config=GenerateContentConfig(response_mime_type="application/json", response_schema=CompanyInfo)
+    )
+    logging.debug(f"Company info structured for {link}: {response.text}")
+    return json.loads(response.text)
+
+async def get_infos_companies(tool_context: ToolContext) -> str:
+    """Extracts CompanyInfo for every page in 'product_pages' into 'companies_filtered'.
+
+    Extraction runs once per registrable domain: records are served from
+    company_info_cache while fresh, and the missing domains are extracted
+    concurrently, with at most COMPANY_INFO_MAX_CONCURRENCY in flight. Each record
+    is cached and published as a partial result as soon as it is ready. Pages of a
+    domain whose extraction fails are left out.
     """
-    product_pages = tool_context.state.get("product_pages", [])
+    product_pages = [page for page in tool_context.state.get("product_pages", []) if page.get("link")]
     if not product_pages:
+        tool_context.state["companies_filtered"] = []
         return "[]"
+
+    domain_links = {}
     for page in product_pages:
-        link = page.get("link")
-        if not link:
-            continue
-        prompt = f" URL: {link} {extraction_instruction}"
-        response = client.models.generate_content(
-            model=model,
-            contents=prompt,
-            config=GenerateContentConfig(tools=tools)
-        )
-        print(response.text)
-        print('*****************')
-        response = client.models.generate_content(
-            model=model,
-            contents=f"Structure the output : {response.text}",
-            config=GenerateContentConfig(response_mime_type="application/json", response_schema=CompanyInfo)
-        )
-        print(response.text)
-        info = json.loads(response.text)
-        info['url'] = link
-        companies_info.append(info)
+        domain_links.setdefault(registrable_domain(page["link"]), page["link"])
+
+    def publish(domain: str, info: dict) -> None:
+        # Stream each company as soon as it is known, before the aggregated state
+        for page in product_pages:
+            if registrable_domain(page["link"]) == domain:
+                emit_partial_result("company_info", {**info, "url": page["link"]})
+
+    domain_infos = {}
+    for domain in domain_links:
+        cached_info = await company_info_cache.aget(domain)
+        if cached_info is not None:
+            domain_infos[domain] = cached_info
+            publish(domain, cached_info)
+    missing_domains = [domain for domain in domain_links if domain not in domain_infos]
+
+    async def extract(domain: str) -> dict | None:
+        # One failed extraction leaves its domain out rather than failing the stage
+        try:
+            info = await extract_company_info(domain_links[domain])
+        except Exception as e:
+            logging.warning(f"Company info extraction failed for {domain}: {e}")
+            return None
+        # Cached as soon as extracted, so finished domains are kept whatever happens next
+        await company_info_cache.aset(domain, info)
+        return info
+
+    def on_extracted(index: int, info: dict | None) -> None:
+        if info is None:
+            return
+        domain = missing_domains[index]
+        domain_infos[domain] = info
+        publish(domain, info)
+
+    await gather_bounded(
+        extract,
+        missing_domains,
+        limit=COMPANY_INFO_MAX_CONCURRENCY,
+        on_result=on_extracted,
+    )
+    logging.info(f"Company info cache stats: {company_info_cache.stats()}")
+
+    companies_info = [
+        {**domain_infos[registrable_domain(page["link"])], "url": page["link"]}
+        for page in product_pages
+        if registrable_domain(page["link"]) in domain_infos
+    ]
     tool_context.state["companies_filtered"] = companies_info
     return json.dumps(companies_info)
 
-company_info_agent = LlmAgent(
-    name="company_info_agent",
-    model=os.getenv("MODEL", "gemini-2.5-flash"),
+company_info_agent = build_stage_agent(
+    name=STAGE,
     instruction="""You are a company info agent. Your goal is to find information about companies from a list of URLs.
     The initial list of URLs is in the 'other_results' state variable.
     1. First, call the `filter_product_pages` tool to identify which of these are product/company pages. This will populate the 'product_pages' state.
@@ -0,0 +1,86 @@
+import os
+
+from app.utils.cache import PersistentCache
+from app.utils.domains import registrable_domain
+
+# fmt: off
+# Sites that never host a company's own product pages or homepage
+NON_COMPANY_DOMAINS = frozenset({
+    # encyclopedias, video and social platforms, forums
+    "wikipedia.org", "wikimedia.org", "wikihow.com", "fandom.com",
+    "youtube.com", "youtu.be", "dailymotion.com", "vimeo.com", "tiktok.com",
+    "facebook.com", "instagram.com", "twitter.com", "x.com", "linkedin.com",
+    "pinterest.com", "pinterest.fr", "reddit.com", "quora.com", "medium.com",
+    "stackexchange.com", "stackoverflow.com", "doctissimo.fr",
+    # marketplaces and review aggregators
+    "cdiscount.com", "fnac.com", "darty.com", "leboncoin.fr", "aliexpress.com",
+    "alibaba.com", "etsy.com", "walmart.com", "manomano.fr", "vinted.fr",
+    "trustpilot.com", "avis-verifies.com", "idealo.fr", "kelkoo.fr",
+    # news and magazines
+    "lemonde.fr", "lefigaro.fr", "liberation.fr", "leparisien.fr", "20minutes.fr",
+    "francetvinfo.fr", "ouest-france.fr", "lesechos.fr", "latribune.fr",
+    "bfmtv.com", "capital.fr", "challenges.fr", "marieclaire.fr", "elle.fr",
+    "bbc.com", "bbc.co.uk", "cnn.com", "nytimes.com", "theguardian.com",
+    "forbes.com", "reuters.com", "bloomberg.com", "businessinsider.com",
+})
+
+# Brands running the same kind of site on many country TLDs (amazon.fr, ebay.de, ...)
+NON_COMPANY_SITE_NAMES = frozenset({
+    "amazon", "ebay", "rakuten", "tripadvisor", "yelp", "wikipedia", "google",
+})
+
+NON_PAGE_EXTENSIONS = (".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".zip")
+
+# Phrases that only a commercial product page tends to contain
+COMMERCE_MARKERS = (
+    "add to cart", "add to basket", "add to bag", "buy now", "shop now",
+    "ajouter au panier", "acheter maintenant", "en stock",
+    "in stock", "free shipping", "livraison gratuite", "request a quote",
+    "demander un devis", "our products", "nos produits",
+)
+# fmt: on
+MIN_COMMERCE_MARKERS = 2
+
+# Per registrable domain verdicts, shared across runs
+domain_verdict_cache = PersistentCache(
+    namespace="product_page_domains",
+    ttl_seconds=float(os.getenv("DOMAIN_VERDICT_CACHE_TTL", str(30 * 24 * 3600))),
+    max_entries=int(os.getenv("DOMAIN_VERDICT_CACHE_MAX_ENTRIES", "50000")),
+)
+
+
+def rule_verdict(url: str) -> bool | None:
+    """Classifies a URL from its domain and path alone.
+
+    Returns False for URLs that cannot be a company page, None when undecided.
+    """
+    domain = registrable_domain(url)
+    if not domain:
+        return False
+    if domain in NON_COMPANY_DOMAINS or domain.split(".")[0] in NON_COMPANY_SITE_NAMES:
+        return False
+    if url.lower().split("?")[0].endswith(NON_PAGE_EXTENSIONS):
+        return False
+    return None
+
+
+def page_signal_verdict(text: str) -> bool | None:
+    """Classifies a page from cheap signals in its extracted text.
+
+    Returns True when the text carries enough commerce markers, None when undecided.
+    """
+    lowered = text.lower()
+    markers = sum(1 for marker in COMMERCE_MARKERS if marker in lowered)
+    if markers >= MIN_COMMERCE_MARKERS:
+        return True
+    return None
+
+
+def cached_domain_verdict(url: str) -> bool | None:
+    """Returns the verdict previously recorded for the URL's domain, if any."""
+    return domain_verdict_cache.get(registrable_domain(url))
+
+
+def record_domain_verdict(url: str, is_product_page: bool) -> None:
+    """Records the verdict for the URL's domain so it is not classified again."""
+    domain_verdict_cache.set(registrable_domain(url), is_product_page)
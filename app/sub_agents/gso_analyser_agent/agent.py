@@ -1,26 +1,93 @@
 
+import hashlib
+import logging
 import os
-import requests
 import json
-from google.adk.tools import google_search, ToolContext
-from google.genai.types import GenerateContentConfig, UrlContext
-from google.adk.tools.agent_tool import AgentTool
-from google.adk.agents import LlmAgent
-from google import genai
-from bs4 import BeautifulSoup
-from google.adk import Agent
+from google.adk.tools import ToolContext
+from google.genai.types import GenerateContentConfig
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
+
+from app.utils.cache import PersistentCache, make_key
+from app.utils.concurrency import gather_bounded
+from app.utils.fetcher import get_fetcher
+from app.utils.genai_clients import agenerate_content, stage_model
+from app.utils.single_flight import SingleFlight
+from app.utils.tool_runner import build_stage_agent
 load_dotenv()
 
-# Initialize the generative model once and reuse it.
-client = genai.Client()
-model = os.getenv("MODEL", "gemini-2.5-flash")
+STAGE = "gso_analyzer"
+
+GSO_ANALYSIS_INSTRUCTION = """You are a GSO Analyzer (Global Search Optimization). Your goal is to analyze the provided pages from the given URLs.
+    Generate a detailed markdown report to explain why these brands are on top of Google search results.
+    Consider SEO factors like keywords, content quality, page structure, user experience signals, and brand authority.
+    Structure your report with a section for each URL, and a final summary of common themes.
+    """
+
+GSO_URL_ANALYSIS_INSTRUCTION = """You are a GSO Analyzer (Global Search Optimization). Your goal is to analyze the page at the given URL.
+    Generate a detailed markdown section to explain why this brand is on top of Google search results.
+    Consider SEO factors like keywords, content quality, page structure, user experience signals, and brand authority.
+    Start the section with a level 2 heading containing the URL.
+    """
+
+GSO_SUMMARY_INSTRUCTION = """You are a GSO Analyzer (Global Search Optimization). Below are analyses of the pages ranking on top of Google search results.
+    Write a final markdown section titled "Summary of common themes" explaining what these brands have in common and why they rank on top.
+    Do not repeat the per-site analyses.
+    """
+
+# "map_reduce" analyzes each URL in its own call, then summarizes; "single" sends all URLs in one call
+GSO_ANALYSIS_MODE = os.getenv("GSO_ANALYSIS_MODE", "map_reduce")
+GSO_ANALYSIS_MAX_CONCURRENCY = int(os.getenv("GSO_ANALYSIS_MAX_CONCURRENCY", "10"))
+
+# Per-URL analyses keyed by URL and page content hash, shared across runs
+gso_url_analysis_cache = PersistentCache(
+    namespace="gso_url_analysis",
+    ttl_seconds=float(os.getenv("GSO_URL_ANALYSIS_CACHE_TTL", str(3 * 24 * 3600))),
+    max_entries=int(os.getenv("GSO_URL_ANALYSIS_CACHE_MAX_ENTRIES", "5000")),
+)
+# Concurrent runs analyzing the same URL share one fetch and model call
+gso_url_analysis_flight = SingleFlight("gso_url_analysis")
+
+async def analyze_url(url: str) -> str:
+    """Analyzes a single top-ranking URL, reusing the cached analysis while its content is unchanged.
 
-def generate_gso_analysis(tool_context: ToolContext) -> str:
+    Concurrent calls for the same URL share a single analysis.
+    """
+    return await gso_url_analysis_flight.ado(url, _analyze_url, url)
+
+async def _analyze_url(url: str) -> str:
+    page_text = await get_fetcher().afetch_text(url)
+    # An empty text means the page could not be fetched: its hash says nothing
+    # about the content, so the analysis is not cached
+    cache_key = None
+    if page_text:
+        cache_key = make_key(stage_model(STAGE), url, hashlib.sha256(page_text.encode()).hexdigest())
+        cached_analysis = await gso_url_analysis_cache.aget(cache_key)
+        if cached_analysis is not None:
+            return cached_analysis
+
+    tools = [
+      {"url_context": {}},
+    ]
+    # Grounded, hence not answered from the LLM response cache: analyses are
+    # only cached in gso_url_analysis_cache
+    response = await agenerate_content(
+        STAGE,
+        contents=f"{GSO_URL_ANALYSIS_INSTRUCTION}\n---Analyze this URL:---\n{url}",
+        config=GenerateContentConfig(tools=tools),
+    )
+    analysis = response.text or ""
+    if analysis and cache_key is not None:
+        await gso_url_analysis_cache.aset(cache_key, analysis)
+    return analysis
+
+async def generate_gso_analysis(tool_context: ToolContext) -> str:
     """
     Analyzes the top 10 search results to generate a markdown summary
     explaining their high ranking for Global Search Optimization (GSO).
+
+    In "map_reduce" mode, each URL is analyzed concurrently and cached per URL and
+    content hash, then a single reduce call writes the common themes summary.
     """
     results = tool_context.state.get("top_10_results", [])
     if not results:
@@ -28,20 +95,26 @@ def generate_gso_analysis(tool_context: ToolContext) -> str:
 
     urls_for_context = [result.get("link") for result in results if result.get("link")]
 
-    instruction = """You are a GSO Analyzer (Global Search Optimization). Your goal is to analyze the provided pages from the given URLs.
-    Generate a detailed markdown report to explain why these brands are on top of Google search results.
-    Consider SEO factors like keywords, content quality, page structure, user experience signals, and brand authority.
-    Structure your report with a section for each URL, and a final summary of common themes.
-    """
+    if GSO_ANALYSIS_MODE == "map_reduce":
+        url_analyses = await gather_bounded(
+            analyze_url, urls_for_context, limit=GSO_ANALYSIS_MAX_CONCURRENCY
+        )
+        sections = "\n\n".join(analysis for analysis in url_analyses if analysis)
+        response = await agenerate_content(
+            STAGE,
+            contents=f"{GSO_SUMMARY_INSTRUCTION}\n---Analyses:---\n{sections}",
+        )
+        logging.info(f"GSO URL analysis cache stats: {gso_url_analysis_cache.stats()}")
+        return f"{sections}\n\n{response.text or ''}"
 
-    prompt = instruction + "\n---Analyze these URLs:---\n" + "\n".join(urls_for_context)
+    prompt = GSO_ANALYSIS_INSTRUCTION + "\n---Analyze these URLs:---\n" + "\n".join(urls_for_context)
 
     tools = [
       {"url_context": {}},
     ]
 
-    response = client.models.generate_content(
-        model=model,
+    response = await agenerate_content(
+        STAGE,
         contents=prompt,
         config=GenerateContentConfig(tools=tools),
     )
@@ -49,9 +122,8 @@ def generate_gso_analysis(tool_context: ToolContext) -> str:
     summary = response.text
     return summary
 
-gso_analyzer = LlmAgent(
-    name="gso_analyzer",
-    model=os.getenv("MODEL", "gemini-2.5-flash"),
+gso_analyzer = build_stage_agent(
+    name=STAGE,
     instruction=(
         "You are a GSO Analyzer (Global Search Optimization). Your goal is to analyze the pages in the 'top_10_results' state variable.\n"
         "Call the `generate_gso_analysis` tool to generate a detailed markdown report explaining why these brands are top Google retrieved brands.\n"
@@ -1,32 +1,41 @@
 
 import os
-import requests
 import json
-from google.adk.tools import google_search, ToolContext
-from google.genai.types import GenerateContentConfig, UrlContext
-from google.adk.tools.agent_tool import AgentTool
-from google.adk.agents import LlmAgent
-from google import genai
-from bs4 import BeautifulSoup
-from google.adk import Agent
+from google.adk.tools import ToolContext
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
+
+from app.utils.concurrency import gather_bounded
+from app.utils.genai_clients import agenerate_content, get_client, stage_model
+from app.utils.prompt_cache import SharedPrefix
+from app.utils.streaming import emit_partial_result
+from app.utils.tool_runner import build_stage_agent
 load_dotenv()
 
-# Initialize the generative model once and reuse it.
-client = genai.Client()
-model = os.getenv("MODEL", "gemini-2.5-flash")
+STAGE = "gso_improver"
+
+# Maximum number of recommendation calls in flight at once
+GSO_RECOMMENDATION_MAX_CONCURRENCY = int(os.getenv("GSO_RECOMMENDATION_MAX_CONCURRENCY", "5"))
+
+async def generate_gso_recommendation(tool_context: ToolContext) -> str:
+    """Generates GSO recommendations for each company in 'companies_filtered'.
 
-def generate_gso_recommendation(tool_context: ToolContext) -> str:
+    The instruction and competitor analysis form a prefix shared by every call: it is
+    built once and cached model-side when possible (see SharedPrefix). Companies are
+    processed concurrently, with at most GSO_RECOMMENDATION_MAX_CONCURRENCY calls in
+    flight, and 'recommendations' keeps the order of 'companies_filtered'. Each
+    recommendation is also published as a partial result as soon as it is ready.
+    """
     companies = tool_context.state.get("companies_filtered", [])
     gso_analysis = tool_context.state.get("summary_best_brands_content", "")
     if not companies:
+        # Written even when empty, so that the run is complete and can be cached
+        tool_context.state["recommendations"] = []
         return "No companies to generate recommendations for."
     if not gso_analysis:
+        tool_context.state["recommendations"] = []
         return "No GSO analysis found to base recommendations on."
 
-    recommendations = []
-
     instruction = """You are a GSO (Global Search Optimization) expert. Your primary goal is to provide actionable recommendations to help a company improve its search engine ranking on a global scale.
 
 You are provided with:
@@ -68,29 +77,36 @@ Now, analyze the following company URL and provide GSO recommendations for it.
       {"url_context": {}},
     ]
 
-    for company in companies:
-        company_url = company.get("url")
-        if not company_url:
-            continue
-
-        prompt = instruction.format(gso_analysis=gso_analysis) + f"\nCompany URL to analyze: {company_url}"
-
-        response = client.models.generate_content(
-            model=model,
-            contents=prompt,
-            config=GenerateContentConfig(tools=tools),
+    companies = [company for company in companies if company.get("url")]
+
+    async def recommend(shared_prefix: SharedPrefix, company: dict) -> dict:
+        suffix = f"\nCompany URL to analyze: {company['url']}"
+        contents, config = shared_prefix.request(suffix)
+        # Not answered from the LLM response cache: the call reads the live
+        # company page, which the request does not capture.
+        response = await agenerate_content(
+            STAGE,
+            contents=contents,
+            config=config,
         )
-
         company_with_recommendation = company.copy()
         company_with_recommendation["gso_recommendation"] = response.text
-        recommendations.append(company_with_recommendation)
+        emit_partial_result("recommendation", company_with_recommendation)
+        return company_with_recommendation
+
+    prefix = instruction.format(gso_analysis=gso_analysis)
+    async with SharedPrefix(get_client(), stage_model(STAGE), prefix, tools=tools) as shared_prefix:
+        recommendations = await gather_bounded(
+            lambda company: recommend(shared_prefix, company),
+            companies,
+            limit=GSO_RECOMMENDATION_MAX_CONCURRENCY,
+        )
 
     tool_context.state["recommendations"] = recommendations
     return json.dumps(recommendations, indent=2)
 
-gso_improver = LlmAgent(
-    name="gso_improver",
-    model=os.getenv("MODEL", "gemini-2.5-flash"),
+gso_improver = build_stage_agent(
+    name=STAGE,
     instruction=(
         "You are a GSO Improver (Global Search Optimization) expert. Your goal is to help companies improve their global search ranking.\n"
         "The state contains 'companies_filtered' (a list of companies to analyze) and 'summary_best_brands_content' (an analysis of top competitors).\n"
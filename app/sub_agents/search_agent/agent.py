@@ -1,13 +1,185 @@
+import contextvars
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from serpapi import GoogleSearch
-from google.adk.agents import LlmAgent
 from google.adk.tools import ToolContext
 
+from app.utils.cache import PersistentCache, make_key, normalize_query
+from app.utils.domains import registrable_domain
+from app.utils.rate_limit import call_with_retries_sync, get_limiter
+from app.utils.single_flight import SingleFlight
+from app.utils.telemetry import traced_call
+from app.utils.tool_runner import build_stage_agent
+
 
 # Charger le .env
 load_dotenv()
 
+# Profondeur de la SERP et parallélisme des appels SerpAPI
+SERP_MAX_RESULTS = int(os.getenv("SERP_MAX_RESULTS", "100"))
+SERP_PAGE_SIZE = int(os.getenv("SERP_PAGE_SIZE", "10"))
+SERP_MAX_CONCURRENCY = int(os.getenv("SERP_MAX_CONCURRENCY", "5"))
+SERP_HL = os.getenv("SERP_HL", "en")
+SERP_GL = os.getenv("SERP_GL", "fr")
+# Appels SerpAPI par seconde, partagés par tout le process (0 : illimité)
+SERPAPI_QPS = float(os.getenv("SERPAPI_QPS", "5"))
+
+# Un seul résultat par domaine enregistrable dans other_results
+SERP_GROUP_BY_DOMAIN = os.getenv("SERP_GROUP_BY_DOMAIN", "true").lower() == "true"
+
+# Cache disque des pages SerpAPI (SERP_CACHE_TTL=0 pour le désactiver)
+serp_cache = PersistentCache(
+    namespace="serp",
+    ttl_seconds=float(os.getenv("SERP_CACHE_TTL", "86400")),
+    max_entries=int(os.getenv("SERP_CACHE_MAX_ENTRIES", "10000")),
+)
+
+
+# Les recherches identiques lancées en même temps partagent un seul appel
+serp_flight = SingleFlight("serp")
+
+
+def _serp_cache_key(query: str, start: int, num: int, hl: str, gl: str) -> str:
+    """Builds the cache key of a SERP page from its normalized request parameters."""
+    return make_key(normalize_query(query), hl.lower(), gl.lower(), start, num)
+
+
+def _search_serpapi(params: dict) -> dict:
+    """Runs one SerpAPI search, raising on any error but an exhausted result set.
+
+    Raising lets the rate limiter retry throttled ("throughput limit") searches.
+    """
+    results = GoogleSearch(params).get_dict()
+    # SerpAPI reports an exhausted result set as an error on the following pages.
+    if "error" in results and not (
+        params["start"] > 0 and "hasn't returned any results" in results["error"]
+    ):
+        raise Exception(f"SerpAPI error: {results['error']}")
+    return results
+
+
+def _fetch_serp_page(query: str, start: int, num: int, api_key: str, hl: str, gl: str) -> list[dict]:
+    """Fetches a single SERP page and returns its organic results that have a link.
+
+    Pages are served from `serp_cache` when a fresh entry exists. Otherwise the
+    search goes through the shared SerpAPI rate limiter (SERPAPI_QPS). Each page
+    request is traced, cache hits included.
+    """
+    with traced_call("serpapi", "search", query=query, start=start, num=num) as span:
+        cache_key = _serp_cache_key(query, start, num, hl, gl)
+        cached_page = serp_cache.get(cache_key)
+        span.set_attribute("cache_hit", cached_page is not None)
+        if cached_page is not None:
+            return cached_page
+
+        results = call_with_retries_sync(
+            get_limiter("serpapi", SERPAPI_QPS),
+            _search_serpapi,
+            {
+                "q": query,
+                "hl": hl,
+                "gl": gl,
+                "start": start,
+                "num": num,
+                "api_key": api_key
+            },
+        )
+        if "error" in results:
+            serp_cache.set(cache_key, [])
+            return []
+
+        # Formatage avec rank (position réelle)
+        page = [
+            {
+                'position': r.get("position"),
+                'title': r.get("title"),
+                'link': r.get("link"),
+                'snippet': r.get("snippet"),
+                'snippet_highlighted_words': r.get("snippet_highlighted_words"),
+            }
+            for r in results.get("organic_results", [])
+            if r.get("link")
+        ]
+        span.set_attribute("serp.results", len(page))
+        serp_cache.set(cache_key, page)
+        return page
+
+
+def fetch_serp_results(
+    query: str,
+    api_key: str,
+    max_results: int = SERP_MAX_RESULTS,
+    page_size: int = SERP_PAGE_SIZE,
+    max_concurrency: int = SERP_MAX_CONCURRENCY,
+    hl: str = SERP_HL,
+    gl: str = SERP_GL,
+) -> list[dict]:
+    """Fetches every SERP page up to `max_results` concurrently.
+
+    Pages are requested with at most `max_concurrency` calls in flight and merged
+    as they arrive, deduplicating results by position and by link. Once a page
+    comes back empty, the deeper pages that have not started yet are cancelled.
+
+    Returns:
+        The merged organic results, sorted by position.
+    """
+    starts = list(range(0, max_results, page_size))
+    merged = []
+    seen_positions = set()
+    seen_links = set()
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(starts))))
+    try:
+        futures = {
+            # Each page runs in the caller's context, so its span joins the run's trace
+            executor.submit(
+                contextvars.copy_context().run,
+                _fetch_serp_page, query, start, page_size, api_key, hl, gl,
+            ): start
+            for start in starts
+        }
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            start = futures[future]
+            page = future.result()
+            if not page:
+                # No more results past this page, stop fetching deeper ones.
+                for pending, pending_start in futures.items():
+                    if pending_start > start:
+                        pending.cancel()
+                continue
+            for r in page:
+                position = r.get("position")
+                if r["link"] in seen_links or (position is not None and position in seen_positions):
+                    continue
+                seen_links.add(r["link"])
+                if position is not None:
+                    seen_positions.add(position)
+                merged.append(r)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return sorted(merged, key=lambda x: (x['position'] is None, x['position'] or 0))
+
+
+def group_by_domain(results: list[dict]) -> list[dict]:
+    """Collapses results to one representative per registrable domain (eTLD+1).
+
+    The best-ranked result of each domain is kept, in the input order, with the
+    links of every result of that domain attached as 'member_urls'.
+    """
+    groups = {}
+    for r in results:
+        domain = registrable_domain(r["link"])
+        if domain not in groups:
+            groups[domain] = {**r, 'domain': domain, 'member_urls': []}
+        groups[domain]['member_urls'].append(r["link"])
+    return list(groups.values())
+
+
 # --- Tool : Recherche Google via SerpAPI ---
 def search_google(query: str, tool_context: ToolContext) -> list[dict]:
     """Performs a Google search using SerpAPI and returns the top 100 organic result URLs.
@@ -26,49 +198,25 @@ def search_google(query: str, tool_context: ToolContext) -> list[dict]:
     api_key = os.getenv("SERPAPI_KEY")
     if not api_key:
         raise ValueError("SERPAPI_KEY environment variable not set!")
-    top_100_results = []
-    for i in range(0,20,10):
-        search = GoogleSearch({
-            "q": query,
-            "hl": "en",
-            "gl": "fr",
-            "start": i,
-            "num": 10,
-            "api_key": api_key
-        })
-        results = search.get_dict()
-        if "error" in results:
-            raise Exception(f"SerpAPI error: {results['error']}")
-
-        organic_results = results.get("organic_results", [])
-        if not organic_results:
-            break  # No more results, stop fetching.
-        # Formatage avec rank (position réelle)
-        
-        for r in organic_results:
-            if r.get("link"):
-                result_infos = {
-                    'position': r.get("position"),
-                    'title': r.get("title"),
-                    'link': r.get("link"),
-                    'snippet': r.get("snippet"),
-                    'snippet_highlighted_words': r.get("snippet_highlighted_words"),
-                }
-                top_100_results.append(result_infos)
-    # sort the list top result by position and remove duplications
-    top_100_results = sorted(top_100_results, key=lambda x: x['position'])
+    # sorted by position, duplicates removed; concurrent identical searches share one fetch
+    top_100_results = serp_flight.do(
+        (normalize_query(query), SERP_HL.lower(), SERP_GL.lower()),
+        fetch_serp_results,
+        query,
+        api_key,
+    )
+    logging.info(f"SERP cache stats: {serp_cache.stats()}")
     tool_context.state["top_10_results"] = top_100_results[:10]
-    if len(top_100_results) > 10:
-        tool_context.state["other_results"] = top_100_results[10:]
-    else:
-        tool_context.state["other_results"] = []
+    other_results = top_100_results[10:]
+    if SERP_GROUP_BY_DOMAIN:
+        other_results = group_by_domain(other_results)
+    tool_context.state["other_results"] = other_results
     return top_100_results
 
 # --- Agent configuré ---
 
-search_agent = LlmAgent(
+search_agent = build_stage_agent(
     name="search_agent",
-    model=os.getenv("MODEL", "gemini-2.5-flash"),
     description=(
         "An intelligent research assistant capable of finding and summarizing "
         "the top 100 Google search results on any requested topic. "
@@ -0,0 +1,230 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "seo-agent-cache.sqlite3")
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Build a stable cache key from JSON-serializable parts.
+
+    :param parts: The values identifying the cached computation
+    :return: A hex digest usable as a cache key
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query for use in cache keys.
+
+    :param query: The query as typed
+    :return: The query lower-cased, with whitespace runs collapsed
+    """
+    return " ".join(query.lower().split())
+
+
+class PersistentCache:
+    """
+    A disk-backed key/value cache stored in SQLite.
+
+    Values are stored as JSON. Entries expire `ttl_seconds` after they were
+    written, and each namespace keeps at most `max_entries` entries, evicting
+    the least recently used ones first. Several caches can share the same
+    database file through different namespaces.
+
+    A hit only records its access time when the recorded one is older than
+    `touch_interval`, so most reads do not write to the database. From async
+    code, use `aget` and `aset`, which run on a worker thread, so that SQLite
+    I/O and lock waits do not block the event loop.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: float,
+        max_entries: int = 10_000,
+        path: str | None = None,
+        touch_interval: float = 60,
+    ) -> None:
+        """
+        Initialize the cache. The database is only opened on first use.
+
+        :param namespace: Name isolating this cache's entries in the database
+        :param ttl_seconds: Lifetime of an entry; 0 or less disables the cache
+        :param max_entries: Maximum number of entries kept for this namespace
+        :param path: SQLite file path, defaults to the CACHE_PATH env variable
+        :param touch_interval: Granularity of the access times used for LRU
+            eviction, in seconds
+        """
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.path = path or os.getenv("CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_entries_lru"
+                " ON cache_entries (namespace, accessed_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Any | None:
+        """
+        Return the cached value for `key`, or None on a miss or expired entry.
+
+        :param key: The cache key
+        :return: The decoded value, or None
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at, accessed_at FROM cache_entries"
+                " WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                        (self.namespace, key),
+                    )
+                    conn.commit()
+                self.misses += 1
+                return None
+            if now - row[2] >= self.touch_interval:
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ?"
+                    " WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+                conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    async def aget(self, key: str) -> Any | None:
+        """
+        Like `get`, on a worker thread.
+
+        :param key: The cache key
+        :return: The decoded value, or None
+        """
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any) -> None:
+        """
+        Like `set`, on a worker thread.
+
+        :param key: The cache key
+        :param value: A JSON-serializable value
+        """
+        await asyncio.to_thread(self.set, key, value)
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store `value` under `key` and evict the least recently used entries
+        beyond `max_entries`.
+
+        :param key: The cache key
+        :param value: A JSON-serializable value
+        """
+        if not self.enabled:
+            return
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries"
+                " (namespace, key, value, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, payload, now, now),
+            )
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                " SELECT key FROM cache_entries WHERE namespace = ?"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            )
+            conn.commit()
+
+    def clear(self) -> None:
+        """Remove every entry of this namespace and reset the counters."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            )
+            conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?",
+                    (self.namespace,),
+                )
+                .fetchone()
+            )
+        return int(row[0])
+
+    def stats(self) -> dict[str, Any]:
+        """Return the hit/miss counters of this cache."""
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
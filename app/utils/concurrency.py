@@ -0,0 +1,53 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def gather_bounded(
+    func: Callable[[T], Awaitable[R]],
+    items: Iterable[T],
+    limit: int,
+    on_result: Callable[[int, R], Any] | None = None,
+) -> list[R]:
+    """
+    Run `func` over `items` with at most `limit` calls in flight.
+
+    Results are returned in the order of `items`, whatever the completion
+    order. The first exception raised by `func` is propagated.
+
+    :param func: Coroutine function applied to each item
+    :param items: The items to process
+    :param limit: Maximum number of concurrent calls
+    :param on_result: Optional callback invoked with (index, result) as soon
+        as each item completes
+    :return: The results, in input order
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(index: int, item: T) -> R:
+        async with semaphore:
+            result = await func(item)
+        if on_result is not None:
+            on_result(index, result)
+        return result
+
+    return list(
+        await asyncio.gather(*(run(index, item) for index, item in enumerate(items)))
+    )
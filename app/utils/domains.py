@@ -0,0 +1,51 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from urllib.parse import urlsplit
+
+import tldextract
+
+# Public Suffix List, private section included so that stores and blogs hosted
+# on a platform (myshopify.com, github.io, blogspot.com, ...) are told apart.
+# The snapshot bundled with tldextract is used: nothing is fetched or cached
+# on disk at run time.
+_public_suffixes = tldextract.TLDExtract(
+    suffix_list_urls=(), cache_dir=None, include_psl_private_domains=True
+)
+
+
+def hostname(url: str) -> str:
+    """
+    Return the lower-cased host of `url`, without a leading "www.".
+
+    :param url: An absolute URL
+    :return: The host name, or an empty string if the URL has none
+    """
+    host = (urlsplit(url).hostname or "").lower().rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+def registrable_domain(url: str) -> str:
+    """
+    Return the registrable domain (eTLD+1) of `url`.
+
+    e.g. "https://shop.example.co.uk/p/1" -> "example.co.uk",
+    "https://brand.myshopify.com/p/1" -> "brand.myshopify.com"
+
+    :param url: An absolute URL
+    :return: The registrable domain, or the bare host for IPs, single labels
+        and hosts without a known public suffix
+    """
+    host = hostname(url)
+    return _public_suffixes(host).top_domain_under_public_suffix or host
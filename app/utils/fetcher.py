@@ -0,0 +1,218 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import codecs
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.domains import hostname
+from app.utils.html_text import TextExtractor
+from app.utils.telemetry import traced_call
+
+USER_AGENT = "Mozilla/5.0 (compatible; SEOAgent/1.0)"
+CHUNK_SIZE = 16 * 1024
+
+
+def _declared_encoding(resp: requests.Response, content_type: str) -> str:
+    """Charset declared by the response headers, UTF-8 when absent or unknown."""
+    if "charset" not in content_type.lower() or not resp.encoding:
+        return "utf-8"
+    try:
+        return codecs.lookup(resp.encoding).name
+    except LookupError:
+        return "utf-8"
+
+
+class PageFetcher:
+    """
+    A shared HTTP fetcher for SERP pages.
+
+    It keeps a pooled keep-alive session, streams response bodies up to a byte
+    cap, bounds concurrent requests per host, and remembers hosts that timed
+    out for a short while so that they are skipped instead of waited on again.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 32,
+        timeout: float = 10.0,
+        max_bytes: int = 512 * 1024,
+        per_host_limit: int = 4,
+        negative_ttl: float = 120.0,
+    ) -> None:
+        """
+        Initialize the fetcher.
+
+        :param pool_size: Number of pooled connections kept per scheme
+        :param timeout: Connect and read timeout of a request, in seconds
+        :param max_bytes: Maximum number of body bytes read from a response
+        :param per_host_limit: Maximum number of concurrent requests per host
+        :param negative_ttl: How long a host that failed to answer is skipped
+        """
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.per_host_limit = per_host_limit
+        self.negative_ttl = negative_ttl
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        # Slots of the hosts with requests in flight or waiting, and their users
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        self._host_users: dict[str, int] = {}
+        self._dead_hosts: dict[str, float] = {}
+
+    @contextmanager
+    def _host_slot(self, host: str) -> Iterator[None]:
+        """
+        Hold one of the `per_host_limit` request slots of `host`.
+
+        A host's semaphore is dropped once no request uses or waits for it, so
+        the table does not grow with every host ever fetched.
+        """
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_users[host] = 0
+            self._host_users[host] += 1
+            slot = self._host_slots[host]
+        try:
+            with slot:
+                yield
+        finally:
+            with self._lock:
+                self._host_users[host] -= 1
+                if not self._host_users[host]:
+                    del self._host_slots[host]
+                    del self._host_users[host]
+
+    def is_host_dead(self, host: str) -> bool:
+        """Return whether `host` failed recently and should be skipped."""
+        with self._lock:
+            expiry = self._dead_hosts.get(host)
+            if expiry is not None and expiry <= time.monotonic():
+                del self._dead_hosts[host]
+                expiry = None
+        return expiry is not None
+
+    def _mark_host_dead(self, host: str) -> None:
+        with self._lock:
+            self._dead_hosts[host] = time.monotonic() + self.negative_ttl
+
+    def fetch(
+        self,
+        url: str,
+        sink: Callable[[str], bool | None],
+        max_bytes: int | None = None,
+    ) -> bool:
+        """
+        Stream the HTML body of `url` into `sink`, chunk by chunk.
+
+        Reading stops as soon as `sink` returns True, or once `max_bytes` bytes
+        have been read.
+
+        :param url: Absolute URL to fetch
+        :param sink: Called with each decoded chunk; returns True when it has
+            enough content
+        :param max_bytes: Byte cap, defaults to the fetcher's `max_bytes`
+        :return: Whether an HTML body was received
+        """
+        host = hostname(url)
+        if not host or self.is_host_dead(host):
+            return False
+        max_bytes = max_bytes or self.max_bytes
+
+        with traced_call("fetch", "page", url=url) as span:
+            with self._host_slot(host):
+                try:
+                    with self.session.get(
+                        url, timeout=self.timeout, stream=True
+                    ) as resp:
+                        span.set_attribute("http.status_code", resp.status_code)
+                        content_type = resp.headers.get("Content-Type", "text/html")
+                        if resp.status_code >= 400 or "html" not in content_type:
+                            return False
+                        decoder = codecs.getincrementaldecoder(
+                            _declared_encoding(resp, content_type)
+                        )(errors="replace")
+                        read = 0
+                        for chunk in resp.iter_content(CHUNK_SIZE):
+                            chunk = chunk[: max_bytes - read]
+                            read += len(chunk)
+                            if sink(decoder.decode(chunk)) or read >= max_bytes:
+                                break
+                        sink(decoder.decode(b"", final=True))
+                        span.set_attribute("fetch.bytes", read)
+                        return True
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    logging.info(f"Skipping {host} for {self.negative_ttl}s: {e}")
+                    span.set_attribute("error.type", type(e).__name__)
+                    self._mark_host_dead(host)
+                except Exception as e:
+                    logging.info(f"Failed to fetch {url}: {e}")
+                    span.set_attribute("error.type", type(e).__name__)
+        return False
+
+    def fetch_text(self, url: str, max_chars: int = 3000) -> str:
+        """
+        Fetch `url` and return its visible text, truncated to `max_chars`.
+
+        The body is parsed while it streams in, and the download stops as soon
+        as `max_chars` characters of text have been extracted.
+
+        :param url: Absolute URL to fetch
+        :param max_chars: Maximum number of characters returned
+        :return: The extracted text, or an empty string on failure
+        """
+        extractor = TextExtractor(max_chars)
+        try:
+            if not self.fetch(url, extractor.feed):
+                return ""
+            extractor.close()
+        except Exception as e:
+            logging.info(f"Failed to extract text from {url}: {e}")
+        return extractor.text()
+
+    async def afetch_text(self, url: str, max_chars: int = 3000) -> str:
+        """Async variant of `fetch_text`, run on a worker thread over the shared pool."""
+        return await asyncio.to_thread(self.fetch_text, url, max_chars)
+
+
+_fetcher: PageFetcher | None = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> PageFetcher:
+    """Return the process-wide fetcher, configured from FETCH_* env variables."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = PageFetcher(
+                pool_size=int(os.getenv("FETCH_POOL_SIZE", "32")),
+                timeout=float(os.getenv("FETCH_TIMEOUT", "10")),
+                max_bytes=int(os.getenv("FETCH_MAX_BYTES", str(512 * 1024))),
+                per_host_limit=int(os.getenv("FETCH_PER_HOST_LIMIT", "4")),
+                negative_ttl=float(os.getenv("FETCH_NEGATIVE_TTL", "120")),
+            )
+        return _fetcher
@@ -0,0 +1,202 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+from typing import Any
+
+from dotenv import load_dotenv
+
+from app.utils.llm_cache import get_llm_cache, is_grounded, request_key
+from app.utils.rate_limit import call_with_retries, call_with_retries_sync, get_limiter
+from app.utils.telemetry import record_usage, traced_call
+
+load_dotenv()
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+# Calls per second allowed to each model before AIMD adjustment (0: unlimited)
+GEMINI_QPS = float(os.getenv("GEMINI_QPS", "10"))
+
+_client: Any = None
+_client_lock = threading.Lock()
+
+
+def _http_options() -> Any:
+    import httpx
+    from google.genai.types import HttpOptions
+
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("GENAI_MAX_CONNECTIONS", "64")),
+        max_keepalive_connections=int(os.getenv("GENAI_MAX_KEEPALIVE", "32")),
+    )
+    return HttpOptions(
+        timeout=int(os.getenv("GENAI_TIMEOUT_MS", "120000")),
+        client_args={"limits": limits},
+        # Without a transport, genai uses aiohttp when installed, with a new
+        # session per request and no pool limits.
+        async_client_args={"transport": httpx.AsyncHTTPTransport(limits=limits)},
+    )
+
+
+def get_client() -> Any:
+    """
+    Return the process-wide genai client, creating it on first use.
+
+    All tools share this client, hence one connection pool per worker. Pool
+    sizes and timeout are read from GENAI_MAX_CONNECTIONS, GENAI_MAX_KEEPALIVE
+    and GENAI_TIMEOUT_MS when the client is created.
+
+    :return: A google.genai Client
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google import genai
+
+                _client = genai.Client(http_options=_http_options())
+    return _client
+
+
+def get_async_client() -> Any:
+    """
+    Return the async side (`client.aio`) of the process-wide genai client.
+
+    :return: A google.genai AsyncClient
+    """
+    return get_client().aio
+
+
+def set_client(client: Any) -> None:
+    """
+    Replace the process-wide genai client, e.g. with a stand-in in tests.
+    Passing None drops the current client so the next call builds a new one.
+
+    :param client: The client to use, or None
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def _response_cache(config: Any, cache_key: str | None) -> Any:
+    # Grounded requests read live pages, so their request hash does not
+    # change with the content, and requests on cached content name a
+    # per-run cache: both are only cached under a caller's key.
+    if cache_key is None and (
+        is_grounded(config) or getattr(config, "cached_content", None)
+    ):
+        return None
+    return get_llm_cache()
+
+
+def stage_model(stage: str) -> str:
+    """
+    Return the model used by a pipeline stage.
+
+    MODEL_<STAGE> (e.g. MODEL_GSO_IMPROVER) overrides MODEL for one stage.
+
+    :param stage: The stage name, e.g. "company_info_agent"
+    :return: The model name
+    """
+    return os.getenv(f"MODEL_{stage.upper()}", os.getenv("MODEL", DEFAULT_MODEL))
+
+
+async def agenerate_content(
+    stage: str,
+    contents: Any,
+    config: Any = None,
+    model: str | None = None,
+    cache_key: str | None = None,
+) -> Any:
+    """
+    Call `generate_content` on the shared async client for a pipeline stage.
+
+    Identical requests are answered from the LLM response cache (see
+    app.utils.llm_cache; LLM_CACHE=false bypasses it). Requests grounded by
+    url_context or Google Search are only cached when the caller passes a
+    `cache_key` that changes with what they read, e.g. a page content hash. Other calls go through
+    the model's rate limiter and are retried with backoff when throttled or
+    on transient errors (see app.utils.rate_limit). Each call is traced, with
+    its model, cache hit, retries and token counts (see app.utils.telemetry).
+
+    :param stage: The calling stage, which selects the model
+    :param contents: The request contents
+    :param config: The GenerateContentConfig, if any
+    :param model: Overrides the stage model
+    :param cache_key: Replaces the request hash as cache key, for requests
+        that refer to server-side state such as cached content or web pages
+    :return: The GenerateContentResponse
+    """
+    model = model or stage_model(stage)
+    with traced_call("gemini", stage, model=model) as span:
+        llm_cache = _response_cache(config, cache_key)
+        if llm_cache is not None:
+            cache_key = cache_key or request_key(model, contents, config)
+            response = await llm_cache.aget(stage, cache_key)
+            span.set_attribute("cache_hit", response is not None)
+            if response is not None:
+                return response
+        response = await call_with_retries(
+            get_limiter(f"gemini:{model}", GEMINI_QPS),
+            get_async_client().models.generate_content,
+            model=model,
+            contents=contents,
+            config=config,
+        )
+        record_usage(span, model, response)
+    if llm_cache is not None:
+        await llm_cache.aset(cache_key, response)
+    return response
+
+
+def generate_content(
+    stage: str,
+    contents: Any,
+    config: Any = None,
+    model: str | None = None,
+    cache_key: str | None = None,
+) -> Any:
+    """
+    Call `generate_content` on the shared sync client for a pipeline stage,
+    cached, rate limited and retried like `agenerate_content`.
+
+    :param stage: The calling stage, which selects the model
+    :param contents: The request contents
+    :param config: The GenerateContentConfig, if any
+    :param model: Overrides the stage model
+    :param cache_key: Replaces the request hash as cache key, and opts
+        grounded requests in to the cache
+    :return: The GenerateContentResponse
+    """
+    model = model or stage_model(stage)
+    with traced_call("gemini", stage, model=model) as span:
+        llm_cache = _response_cache(config, cache_key)
+        if llm_cache is not None:
+            cache_key = cache_key or request_key(model, contents, config)
+            response = llm_cache.get(stage, cache_key)
+            span.set_attribute("cache_hit", response is not None)
+            if response is not None:
+                return response
+        response = call_with_retries_sync(
+            get_limiter(f"gemini:{model}", GEMINI_QPS),
+            get_client().models.generate_content,
+            model=model,
+            contents=contents,
+            config=config,
+        )
+        record_usage(span, model, response)
+    if llm_cache is not None:
+        llm_cache.set(cache_key, response)
+    return response
@@ -0,0 +1,117 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from html.parser import HTMLParser
+
+# Elements whose content is never visible text
+SKIPPED_TAGS = frozenset(
+    {"script", "style", "noscript", "template", "svg", "math", "iframe", "object"}
+)
+
+FEED_CHUNK_SIZE = 16 * 1024
+
+
+class TextExtractor(HTMLParser):
+    """
+    An incremental HTML to text extractor with a character budget.
+
+    HTML is fed chunk by chunk as it is downloaded. Text inside non-content
+    elements is skipped without building a document tree, and parsing stops
+    as soon as `max_chars` characters of text have been collected. The output
+    joins the stripped text nodes with single spaces.
+    """
+
+    def __init__(self, max_chars: int = 3000) -> None:
+        """
+        Initialize the extractor.
+
+        :param max_chars: Number of text characters after which parsing stops
+        """
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.done = max_chars <= 0
+        self._parts: list[str] = []
+        self._length = 0
+        self._skip_depth = 0
+        self._pending: list[str] = []
+        self._pending_length = 0
+
+    def feed(self, data: str) -> bool:
+        """
+        Parse the next chunk of HTML.
+
+        :param data: A chunk of HTML
+        :return: True once the character budget is met and no more input is needed
+        """
+        if not self.done and data:
+            super().feed(data)
+        return self.done
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        self._flush()
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush()
+        if tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        # A text node can arrive in several pieces when it spans chunks, so
+        # pieces are only joined into a node when the next tag starts.
+        if self.done or self._skip_depth:
+            return
+        self._pending.append(data)
+        self._pending_length += len(data)
+        if self._length + self._pending_length > self.max_chars:
+            # Stop early inside a huge text node once it alone fills the budget.
+            pending_text = " ".join("".join(self._pending).split())
+            if self._length + len(pending_text) > self.max_chars:
+                self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        text = " ".join("".join(self._pending).split())
+        self._pending = []
+        self._pending_length = 0
+        if not text:
+            return
+        self._parts.append(text)
+        self._length += len(text) + 1
+        if self._length > self.max_chars:
+            self.done = True
+
+    def text(self) -> str:
+        """Return the text collected so far, truncated to `max_chars`."""
+        self._flush()
+        return " ".join(self._parts)[: self.max_chars]
+
+
+def extract_text(html: str, max_chars: int = 3000) -> str:
+    """
+    Extract the visible text of an HTML document, stopping at `max_chars`.
+
+    :param html: The HTML document
+    :param max_chars: Maximum number of characters returned
+    :return: The extracted text
+    """
+    extractor = TextExtractor(max_chars)
+    # Feed in chunks so that parsing stops once the budget is met.
+    for start in range(0, len(html), FEED_CHUNK_SIZE):
+        if extractor.feed(html[start : start + FEED_CHUNK_SIZE]):
+            return extractor.text()
+    extractor.close()
+    return extractor.text()
@@ -0,0 +1,264 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import threading
+import time
+import types
+from collections import OrderedDict, defaultdict
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.utils.cache import PersistentCache, make_key
+
+
+def canonicalize(value: Any) -> Any:
+    """
+    Convert a request part to plain JSON data, for hashing.
+
+    Pydantic models are dumped field by field and response schema classes are
+    replaced by their JSON schema, so that a schema change changes the key.
+
+    :param value: Contents, a config, tools, ...
+    :return: The equivalent JSON-serializable data
+    """
+    if isinstance(value, BaseModel):
+        return {name: canonicalize(field) for name, field in value if field is not None}
+    if isinstance(value, type) and issubclass(value, BaseModel):
+        return value.model_json_schema()
+    if isinstance(value, types.GenericAlias):
+        return {
+            "origin": value.__origin__.__name__,
+            "args": [canonicalize(arg) for arg in value.__args__],
+        }
+    if isinstance(value, dict):
+        return {str(key): canonicalize(item) for key, item in value.items()}
+    if isinstance(value, list | tuple):
+        return [canonicalize(item) for item in value]
+    if value is None or isinstance(value, str | int | float | bool):
+        return value
+    return repr(value)
+
+
+def request_key(model: str, contents: Any, config: Any = None) -> str:
+    """
+    Build the content-addressed key of a `generate_content` request.
+
+    :param model: The model name
+    :param contents: The request contents
+    :param config: The GenerateContentConfig, tools and response schema included
+    :return: A hex digest of the whole request
+    """
+    return make_key(model, canonicalize(contents), canonicalize(config))
+
+
+# Tools whose answers depend on live web content rather than on the request
+GROUNDING_TOOLS = ("url_context", "google_search", "google_search_retrieval")
+
+
+def is_grounded(config: Any = None) -> bool:
+    """
+    Tell whether a request uses a tool that reads the web, so that the same
+    request can get a different answer once the pages change.
+
+    :param config: The GenerateContentConfig or its dict form, if any
+    :return: Whether the request is grounded by url_context or Google Search
+    """
+    config = canonicalize(config) or {}
+    return any(
+        tool.get(name) is not None
+        for tool in config.get("tools") or []
+        if isinstance(tool, dict)
+        for name in GROUNDING_TOOLS
+    )
+
+
+class LLMResponseCache:
+    """
+    A two-tier cache of `generate_content` responses, keyed by request hash.
+
+    The first tier is an in-process LRU of `memory_entries` responses. The
+    optional second tier is a PersistentCache shared by the processes using
+    the same database, holding responses as JSON. Only responses with text
+    are stored, so failed or empty generations are retried next time. Hits
+    and misses are counted per pipeline stage.
+    """
+
+    def __init__(
+        self,
+        memory_entries: int = 1024,
+        ttl_seconds: float = 86400,
+        disk: PersistentCache | None = None,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        :param memory_entries: Size of the in-memory LRU
+        :param ttl_seconds: Lifetime of an in-memory entry
+        :param disk: The on-disk tier, if any, with its own TTL
+        """
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk = disk
+        # key -> (expiry time, response)
+        self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        )
+
+    def get(self, stage: str, key: str) -> Any | None:
+        """
+        Return the cached response of a request.
+
+        :param stage: The calling stage, for stats
+        :param key: The request key, see `request_key`
+        :return: The response, or None
+        """
+        response = self._get_memory(stage, key)
+        if response is None:
+            response = self._get_disk(stage, key)
+        return response
+
+    async def aget(self, stage: str, key: str) -> Any | None:
+        """
+        Like `get`, reading the disk tier on a worker thread.
+
+        :param stage: The calling stage, for stats
+        :param key: The request key, see `request_key`
+        :return: The response, or None
+        """
+        response = self._get_memory(stage, key)
+        if response is None:
+            response = await asyncio.to_thread(self._get_disk, stage, key)
+        return response
+
+    def _get_memory(self, stage: str, key: str) -> Any | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if expires_at > time.monotonic():
+                    self._memory.move_to_end(key)
+                    self._stats[stage]["memory_hits"] += 1
+                    return response
+                del self._memory[key]
+        return None
+
+    def _get_disk(self, stage: str, key: str) -> Any | None:
+        # Counts the miss of both tiers when the disk tier misses too
+        if self.disk is not None:
+            dumped = self.disk.get(key)
+            if dumped is not None:
+                from google.genai.types import GenerateContentResponse
+
+                response = GenerateContentResponse.model_validate(dumped)
+                with self._lock:
+                    self._stats[stage]["disk_hits"] += 1
+                self._remember(key, response)
+                return response
+        with self._lock:
+            self._stats[stage]["misses"] += 1
+        return None
+
+    def set(self, key: str, response: Any) -> None:
+        """
+        Store the response of a request, unless it has no text.
+
+        :param key: The request key
+        :param response: The GenerateContentResponse
+        """
+        dumped = self._set_memory(key, response)
+        if dumped is not None and self.disk is not None:
+            self.disk.set(key, dumped)
+
+    async def aset(self, key: str, response: Any) -> None:
+        """
+        Like `set`, writing the disk tier on a worker thread.
+
+        :param key: The request key
+        :param response: The GenerateContentResponse
+        """
+        dumped = self._set_memory(key, response)
+        if dumped is not None and self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, dumped)
+
+    def _set_memory(self, key: str, response: Any) -> dict[str, Any] | None:
+        """Remember a response with text, and return what to write on disk."""
+        try:
+            if not response.text:
+                return None
+        except ValueError:
+            return None
+        self._remember(key, response)
+        if self.disk is not None and isinstance(response, BaseModel):
+            return response.model_dump(mode="json", exclude_none=True)
+        return None
+
+    def _remember(self, key: str, response: Any) -> None:
+        with self._lock:
+            self._memory[key] = (time.monotonic() + self.ttl_seconds, response)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Return the hit counts and hit rate of each stage.
+
+        :return: Stats by stage name
+        """
+        with self._lock:
+            stats = {stage: dict(counts) for stage, counts in self._stats.items()}
+        for counts in stats.values():
+            lookups = sum(counts.values())
+            hits = counts["memory_hits"] + counts["disk_hits"]
+            counts["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_llm_cache: LLMResponseCache | None = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache | None:
+    """
+    Return the process-wide response cache, configured on first use from
+    LLM_CACHE (false to bypass it), LLM_CACHE_TTL, LLM_CACHE_MEMORY_ENTRIES,
+    and LLM_CACHE_DISK and LLM_CACHE_MAX_ENTRIES for the disk tier.
+
+    :return: The shared cache, or None when bypassed
+    """
+    global _llm_cache
+    if os.getenv("LLM_CACHE", "true").lower() != "true":
+        return None
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                ttl_seconds = float(os.getenv("LLM_CACHE_TTL", "86400"))
+                disk = None
+                if os.getenv("LLM_CACHE_DISK", "true").lower() == "true":
+                    disk = PersistentCache(
+                        namespace="llm_responses",
+                        ttl_seconds=ttl_seconds,
+                        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000")),
+                    )
+                _llm_cache = LLMResponseCache(
+                    memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024")),
+                    ttl_seconds=ttl_seconds,
+                    disk=disk,
+                )
+    return _llm_cache
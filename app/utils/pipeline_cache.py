@@ -0,0 +1,189 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from app.utils.cache import PersistentCache, make_key, normalize_query
+
+# Bump when a change to the pipeline makes previously cached outputs wrong.
+# Deployments can also set PIPELINE_VERSION, e.g. to the commit SHA.
+PIPELINE_VERSION = os.getenv("PIPELINE_VERSION", "1")
+
+# Session state keys making up the final output of a run
+OUTPUT_KEYS = (
+    "top_10_results",
+    "companies_filtered",
+    "summary_best_brands_content",
+    "recommendations",
+)
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+def pipeline_locale() -> str:
+    """
+    Return the locale the pipeline searches with (SERP_HL and SERP_GL).
+
+    :return: e.g. "en-fr"
+    """
+    return f"{os.getenv('SERP_HL', 'en')}-{os.getenv('SERP_GL', 'fr')}".lower()
+
+
+def collect_outputs(event: dict[str, Any], outputs: dict[str, Any]) -> None:
+    """
+    Copy the pipeline outputs found in the state delta of a streamed event.
+
+    :param event: An event as yielded by AdkApp.stream_query
+    :param outputs: The outputs collected so far, updated in place
+    """
+    state_delta = (event.get("actions") or {}).get("state_delta") or {}
+    for key in OUTPUT_KEYS:
+        if key in state_delta:
+            outputs[key] = state_delta[key]
+
+
+class PipelineResultCache:
+    """
+    Caches the final outputs of whole pipeline runs, with stale-while-revalidate.
+
+    Entries are keyed by normalized query, locale and pipeline version. An
+    entry is fresh for `fresh_seconds` after it was stored, then stale for
+    `stale_seconds` more: a stale entry is still served at once, while a
+    background run recomputes it. Past both windows it is a miss.
+    """
+
+    def __init__(
+        self,
+        fresh_seconds: float,
+        stale_seconds: float,
+        version: str = PIPELINE_VERSION,
+        max_entries: int = 1000,
+        path: str | None = None,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        :param fresh_seconds: How long an entry is served without refreshing it
+        :param stale_seconds: How long an expired entry may still be served
+            while it is refreshed
+        :param version: Pipeline version, part of every key
+        :param max_entries: Maximum number of cached runs
+        :param path: SQLite file path, defaults to the CACHE_PATH env variable
+        """
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.version = version
+        self.cache = PersistentCache(
+            namespace="pipeline",
+            ttl_seconds=fresh_seconds + stale_seconds,
+            max_entries=max_entries,
+            path=path,
+        )
+        self._refreshing: set[str] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "PipelineResultCache | None":
+        """
+        Build the cache configured by PIPELINE_CACHE, PIPELINE_CACHE_FRESH_SECONDS
+        and PIPELINE_CACHE_STALE_SECONDS.
+
+        :return: The cache, or None when PIPELINE_CACHE is false
+        """
+        if os.getenv("PIPELINE_CACHE", "true").lower() != "true":
+            return None
+        return cls(
+            fresh_seconds=float(os.getenv("PIPELINE_CACHE_FRESH_SECONDS", "3600")),
+            stale_seconds=float(os.getenv("PIPELINE_CACHE_STALE_SECONDS", "86400")),
+            max_entries=int(os.getenv("PIPELINE_CACHE_MAX_ENTRIES", "1000")),
+        )
+
+    def key(self, query: str, locale: str) -> str:
+        """
+        Build the key of a run.
+
+        :param query: The user query
+        :param locale: The search locale, see `pipeline_locale`
+        :return: The cache key
+        """
+        return make_key(normalize_query(query), locale.lower(), self.version)
+
+    def get(self, query: str, locale: str) -> tuple[dict[str, Any] | None, str]:
+        """
+        Look up the outputs of a previous run of `query`.
+
+        :param query: The user query
+        :param locale: The search locale
+        :return: The cached outputs (or None) and FRESH, STALE or MISS
+        """
+        entry = self.cache.get(self.key(query, locale))
+        if entry is None:
+            return None, MISS
+        age = time.time() - entry["stored_at"]
+        return entry["outputs"], FRESH if age < self.fresh_seconds else STALE
+
+    def set(self, query: str, locale: str, outputs: dict[str, Any]) -> bool:
+        """
+        Store the outputs of a run, if it produced all of OUTPUT_KEYS.
+
+        :param query: The user query
+        :param locale: The search locale
+        :param outputs: The outputs of the run
+        :return: Whether the outputs were stored
+        """
+        if any(key not in outputs for key in OUTPUT_KEYS):
+            return False
+        self.cache.set(
+            self.key(query, locale), {"stored_at": time.time(), "outputs": outputs}
+        )
+        return True
+
+    def refresh_in_background(
+        self, query: str, locale: str, run: Callable[[], dict[str, Any]]
+    ) -> bool:
+        """
+        Recompute a stale entry in a daemon thread, unless a refresh of the same
+        key is already running.
+
+        :param query: The user query
+        :param locale: The search locale
+        :param run: Runs the pipeline and returns its outputs
+        :return: Whether a refresh was started
+        """
+        key = self.key(query, locale)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+
+        def refresh() -> None:
+            try:
+                self.set(query, locale, run())
+            except Exception as e:
+                logging.warning(f"Background refresh of '{query}' failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(
+            target=refresh, name="pipeline-cache-refresh", daemon=True
+        ).start()
+        return True
@@ -0,0 +1,110 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+from types import TracebackType
+from typing import Any
+
+from google.genai.types import (
+    Content,
+    CreateCachedContentConfig,
+    GenerateContentConfig,
+    Part,
+)
+
+# Rough characters-per-token ratio, used to skip prefixes below the model's
+# minimum cacheable size without a count_tokens round-trip.
+CHARS_PER_TOKEN = 4
+
+
+class SharedPrefix:
+    """
+    A long prompt prefix shared by many `generate_content` calls of a run.
+
+    Used as an async context manager. On entry, the prefix (and the tools) are
+    stored once as model-side cached content, so that each call only sends its
+    own suffix. When caching is disabled, the prefix is too short to be cached,
+    or the cache cannot be created, calls fall back to sending the prefix
+    inline; the prefix itself is still built only once. Cached content is
+    deleted on exit.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        model: str,
+        prefix: str,
+        tools: list | None = None,
+        ttl_seconds: int = 600,
+    ) -> None:
+        """
+        Initialize the shared prefix.
+
+        :param client: A genai client
+        :param model: Model the cached content is created for
+        :param prefix: The prompt prefix common to every call
+        :param tools: Tools used by every call
+        :param ttl_seconds: Lifetime of the model-side cached content
+        """
+        self.client = client
+        self.model = model
+        self.prefix = prefix
+        self.tools = tools
+        self.ttl_seconds = ttl_seconds
+        self.cached_content: str | None = None
+        self.enabled = os.getenv("CONTEXT_CACHE", "true").lower() == "true"
+        self.min_tokens = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024"))
+
+    async def __aenter__(self) -> "SharedPrefix":
+        if not self.enabled or len(self.prefix) < self.min_tokens * CHARS_PER_TOKEN:
+            return self
+        try:
+            cache = await self.client.aio.caches.create(
+                model=self.model,
+                config=CreateCachedContentConfig(
+                    contents=[Content(role="user", parts=[Part(text=self.prefix)])],
+                    tools=self.tools,
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+            self.cached_content = cache.name
+        except Exception as e:
+            logging.info(f"Context caching unavailable, sending prefix inline: {e}")
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self.cached_content is None:
+            return
+        try:
+            await self.client.aio.caches.delete(name=self.cached_content)
+        except Exception as e:
+            logging.info(f"Failed to delete cached content {self.cached_content}: {e}")
+        self.cached_content = None
+
+    def request(self, suffix: str) -> tuple[str, GenerateContentConfig]:
+        """
+        Build the contents and config of a call made of the prefix and `suffix`.
+
+        :param suffix: The call-specific end of the prompt
+        :return: The `contents` and `config` to pass to `generate_content`
+        """
+        if self.cached_content is not None:
+            return suffix, GenerateContentConfig(cached_content=self.cached_content)
+        return self.prefix + suffix, GenerateContentConfig(tools=self.tools)
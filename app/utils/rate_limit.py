@@ -0,0 +1,317 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from app.utils.telemetry import record_rate_limit_wait, record_retry
+
+T = TypeVar("T")
+
+# Markers of a rejected request in error messages (Gemini, SerpAPI).
+THROTTLE_MARKERS = (
+    "429",
+    "too many requests",
+    "resource_exhausted",
+    "rate limit",
+    "throughput limit",
+)
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# Exception class names of transient network failures (httpx, requests).
+TRANSIENT_ERROR_NAMES = frozenset(
+    {"ConnectionError", "TimeoutError", "Timeout", "TransportError"}
+)
+
+MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+BASE_BACKOFF = float(os.getenv("RATE_LIMIT_BASE_BACKOFF", "1"))
+MAX_BACKOFF = float(os.getenv("RATE_LIMIT_MAX_BACKOFF", "30"))
+
+
+class AdaptiveRateLimiter:
+    """
+    A thread-safe token bucket whose rate adapts to throttling (AIMD).
+
+    Each call takes a token, waiting for one when the bucket is empty. Every
+    successful call raises the rate by a small additive step, up to
+    `max_rate`; a throttled call (HTTP 429) halves it, down to `min_rate`.
+    Successive 429s within one second only count as one decrease, since
+    they report the same overload. A rate of 0 disables the limiter.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float | None = None,
+        min_rate: float | None = None,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        """
+        Initialize the limiter.
+
+        :param name: Name used in logs and stats, e.g. "gemini:gemini-2.5-flash"
+        :param rate: Maximum sustained calls per second
+        :param burst: Bucket size, i.e. calls allowed at once (default: rate)
+        :param min_rate: Floor of the adapted rate (default: rate / 20)
+        :param decrease_factor: Rate multiplier applied on throttling
+        """
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.min_rate = min_rate or rate / 20
+        self.increase_step = rate / 50
+        self.decrease_factor = decrease_factor
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _reserve(self) -> float:
+        """Take a token, record the wait before using it and return it."""
+        wait = self._take_token()
+        record_rate_limit_wait(self.name, wait)
+        return wait
+
+    def _take_token(self) -> float:
+        """Take a token and return how long to wait before using it."""
+        with self._lock:
+            self.calls += 1
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    async def acquire(self) -> float:
+        """
+        Wait for a token without blocking the event loop.
+
+        :return: The time spent waiting, in seconds
+        """
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def acquire_sync(self) -> float:
+        """
+        Wait for a token, blocking the calling thread.
+
+        :return: The time spent waiting, in seconds
+        """
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def record_success(self) -> None:
+        """Raise the rate additively after a successful call."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def record_throttle(self) -> None:
+        """Cut the rate multiplicatively after a throttled call."""
+        with self._lock:
+            self.throttled += 1
+            now = time.monotonic()
+            if self.rate <= 0 or now - self._last_decrease < 1:
+                return
+            self._last_decrease = now
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            logging.warning(f"{self.name} throttled, rate lowered to {self.rate:.2f}/s")
+
+    def record_retry(self) -> None:
+        """Count a call attempt that failed and will be retried."""
+        with self._lock:
+            self.retries += 1
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Return the limiter's counters.
+
+        :return: Current rate, calls, throttled calls, retries and queue wait
+        """
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "total_wait_seconds": round(self.total_wait, 3),
+                "avg_wait_seconds": round(self.total_wait / self.calls, 4)
+                if self.calls
+                else 0.0,
+                "max_wait_seconds": round(self.max_wait, 3),
+            }
+
+
+_limiters: dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str, rate: float) -> AdaptiveRateLimiter:
+    """
+    Return the process-wide limiter of a model or endpoint, creating it with
+    `rate` calls per second on first use.
+
+    :param name: The limiter name, e.g. "serpapi" or "gemini:<model>"
+    :param rate: Calls per second of a new limiter
+    :return: The shared limiter
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveRateLimiter(name, rate)
+        return _limiters[name]
+
+
+def rate_limit_stats() -> dict[str, dict[str, Any]]:
+    """
+    Return the stats of every limiter created so far.
+
+    :return: Stats by limiter name
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """
+    Tell whether `error` reports that the service rejected a call for rate.
+
+    :param error: The raised exception
+    :return: True for HTTP 429 / RESOURCE_EXHAUSTED errors
+    """
+    if (
+        getattr(error, "code", None) == 429
+        or getattr(error, "status_code", None) == 429
+    ):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Tell whether a call that raised `error` is worth retrying.
+
+    :param error: The raised exception
+    :return: True for throttling, 5xx errors and network failures
+    """
+    if is_throttle_error(error):
+        return True
+    if getattr(error, "code", None) in RETRYABLE_STATUS_CODES:
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: spreads out the retries of calls throttled together.
+    return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2**attempt))
+
+
+def _on_error(
+    limiter: AdaptiveRateLimiter, error: Exception, attempt: int, max_retries: int
+) -> float:
+    """Record a failed attempt and return the delay before the next one."""
+    if is_throttle_error(error):
+        limiter.record_throttle()
+    if attempt >= max_retries or not is_retryable_error(error):
+        raise error
+    limiter.record_retry()
+    record_retry(attempt + 1)
+    delay = _backoff(attempt)
+    logging.info(
+        f"{limiter.name} call failed ({error}), retry {attempt + 1}/{max_retries} "
+        f"in {delay:.1f}s"
+    )
+    return delay
+
+
+async def call_with_retries(
+    limiter: AdaptiveRateLimiter,
+    func: Callable[..., Awaitable[T]],
+    *args: Any,
+    max_retries: int | None = None,
+    **kwargs: Any,
+) -> T:
+    """
+    Await `func(*args, **kwargs)` under `limiter`, retrying throttled and
+    transient failures with jittered exponential backoff.
+
+    :param limiter: The limiter of the called model or endpoint
+    :param func: The coroutine function to call
+    :param max_retries: Retries before giving up (default RATE_LIMIT_MAX_RETRIES)
+    :return: The result of the call
+    """
+    max_retries = MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        await limiter.acquire()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            await asyncio.sleep(_on_error(limiter, e, attempt, max_retries))
+            attempt += 1
+            continue
+        limiter.record_success()
+        return result
+
+
+def call_with_retries_sync(
+    limiter: AdaptiveRateLimiter,
+    func: Callable[..., T],
+    *args: Any,
+    max_retries: int | None = None,
+    **kwargs: Any,
+) -> T:
+    """
+    Blocking variant of `call_with_retries`, for calls made from threads.
+
+    :param limiter: The limiter of the called model or endpoint
+    :param func: The function to call
+    :param max_retries: Retries before giving up (default RATE_LIMIT_MAX_RETRIES)
+    :return: The result of the call
+    """
+    max_retries = MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        limiter.acquire_sync()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            time.sleep(_on_error(limiter, e, attempt, max_retries))
+            attempt += 1
+            continue
+        limiter.record_success()
+        return result
@@ -0,0 +1,120 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from collections.abc import AsyncGenerator
+from typing import Any
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from pydantic import BaseModel, Field
+
+
+class Stage(BaseModel):
+    """A sub-agent with the state keys it reads and the state keys it writes."""
+
+    agent: BaseAgent
+    inputs: list[str] = Field(default_factory=list)
+    outputs: list[str] = Field(default_factory=list)
+
+
+class StageSchedulerAgent(BaseAgent):
+    """
+    A workflow agent that runs its stages as soon as their inputs are ready.
+
+    Each stage declares the session state keys it needs (`inputs`) and the
+    keys it produces (`outputs`). A stage starts once all of its inputs have
+    been written by the events of this invocation, so independent branches run side by side and the end
+    to end latency is the critical path of the stage graph rather than the sum
+    of all stages. Each stage runs in its own branch, as in a ParallelAgent.
+
+    Readiness is tracked from the state deltas of the events yielded in this
+    invocation rather than from the session state, which still holds the
+    previous query's values on a later turn of the same session.
+    """
+
+    stages: list[Stage] = Field(default_factory=list)
+
+    def __init__(self, *, name: str, stages: list[Stage], **kwargs: Any) -> None:
+        produced = {key for stage in stages for key in stage.outputs}
+        for stage in stages:
+            missing = set(stage.inputs) - produced
+            if missing:
+                raise ValueError(
+                    f"Stage {stage.agent.name} needs {sorted(missing)}, "
+                    "which no stage produces"
+                )
+        super().__init__(
+            name=name,
+            stages=stages,
+            sub_agents=[stage.agent for stage in stages],
+            **kwargs,
+        )
+
+    def _branch_ctx(self, stage: Stage, ctx: InvocationContext) -> InvocationContext:
+        branch_ctx = ctx.model_copy()
+        branch_suffix = f"{self.name}.{stage.agent.name}"
+        branch_ctx.branch = (
+            f"{ctx.branch}.{branch_suffix}" if ctx.branch else branch_suffix
+        )
+        return branch_ctx
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        waiting = list(self.stages)
+        runs: dict[asyncio.Task, AsyncGenerator[Event, None]] = {}
+        written: set[str] = set()
+
+        def start_ready_stages() -> None:
+            for stage in list(waiting):
+                if written.issuperset(stage.inputs):
+                    waiting.remove(stage)
+                    run = stage.agent.run_async(self._branch_ctx(stage, ctx))
+                    runs[asyncio.ensure_future(run.__anext__())] = run
+
+        start_ready_stages()
+        try:
+            while runs:
+                done, _ = await asyncio.wait(
+                    runs.keys(), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    run = runs.pop(task)
+                    try:
+                        event = task.result()
+                    except StopAsyncIteration:
+                        continue
+                    # The runner applies the event's state delta once it is
+                    # yielded, before this generator resumes.
+                    if not event.partial:
+                        written.update(event.actions.state_delta)
+                    yield event
+                    runs[asyncio.ensure_future(run.__anext__())] = run
+                if ctx.end_invocation:
+                    return
+                start_ready_stages()
+        finally:
+            for task in runs:
+                task.cancel()
+
+        if waiting:
+            logging.warning(
+                "Stages never received their inputs: "
+                + ", ".join(
+                    f"{stage.agent.name} (needs {stage.inputs})" for stage in waiting
+                )
+            )
@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that compute the same key.
+
+    The first caller of a key (the leader) runs the computation; callers
+    arriving while it is in flight wait for it and receive the same result,
+    or the same exception. Once the computation ends the key is released,
+    so later calls run again (caching is left to the caller). In-flight calls
+    are tracked with concurrent.futures.Future, so callers from other threads
+    and other event loops join the same computation.
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        Initialize the group.
+
+        :param name: Name used in stats, e.g. "serp"
+        """
+        self.name = name
+        self._in_flight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        """Return the future of `key` and whether the caller must compute it."""
+        with self._lock:
+            self.calls += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def _settle(
+        self, key: Hashable, future: Future, result: Any, error: BaseException | None
+    ) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Call `func(*args, **kwargs)`, or wait for the in-flight call of `key`.
+
+        :param key: Identifies the computation, e.g. a normalized query
+        :param func: The function to call
+        :return: The result of the leader's call
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._settle(key, future, None, e)
+            raise
+        self._settle(key, future, result, None)
+        return result
+
+    async def ado(
+        self,
+        key: Hashable,
+        func: Callable[..., Awaitable[T]],
+        *args: Any,
+        **kwargs: Any,
+    ) -> T:
+        """
+        Await `func(*args, **kwargs)`, or the in-flight call of `key`.
+
+        A waiting caller that is cancelled does not cancel the computation
+        shared with the other callers.
+
+        :param key: Identifies the computation, e.g. a URL
+        :param func: The coroutine function to call
+        :return: The result of the leader's call
+        """
+        future, leader = self._join(key)
+        if not leader:
+            waiter = asyncio.wrap_future(future)
+            try:
+                return await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                waiter.add_done_callback(_retrieve_outcome)
+                raise
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            self._settle(key, future, None, e)
+            raise
+        self._settle(key, future, result, None)
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Return the group's counters.
+
+        :return: Calls, calls served by another caller's computation, and
+            computations in flight
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
+
+
+def _retrieve_outcome(waiter: asyncio.Future) -> None:
+    # Mark the error of an abandoned waiter as retrieved, to avoid asyncio's
+    # "exception was never retrieved" warning.
+    if not waiter.cancelled():
+        waiter.exception()
@@ -0,0 +1,73 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+
+class PartialResultQueue(asyncio.Queue):
+    """An asyncio queue that remembers the event loop it was created on."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.loop = asyncio.get_running_loop()
+
+
+_partial_results: ContextVar[PartialResultQueue | None] = ContextVar(
+    "partial_results", default=None
+)
+
+
+def emit_partial_result(kind: str, item: Any) -> None:
+    """
+    Publish an item produced by the running tool before the tool returns.
+
+    Items are only collected when the tool runs inside `collect_partial_results`
+    (see ToolRunnerAgent); otherwise this is a no-op. It can be called from the
+    event loop or from a worker thread started by the tool.
+
+    :param kind: What the item is, e.g. "company_info"
+    :param item: A JSON-serializable item
+    """
+    queue = _partial_results.get()
+    if queue is None:
+        return
+    loop = queue.loop
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        queue.put_nowait((kind, item))
+    else:
+        loop.call_soon_threadsafe(queue.put_nowait, (kind, item))
+
+
+@contextmanager
+def collect_partial_results() -> Iterator[PartialResultQueue]:
+    """
+    Collect the items published with `emit_partial_result` by the code run
+    (and the tasks created) inside this block.
+
+    :return: The queue receiving (kind, item) tuples
+    """
+    queue = PartialResultQueue()
+    token = _partial_results.set(queue)
+    try:
+        yield queue
+    finally:
+        _partial_results.reset(token)
@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from opentelemetry import metrics, trace
+
+# The global tracer and meter proxies bind to the providers installed by
+# AgentEngineApp.set_up, and are no-ops until then.
+tracer = trace.get_tracer("seo-agent")
+meter = metrics.get_meter("seo-agent")
+
+call_duration = meter.create_histogram(
+    "seo_agent.call.duration",
+    unit="ms",
+    description="Duration of tool invocations and external calls",
+)
+call_count = meter.create_counter(
+    "seo_agent.calls",
+    description="Tool invocations and external calls, by kind, name and outcome",
+)
+retry_count = meter.create_counter(
+    "seo_agent.retries",
+    description="Retried external call attempts",
+)
+rate_limit_wait = meter.create_histogram(
+    "seo_agent.rate_limit.wait",
+    unit="ms",
+    description="Time calls queue in a rate limiter before being sent, by limiter",
+)
+token_count = meter.create_counter(
+    "seo_agent.tokens",
+    unit="{token}",
+    description="Model tokens, by model and direction (input or output)",
+)
+
+
+@contextmanager
+def traced_call(kind: str, name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Trace a tool invocation or an external call, and record its duration.
+
+    The span is named "<kind> <name>" and carries `attributes`; the code in
+    the block can add more through the yielded span. On exit the duration and
+    outcome are recorded in the call metrics, labelled by kind, name, error
+    (an exception, or an "error.type" span attribute for failures handled in
+    the block) and the span's "cache_hit" attribute.
+
+    :param kind: What is called, e.g. "tool", "gemini", "serpapi", "fetch"
+    :param name: The tool, stage or endpoint, e.g. "company_info_agent"
+    :param attributes: Initial span attributes, e.g. url or model
+    :return: The span
+    """
+    start = time.perf_counter()
+    error = False
+    with tracer.start_as_current_span(
+        f"{kind} {name}",
+        attributes={
+            "call.kind": kind,
+            "call.name": name,
+            **{key: value for key, value in attributes.items() if value is not None},
+        },
+    ) as span:
+        try:
+            yield span
+        except BaseException:
+            error = True
+            raise
+        finally:
+            labels = {
+                "kind": kind,
+                "name": name,
+                "error": error or _attribute(span, "error.type") is not None,
+                "cache_hit": bool(_attribute(span, "cache_hit")),
+            }
+            call_duration.record((time.perf_counter() - start) * 1000, labels)
+            call_count.add(1, labels)
+
+
+def record_retry(attempt: int) -> None:
+    """
+    Count a retry of the call traced by the current span.
+
+    :param attempt: Number of the retry, from 1
+    """
+    span = trace.get_current_span()
+    span.set_attribute("retry_count", attempt)
+    span.add_event("retry", {"attempt": attempt})
+    retry_count.add(1, {"kind": str(_attribute(span, "call.kind") or "other")})
+
+
+def record_rate_limit_wait(limiter: str, wait: float) -> None:
+    """
+    Record the time a call queues in a rate limiter.
+
+    :param limiter: The limiter name, e.g. "gemini:gemini-2.5-flash"
+    :param wait: The wait, in seconds
+    """
+    rate_limit_wait.record(wait * 1000, {"limiter": limiter})
+
+
+def record_usage(span: Any, model: str, response: Any) -> None:
+    """
+    Record the token counts of a `generate_content` response on its span and
+    in the token counter.
+
+    :param span: The span of the model call
+    :param model: The model name
+    :param response: The GenerateContentResponse
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for direction, tokens in (
+        ("input", usage.prompt_token_count),
+        ("output", usage.candidates_token_count),
+    ):
+        if tokens:
+            span.set_attribute(f"gen_ai.usage.{direction}_tokens", tokens)
+            token_count.add(tokens, {"model": model, "direction": direction})
+    if usage.cached_content_token_count:
+        span.set_attribute(
+            "gen_ai.usage.cached_input_tokens", usage.cached_content_token_count
+        )
+
+
+def _attribute(span: Any, key: str) -> Any:
+    # SDK spans expose their attributes; no-op spans have none.
+    return (getattr(span, "attributes", None) or {}).get(key)
@@ -0,0 +1,177 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import inspect
+import json
+import os
+from collections.abc import AsyncGenerator, Callable
+from typing import Any
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.tools import ToolContext
+from google.genai import types
+from pydantic import Field
+
+from app.utils.genai_clients import stage_model
+from app.utils.streaming import collect_partial_results
+from app.utils.telemetry import traced_call
+
+
+class ToolRunnerAgent(BaseAgent):
+    """
+    An agent that calls its tool functions directly, in order, with no model
+    in the loop.
+
+    Tool arguments are filled by name: `tool_context` receives a ToolContext,
+    `query` receives the text of the user message, and any other parameter is
+    read from the session state. Each call yields one event carrying the
+    tool's state changes and its result as text. The last tool's result is
+    also stored under `output_key` when set, like LlmAgent.output_key.
+
+    When `stream_partial_results` is set, items a tool publishes with
+    `emit_partial_result` while it runs are yielded right away as separate
+    events, with the item kind in `custom_metadata["partial_result"]`. They
+    are marked partial, so the runner streams them without appending them to
+    the session: only the tool's final event is stored.
+    """
+
+    tools: list[Callable[..., Any]] = Field(default_factory=list)
+    output_key: str | None = None
+    stream_partial_results: bool = True
+
+    def _tool_args(
+        self,
+        tool: Callable[..., Any],
+        ctx: InvocationContext,
+        tool_context: ToolContext,
+    ) -> dict[str, Any]:
+        args: dict[str, Any] = {}
+        for name, param in inspect.signature(tool).parameters.items():
+            if name == "tool_context":
+                args[name] = tool_context
+            elif name == "query":
+                args[name] = _user_text(ctx)
+            elif name in ctx.session.state:
+                args[name] = ctx.session.state[name]
+            elif param.default is inspect.Parameter.empty:
+                raise ValueError(
+                    f"{self.name}: no value for argument '{name}' of {tool.__name__}"
+                )
+        return args
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        for index, tool in enumerate(self.tools):
+            tool_context = ToolContext(ctx)
+            args = self._tool_args(tool, ctx, tool_context)
+            if not self.stream_partial_results:
+                result = await _call_tool(tool, args)
+            else:
+                with collect_partial_results() as partial_results:
+                    call = asyncio.ensure_future(_call_tool(tool, args))
+                while not call.done():
+                    next_item = asyncio.ensure_future(partial_results.get())
+                    await asyncio.wait(
+                        {call, next_item}, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if next_item.done():
+                        yield self._partial_event(ctx, *next_item.result())
+                    else:
+                        next_item.cancel()
+                # Let items posted from worker threads land before draining.
+                await asyncio.sleep(0)
+                while not partial_results.empty():
+                    yield self._partial_event(ctx, *partial_results.get_nowait())
+                result = call.result()
+            text = result if isinstance(result, str) else json.dumps(result)
+            if self.output_key and index == len(self.tools) - 1:
+                tool_context.state[self.output_key] = result
+            yield Event(
+                author=self.name,
+                invocation_id=ctx.invocation_id,
+                branch=ctx.branch,
+                actions=tool_context.actions,
+                content=types.Content(role="model", parts=[types.Part(text=text)]),
+            )
+
+    def _partial_event(self, ctx: InvocationContext, kind: str, item: Any) -> Event:
+        return Event(
+            author=self.name,
+            invocation_id=ctx.invocation_id,
+            branch=ctx.branch,
+            partial=True,
+            custom_metadata={"partial_result": kind},
+            content=types.Content(
+                role="model", parts=[types.Part(text=json.dumps(item))]
+            ),
+        )
+
+
+async def _call_tool(tool: Callable[..., Any], args: dict[str, Any]) -> Any:
+    with traced_call("tool", tool.__name__):
+        result = tool(**args)
+        if inspect.isawaitable(result):
+            result = await result
+    return result
+
+
+def _user_text(ctx: InvocationContext) -> str:
+    if not ctx.user_content or not ctx.user_content.parts:
+        return ""
+    return "".join(part.text or "" for part in ctx.user_content.parts)
+
+
+def build_stage_agent(
+    name: str,
+    tools: list[Callable[..., Any]],
+    instruction: str,
+    description: str = "",
+    output_key: str | None = None,
+) -> BaseAgent:
+    """
+    Build the agent of a pipeline stage.
+
+    By default the stage is a ToolRunnerAgent that calls `tools` in order and
+    streams their partial results (STREAM_PARTIAL_RESULTS=false to disable).
+    With AGENT_MODE=llm it is an LlmAgent following `instruction` instead,
+    which costs extra model turns to orchestrate the same tool calls.
+
+    :param name: The agent name
+    :param tools: The stage's tool functions, in call order
+    :param instruction: The LlmAgent instruction
+    :param description: The agent description
+    :param output_key: State key receiving the stage's final result
+    :return: The stage agent
+    """
+    if os.getenv("AGENT_MODE", "deterministic") == "llm":
+        return LlmAgent(
+            name=name,
+            model=stage_model(name),
+            description=description,
+            instruction=instruction,
+            tools=tools,
+            output_key=output_key,
+        )
+    return ToolRunnerAgent(
+        name=name,
+        description=description,
+        tools=tools,
+        output_key=output_key,
+        stream_partial_results=os.getenv("STREAM_PARTIAL_RESULTS", "true").lower()
+        == "true",
+    )
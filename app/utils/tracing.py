@@ -12,16 +12,221 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gzip
 import json
 import logging
+import os
+import threading
+import time
+from collections import deque
 from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from typing import Any
 
 import google.cloud.storage as storage
 from google.cloud import logging as google_cloud_logging
 from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+from opentelemetry.sdk.metrics.export import (
+    MetricExporter,
+    MetricExportResult,
+    MetricsData,
+)
 from opentelemetry.sdk.trace import ReadableSpan
-from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExportResult
+
+from app.utils.telemetry import meter
+
+# Cloud Logging write batching: entries per write, bytes per write (the API
+# accepts 10 MB), seconds an entry may wait, and entries buffered at most.
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))
+LOG_BATCH_MAX_BYTES = int(os.getenv("LOG_BATCH_MAX_BYTES", str(4 * 1024 * 1024)))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "5"))
+LOG_MAX_BUFFERED = int(os.getenv("LOG_MAX_BUFFERED", "10000"))
+
+# Span entries above this size have their largest attributes offloaded to GCS
+# (Cloud Logging rejects entries above 256 KB).
+MAX_LOG_ENTRY_BYTES = 255 * 1024
+# Seconds the bucket existence check is trusted, and concurrent GCS uploads
+GCS_BUCKET_CHECK_TTL = float(os.getenv("GCS_BUCKET_CHECK_TTL", "300"))
+GCS_UPLOAD_WORKERS = int(os.getenv("GCS_UPLOAD_WORKERS", "4"))
+# Uploads waiting at most; past that, offloaded attributes are dropped
+GCS_MAX_PENDING_UPLOADS = int(os.getenv("GCS_MAX_PENDING_UPLOADS", "100"))
+
+log_entry_count = meter.create_counter(
+    "seo_agent.log_writer.entries",
+    description="Log entries handled by the batched writer, by outcome "
+    "(written, dropped when the buffer is full, failed)",
+)
+offload_count = meter.create_counter(
+    "seo_agent.span_offload.uploads",
+    description="Span attribute payloads offloaded to GCS, by outcome "
+    "(uploaded, failed, skipped when the bucket is missing or uploads lag)",
+)
+log_write_duration = meter.create_histogram(
+    "seo_agent.log_writer.write.duration",
+    unit="ms",
+    description="Duration of the bulk Cloud Logging writes",
+)
+
+
+class BatchedLogWriter:
+    """
+    Buffers structured log entries and writes them with bulk Cloud Logging
+    writes, from a background thread.
+
+    A write is sent once `batch_size` entries or `max_batch_bytes` bytes are
+    buffered, or `flush_interval` seconds after the previous one. Callers never
+    wait for the network: when `max_buffered` entries are already waiting, new
+    entries are dropped and counted instead. Call `flush` or `close` to write
+    the buffered entries before the process exits.
+    """
+
+    def __init__(
+        self,
+        logger: Any,
+        batch_size: int = LOG_BATCH_SIZE,
+        max_batch_bytes: int = LOG_BATCH_MAX_BYTES,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        max_buffered: int = LOG_MAX_BUFFERED,
+    ) -> None:
+        """
+        Initialize the writer and start its background thread.
+
+        :param logger: The Cloud Logging logger
+        :param batch_size: Maximum entries per write
+        :param max_batch_bytes: Maximum estimated bytes per write
+        :param flush_interval: Maximum seconds between two writes
+        :param max_buffered: Maximum entries waiting to be written
+        """
+        self.logger = logger
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        # (entry, estimated size, log_struct keyword arguments)
+        self._entries: deque[tuple[dict, int, dict]] = deque()
+        self._buffered_bytes = 0
+        self._writing = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._counts = {"written": 0, "dropped": 0, "failed": 0, "writes": 0}
+        self._thread = threading.Thread(
+            target=self._run, name="log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def log_struct(self, info: dict, size: int = 0, **kwargs: Any) -> bool:
+        """
+        Queue a structured entry, as `Logger.log_struct` would write it.
+
+        :param info: The entry payload
+        :param size: Estimated size of the entry in bytes, if known
+        :param kwargs: Arguments of `log_struct`, e.g. labels and severity
+        :return: Whether the entry was queued, rather than dropped
+        """
+        with self._cond:
+            if self._closed or len(self._entries) >= self.max_buffered:
+                self._counts["dropped"] += 1
+                log_entry_count.add(1, {"outcome": "dropped"})
+                return False
+            self._entries.append((info, size, kwargs))
+            self._buffered_bytes += size
+            if self._batch_ready():
+                self._cond.notify_all()
+        return True
+
+    def _batch_ready(self) -> bool:
+        return (
+            len(self._entries) >= self.batch_size
+            or self._buffered_bytes >= self.max_batch_bytes
+        )
+
+    def _take_batch(self) -> list[tuple[dict, int, dict]]:
+        """Dequeue the next batch; the caller holds the lock."""
+        batch: list[tuple[dict, int, dict]] = []
+        batch_bytes = 0
+        while self._entries and len(batch) < self.batch_size:
+            size = self._entries[0][1]
+            if batch and batch_bytes + size > self.max_batch_bytes:
+                break
+            batch.append(self._entries.popleft())
+            batch_bytes += size
+        self._buffered_bytes -= batch_bytes
+        self._writing += 1
+        return batch
+
+    def _write(self, batch: list[tuple[dict, int, dict]]) -> None:
+        start = time.perf_counter()
+        try:
+            bulk = self.logger.batch()
+            for info, _, kwargs in batch:
+                bulk.log_struct(info, **kwargs)
+            bulk.commit()
+            outcome = "written"
+        except Exception as e:
+            logging.warning(f"Failed to write {len(batch)} log entries: {e}")
+            outcome = "failed"
+        log_write_duration.record((time.perf_counter() - start) * 1000)
+        log_entry_count.add(len(batch), {"outcome": outcome})
+        with self._cond:
+            self._counts[outcome] += len(batch)
+            self._counts["writes"] += 1
+            self._writing -= 1
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or self._batch_ready(),
+                    timeout=self.flush_interval,
+                )
+                if not self._entries:
+                    if self._closed:
+                        return
+                    continue
+                batch = self._take_batch()
+            self._write(batch)
+
+    def flush(self, timeout: float = 30) -> bool:
+        """
+        Write every buffered entry now, from the calling thread.
+
+        :param timeout: Seconds to wait for writes already in progress
+        :return: Whether everything was written before the timeout
+        """
+        while True:
+            with self._cond:
+                if not self._entries:
+                    break
+                batch = self._take_batch()
+            self._write(batch)
+        with self._cond:
+            return self._cond.wait_for(lambda: self._writing == 0, timeout=timeout)
+
+    def close(self, timeout: float = 30) -> bool:
+        """
+        Stop accepting entries, write the buffered ones and stop the thread.
+
+        :param timeout: Seconds to wait for the final writes
+        :return: Whether everything was written before the timeout
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        flushed = self.flush(timeout)
+        self._thread.join(timeout)
+        return flushed
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return the writer's counters.
+
+        :return: Entries written, dropped and failed, writes sent, and entries
+            currently buffered
+        """
+        with self._cond:
+            return {**self._counts, "buffered": len(self._entries)}
 
 
 class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
@@ -31,6 +236,11 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
 
     This class helps bypass the 256 character limit of Cloud Trace for attribute values
     by leveraging Cloud Logging (which has a 256KB limit) and Cloud Storage for larger payloads.
+
+    Log entries are written in bulk by a BatchedLogWriter, so exporting never waits
+    for Cloud Logging; `force_flush` and `shutdown` write the buffered entries.
+    Use it with a FlushingBatchSpanProcessor, so that flushing the tracer
+    provider reaches `force_flush`.
     """
 
     def __init__(
@@ -56,11 +266,19 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             project=self.project_id
         )
         self.logger = self.logging_client.logger(__name__)
+        self.log_writer = BatchedLogWriter(self.logger)
         self.storage_client = storage_client or storage.Client(project=self.project_id)
         self.bucket_name = (
             bucket_name or f"{self.project_id}-seo-agent-logs-data"
         )
         self.bucket = self.storage_client.bucket(self.bucket_name)
+        # (checked at, exists) of the last bucket existence check
+        self._bucket_check: tuple[float, bool] | None = None
+        self._uploads = ThreadPoolExecutor(
+            max_workers=GCS_UPLOAD_WORKERS, thread_name_prefix="span-offload"
+        )
+        self._pending_uploads: set[Future] = set()
+        self._uploads_lock = threading.Lock()
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """
@@ -73,21 +291,24 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             span_context = span.get_span_context()
             trace_id = format(span_context.trace_id, "x")
             span_id = format(span_context.span_id, "x")
-            span_dict = json.loads(span.to_json())
+            span_json = span.to_json(indent=None)
+            span_dict = json.loads(span_json)
 
             span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
             span_dict["span_id"] = span_id
 
             span_dict = self._process_large_attributes(
-                span_dict=span_dict, span_id=span_id
+                span_dict=span_dict, span_id=span_id, span_size=len(span_json)
             )
 
             if self.debug:
                 print(span_dict)
 
-            # Log the span data to Google Cloud Logging
-            self.logger.log_struct(
+            # Queue the span data for Google Cloud Logging
+            self.log_writer.log_struct(
                 span_dict,
+                # Larger entries have had attributes offloaded to GCS
+                size=min(len(span_json), MAX_LOG_ENTRY_BYTES),
                 labels={
                     "type": "agent_telemetry",
                     "service_name": "seo-agent",
@@ -97,55 +318,254 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         # Export spans to Google Cloud Trace using the parent class method
         return super().export(spans)
 
-    def store_in_gcs(self, content: str, span_id: str) -> str:
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """
+        Finish the pending GCS uploads and write the log entries buffered so far.
+
+        :param timeout_millis: Maximum time to wait for the uploads and writes
+        :return: Whether everything completed in time
+        """
+        deadline = time.monotonic() + timeout_millis / 1000
+        with self._uploads_lock:
+            pending = list(self._pending_uploads)
+        _, not_done = wait(pending, timeout=timeout_millis / 1000)
+        flushed = self.log_writer.flush(max(0.0, deadline - time.monotonic()))
+        return flushed and not not_done
+
+    def shutdown(self) -> None:
+        """Finish the pending uploads, write the buffered log entries and stop."""
+        self._uploads.shutdown(wait=True)
+        self.log_writer.close()
+        super().shutdown()
+
+    def _bucket_exists(self) -> bool:
+        """Check that the bucket exists, at most once per GCS_BUCKET_CHECK_TTL."""
+        now = time.monotonic()
+        checked_at = self._bucket_check[0] if self._bucket_check else None
+        if checked_at is None or now - checked_at > GCS_BUCKET_CHECK_TTL:
+            try:
+                exists = self.bucket.exists()
+            except Exception as e:
+                logging.warning(f"Could not check bucket {self.bucket_name}: {e}")
+                exists = False
+            self._bucket_check = (now, exists)
+        return self._bucket_check[1]
+
+    def store_in_gcs(self, content: str | bytes, span_id: str) -> str:
         """
-        Initiate storing large content in Google Cloud Storage/
+        Initiate storing large content in Google Cloud Storage, gzip-compressed.
+
+        The upload runs on a background thread, so the export does not wait for
+        it; `force_flush` and `shutdown` wait for the pending uploads. The object
+        is stored with Content-Encoding gzip, so GCS serves it decompressed.
 
-        :param content: The content to store
+        :param content: The JSON content to store
         :param span_id: The ID of the span
-        :return: The  GCS URI of the stored content
+        :return: The GCS URI the content is uploaded to, or a message saying why
+            it is not
         """
-        if not self.storage_client.bucket(self.bucket_name).exists():
+        if not self._bucket_exists():
             logging.warning(
                 f"Bucket {self.bucket_name} not found. "
                 "Unable to store span attributes in GCS."
             )
+            offload_count.add(1, {"outcome": "skipped"})
             return "GCS bucket not found"
+        with self._uploads_lock:
+            if len(self._pending_uploads) >= GCS_MAX_PENDING_UPLOADS:
+                offload_count.add(1, {"outcome": "skipped"})
+                return "GCS uploads backlogged, payload dropped"
 
         blob_name = f"spans/{span_id}.json"
-        blob = self.bucket.blob(blob_name)
+        if isinstance(content, str):
+            content = content.encode()
+
+        def upload() -> None:
+            try:
+                blob = self.bucket.blob(blob_name)
+                blob.content_encoding = "gzip"
+                blob.upload_from_string(
+                    gzip.compress(content, compresslevel=6), "application/json"
+                )
+                offload_count.add(1, {"outcome": "uploaded"})
+            except Exception as e:
+                logging.warning(f"Failed to upload span attributes to GCS: {e}")
+                offload_count.add(1, {"outcome": "failed"})
 
-        blob.upload_from_string(content, "application/json")
+        future = self._uploads.submit(upload)
+        with self._uploads_lock:
+            self._pending_uploads.add(future)
+        future.add_done_callback(self._upload_done)
         return f"gs://{self.bucket_name}/{blob_name}"
 
-    def _process_large_attributes(self, span_dict: dict, span_id: str) -> dict:
+    def _upload_done(self, future: Future) -> None:
+        with self._uploads_lock:
+            self._pending_uploads.discard(future)
+
+    def _process_large_attributes(
+        self, span_dict: dict, span_id: str, span_size: int | None = None
+    ) -> dict:
         """
-        Process large attribute values by storing them in GCS if they exceed the size
-        limit of Google Cloud Logging.
+        Process large attribute values by storing them in GCS if the span exceeds
+        the size limit of Google Cloud Logging.
+
+        Sizes are estimated from the attribute values, without serializing the
+        span again. Only the largest attributes are offloaded, until the rest of
+        the span fits; the offloaded names are listed under
+        "offloaded_attributes".
 
         :param span_dict: The span data dictionary
-        :param trace_id: The trace ID
         :param span_id: The span ID
+        :param span_size: Size of the serialized span, if known
         :return: The updated span dictionary
         """
         attributes = span_dict["attributes"]
-        if len(json.dumps(attributes).encode()) > 255 * 1024:  # 250 KB
-            # Separate large payload from other attributes
-            attributes_payload = dict(attributes.items())
-            attributes_retain = dict(attributes.items())
-
-            # Store large payload in GCS
-            gcs_uri = self.store_in_gcs(json.dumps(attributes_payload), span_id)
-            attributes_retain["uri_payload"] = gcs_uri
-            attributes_retain["url_payload"] = (
-                f"https://storage.mtls.cloud.google.com/"
-                f"{self.bucket_name}/spans/{span_id}.json"
-            )
+        sizes = {key: _estimated_size(value) for key, value in attributes.items()}
+        attributes_size = sum(len(key) + 4 + size for key, size in sizes.items())
+        if span_size is None:
+            span_size = attributes_size + 2048
+        if span_size <= MAX_LOG_ENTRY_BYTES:
+            return span_dict
 
-            span_dict["attributes"] = attributes_retain
-            logging.info(
-                "Length of payload span above 250 KB, storing attributes in GCS "
-                "to avoid large log entry errors"
-            )
+        # Room left for attributes once the rest of the span and the GCS links
+        # are accounted for
+        budget = MAX_LOG_ENTRY_BYTES - (span_size - attributes_size) - 1024
+        attributes_retain = dict(attributes)
+        attributes_payload = {}
+        for key in sorted(sizes, key=sizes.get, reverse=True):
+            if attributes_size <= budget:
+                break
+            attributes_payload[key] = attributes_retain.pop(key)
+            attributes_size -= len(key) + 4 + sizes[key]
+
+        # Store large payload in GCS
+        gcs_uri = self.store_in_gcs(json.dumps(attributes_payload), span_id)
+        attributes_retain["offloaded_attributes"] = list(attributes_payload)
+        attributes_retain["uri_payload"] = gcs_uri
+        attributes_retain["url_payload"] = (
+            f"https://storage.mtls.cloud.google.com/"
+            f"{self.bucket_name}/spans/{span_id}.json"
+        )
+
+        span_dict["attributes"] = attributes_retain
+        logging.info(
+            "Length of payload span above 250 KB, storing "
+            f"{len(attributes_payload)} attributes in GCS "
+            "to avoid large log entry errors"
+        )
 
         return span_dict
+
+
+class FlushingBatchSpanProcessor(BatchSpanProcessor):
+    """
+    A BatchSpanProcessor whose `force_flush` also flushes its exporter.
+
+    The SDK processor only exports its queued spans on `force_flush`, so the
+    entries an exporter buffers itself, such as the log entries and uploads of
+    CloudTraceLoggingSpanExporter, would wait for the next write interval.
+    The exporter must have a `force_flush(timeout_millis)`.
+    """
+
+    def force_flush(self, timeout_millis: int | None = None) -> bool:
+        """
+        Export the queued spans, then flush the exporter.
+
+        :param timeout_millis: Maximum time to wait for both
+        :return: Whether everything was flushed in time
+        """
+        timeout_millis = 30000 if timeout_millis is None else timeout_millis
+        deadline = time.monotonic() + timeout_millis / 1000
+        if not super().force_flush(timeout_millis):
+            return False
+        remaining_millis = max(0, int((deadline - time.monotonic()) * 1000))
+        return self.span_exporter.force_flush(remaining_millis)
+
+
+def _estimated_size(value: Any) -> int:
+    """Estimate the JSON size of an attribute value, without serializing it."""
+    if isinstance(value, str):
+        # Quotes, plus escapes and multi-byte characters, roughly
+        return len(value.encode()) + 2
+    if isinstance(value, list | tuple):
+        return 2 + sum(_estimated_size(item) + 1 for item in value)
+    if isinstance(value, dict):
+        return 2 + sum(
+            len(key) + 4 + _estimated_size(item) for key, item in value.items()
+        )
+    return 8
+
+
+class CloudLoggingMetricExporter(MetricExporter):
+    """
+    Exports OpenTelemetry metrics as structured entries of the Cloud Logging
+    logger used for spans by CloudTraceLoggingSpanExporter.
+
+    Each export writes one entry listing the data points of every metric:
+    value for counters, and count, sum, min, max and bucket counts for
+    histograms.
+    """
+
+    def __init__(self, logger: Any, **kwargs: Any) -> None:
+        """
+        Initialize the exporter.
+
+        :param logger: The Cloud Logging logger, e.g. the span exporter's
+        :param kwargs: Additional arguments to pass to the parent class
+        """
+        super().__init__(**kwargs)
+        self.logger = logger
+
+    def export(
+        self, metrics_data: MetricsData, timeout_millis: float = 10_000, **kwargs: Any
+    ) -> MetricExportResult:
+        """
+        Write the data points of a collection to Cloud Logging.
+
+        :param metrics_data: The metrics collected by the reader
+        :param timeout_millis: Unused, the write is synchronous
+        :return: The result of the export operation
+        """
+        points = [
+            {
+                "metric": metric.name,
+                "unit": metric.unit,
+                "attributes": dict(point.attributes or {}),
+                **_point_values(point),
+            }
+            for resource_metrics in metrics_data.resource_metrics
+            for scope_metrics in resource_metrics.scope_metrics
+            for metric in scope_metrics.metrics
+            for point in metric.data.data_points
+        ]
+        if not points:
+            return MetricExportResult.SUCCESS
+        try:
+            self.logger.log_struct(
+                {"metrics": points},
+                labels={"type": "agent_metrics", "service_name": "seo-agent"},
+                severity="INFO",
+            )
+        except Exception as e:
+            logging.warning(f"Failed to export metrics: {e}")
+            return MetricExportResult.FAILURE
+        return MetricExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: float = 10_000) -> bool:
+        return True
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs: Any) -> None:
+        return None
+
+
+def _point_values(point: Any) -> dict[str, Any]:
+    if hasattr(point, "bucket_counts"):
+        return {
+            "count": point.count,
+            "sum": point.sum,
+            "min": point.min,
+            "max": point.max,
+            "bucket_counts": list(point.bucket_counts),
+            "explicit_bounds": list(point.explicit_bounds),
+        }
+    return {"value": point.value}
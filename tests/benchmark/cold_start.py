@@ -0,0 +1,185 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cold-start benchmark of the app package.
+
+Each scenario runs in a fresh interpreter under `python -X importtime`, so
+nothing is already imported. The benchmark reports the wall time of the
+scenario, the number of modules it imported and the packages that took the
+most import time. Cloud clients are replaced by offline stand-ins, so no
+network access or credentials are needed.
+
+Usage:
+    uv run python tests/benchmark/cold_start.py --runs 5
+    uv run python tests/benchmark/cold_start.py --max-ms import_app=500
+
+With --max-ms, the exit status is 1 when the median of a scenario exceeds its
+budget, which lets CI catch cold-start regressions.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+_TIMER = """
+import json, time
+_start = time.perf_counter()
+{body}
+print(json.dumps({{"wall_ms": (time.perf_counter() - _start) * 1000}}))
+"""
+
+_SET_UP = """
+from unittest import mock
+from google.auth.credentials import AnonymousCredentials
+import vertexai
+vertexai.init(
+    project="bench-project", location="us-central1", credentials=AnonymousCredentials()
+)
+from app.agent_engine_app import AgentEngineApp
+import app
+with mock.patch("google.cloud.logging.Client"), mock.patch(
+    "google.auth.default", return_value=(AnonymousCredentials(), "bench-project")
+):
+    AgentEngineApp(agent=app.root_agent).set_up()
+"""
+
+# Scenario name -> code whose cold execution is timed
+SCENARIOS = {
+    "import_app": "import app",
+    "build_root_agent": "import app\napp.root_agent",
+    "agent_engine_set_up": _SET_UP,
+}
+
+_IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _package(module: str) -> str:
+    parts = module.split(".")
+    # Namespace packages such as google.* are grouped one level deeper.
+    return ".".join(parts[:2] if parts[0] == "google" and len(parts) > 1 else parts[:1])
+
+
+def run_scenario(code: str) -> dict[str, Any]:
+    """
+    Run `code` in a fresh interpreter with -X importtime.
+
+    :param code: The Python code to time
+    :return: Wall time, module count and self import time per package
+    """
+    env = {
+        **os.environ,
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "benchmark-key"),
+        "GOOGLE_CLOUD_PROJECT": "bench-project",
+    }
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _TIMER.format(body=code)],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr[-2000:])
+    by_package: dict[str, float] = defaultdict(float)
+    modules = 0
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            modules += 1
+            by_package[_package(match.group(4))] += int(match.group(1)) / 1000
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["modules"] = modules
+    result["import_ms_by_package"] = dict(by_package)
+    return result
+
+
+def benchmark(runs: int, top: int) -> dict[str, dict[str, Any]]:
+    """
+    Run every scenario `runs` times.
+
+    :param runs: Number of cold runs per scenario
+    :param top: Number of slowest packages to report per scenario
+    :return: The median wall time, module count and slowest packages per scenario
+    """
+    report = {}
+    for name, code in SCENARIOS.items():
+        results = [run_scenario(code) for _ in range(runs)]
+        packages: dict[str, list[float]] = defaultdict(list)
+        for result in results:
+            for package, ms in result["import_ms_by_package"].items():
+                packages[package].append(ms)
+        slowest = sorted(
+            (
+                (package, statistics.median(times))
+                for package, times in packages.items()
+            ),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:top]
+        report[name] = {
+            "wall_ms_median": round(
+                statistics.median(result["wall_ms"] for result in results), 1
+            ),
+            "wall_ms_min": round(min(result["wall_ms"] for result in results), 1),
+            "modules": results[-1]["modules"],
+            "slowest_packages_ms": {package: round(ms, 1) for package, ms in slowest},
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--max-ms",
+        action="append",
+        default=[],
+        metavar="SCENARIO=MS",
+        help="Fail when the median wall time of SCENARIO exceeds MS",
+    )
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = benchmark(args.runs, args.top)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text)
+
+    failed = False
+    for budget in args.max_ms:
+        name, _, max_ms = budget.partition("=")
+        if report[name]["wall_ms_median"] > float(max_ms):
+            print(
+                f"{name}: {report[name]['wall_ms_median']} ms > {max_ms} ms",
+                file=sys.stderr,
+            )
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
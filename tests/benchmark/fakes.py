@@ -0,0 +1,291 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline stand-ins for SerpAPI, the genai client and the page fetcher.
+
+Each stand-in answers like the real service for the requests the tools make,
+with synthetic but deterministic data, after a latency drawn from a
+configurable distribution, and fails at a configurable rate with the errors
+the real service returns (throttling, 503).
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import types
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from google.genai.types import GenerateContentResponse
+from pydantic import BaseModel
+
+
+@dataclass
+class LatencyModel:
+    """Latency and error distribution of a fake service."""
+
+    mean: float = 0.0
+    # "fixed", "uniform" (0 to 2 x mean) or "lognormal" (long tail)
+    distribution: str = "lognormal"
+    error_rate: float = 0.0
+    seed: int = 0
+    _random: random.Random = field(init=False, repr=False)
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+
+    def __post_init__(self) -> None:
+        self._random = random.Random(self.seed)
+
+    def draw(self) -> tuple[float, bool]:
+        """Return a latency in seconds and whether the call fails."""
+        with self._lock:
+            fails = self._random.random() < self.error_rate
+            if self.mean <= 0 or self.distribution == "fixed":
+                return max(self.mean, 0.0), fails
+            if self.distribution == "uniform":
+                return self._random.uniform(0, 2 * self.mean), fails
+            # sigma=0.5 keeps the mean close to `mean` with a p99 around 3x
+            return self._random.lognormvariate(0, 0.5) * self.mean / 1.13, fails
+
+
+def _stable_int(text: str) -> int:
+    return int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+
+
+def synthetic_serp(total: int, query: str = "") -> list[dict[str, Any]]:
+    """
+    Build `total` organic results mixing brand sites (some with several
+    results), marketplaces, video and encyclopedia pages.
+
+    :param total: Number of results
+    :param query: The search query; different queries get mostly different
+        brands
+    :return: The results, by position
+    """
+    brands = max(1, total * 2 // 3)
+    first_brand = _stable_int(query) % 1000 if query else 0
+    results = []
+    for i in range(total):
+        if i % 9 == 4:
+            link = f"https://www.youtube.com/watch?v=v{i}"
+        elif i % 9 == 7:
+            link = f"https://fr.wikipedia.org/wiki/Article_{i}"
+        elif i % 13 == 11:
+            link = f"https://www.amazon.fr/dp/B{i:08d}"
+        else:
+            link = f"https://www.brand{first_brand + i % brands}.com/products/item-{i}"
+        results.append(
+            {
+                "position": i + 1,
+                "title": f"Result {i + 1}",
+                "link": link,
+                "snippet": f"Snippet of result {i + 1}.",
+            }
+        )
+    return results
+
+
+class FakeServiceError(Exception):
+    """A transient server-side failure (HTTP 503)."""
+
+    code = 503
+
+
+class FakeSerpApi:
+    """Serves a synthetic SERP of `total` results through the GoogleSearch API."""
+
+    def __init__(self, total: int, latency: LatencyModel) -> None:
+        self.total = total
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def search_class(self) -> type:
+        fake = self
+
+        class GoogleSearch:
+            def __init__(self, params: dict[str, Any]) -> None:
+                self.params = params
+
+            def get_dict(self) -> dict[str, Any]:
+                return fake.search(self.params)
+
+        return GoogleSearch
+
+    def search(self, params: dict[str, Any]) -> dict[str, Any]:
+        with self._lock:
+            self.calls += 1
+        delay, fails = self.latency.draw()
+        time.sleep(delay)
+        if fails:
+            return {"error": "Your account has exceeded the hourly throughput limit."}
+        start, num = params["start"], params["num"]
+        page = synthetic_serp(self.total, params.get("q", ""))[start : start + num]
+        if not page:
+            return {"error": "Google hasn't returned any results for this query."}
+        return {"organic_results": page}
+
+
+class FakeModels:
+    """Answers `generate_content` requests like Gemini would for each tool."""
+
+    def __init__(self, latency: LatencyModel, text_chars: int = 2000) -> None:
+        self.latency = latency
+        self.text_chars = text_chars
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    async def generate_content(
+        self, model: str, contents: Any, config: Any = None
+    ) -> GenerateContentResponse:
+        with self._lock:
+            self.calls += 1
+        delay, fails = self.latency.draw()
+        await asyncio.sleep(delay)
+        if fails:
+            raise FakeServiceError("503 UNAVAILABLE")
+        return _response(self._answer(str(contents), config))
+
+    def _answer(self, prompt: str, config: Any) -> str:
+        schema = getattr(config, "response_schema", None)
+        if isinstance(schema, types.GenericAlias):
+            # Batch product page classification: one verdict per listed URL
+            return json.dumps(
+                [
+                    {"url": url, "is_product_page": _stable_int(url) % 4 != 0}
+                    for url in re.findall(r"- URL: (\S+)", prompt)
+                ]
+            )
+        if isinstance(schema, type) and issubclass(schema, BaseModel):
+            name = _stable_int(prompt) % 1000
+            return json.dumps(
+                {
+                    "company_name": f"Company {name}",
+                    "num_employees": str(10 + name),
+                    "email": f"contact@company{name}.com",
+                }
+            )
+        single_url = re.search(r"\nURL: (\S+)\s*$", prompt)
+        if single_url:
+            return "yes" if _stable_int(single_url.group(1)) % 4 else "no"
+        return ("Lorem ipsum dolor sit amet. " * (self.text_chars // 28 + 1))[
+            : self.text_chars
+        ]
+
+
+class FakeCaches:
+    """Model-side context caches: creation always succeeds."""
+
+    async def create(self, model: str, config: Any) -> Any:
+        return types.SimpleNamespace(name=f"cachedContents/{_stable_int(model)}")
+
+    async def delete(self, name: str) -> None:
+        return None
+
+
+def _response(text: str) -> GenerateContentResponse:
+    return GenerateContentResponse.model_validate(
+        {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+    )
+
+
+class FakeFetcher:
+    """Returns synthetic page text; one page in three looks like a shop."""
+
+    def __init__(self, latency: LatencyModel) -> None:
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _text(self, url: str, max_chars: int) -> str:
+        with self._lock:
+            self.calls += 1
+        commerce = (
+            "Add to cart. In stock. Free shipping. " if _stable_int(url) % 3 else ""
+        )
+        return (f"Page {url}. {commerce}" + "Some page content. " * 200)[:max_chars]
+
+    def fetch_text(self, url: str, max_chars: int = 3000) -> str:
+        delay, fails = self.latency.draw()
+        time.sleep(delay)
+        return "" if fails else self._text(url, max_chars)
+
+    async def afetch_text(self, url: str, max_chars: int = 3000) -> str:
+        delay, fails = self.latency.draw()
+        await asyncio.sleep(delay)
+        return "" if fails else self._text(url, max_chars)
+
+    def is_host_dead(self, host: str) -> bool:
+        return False
+
+
+@dataclass
+class FakeBackends:
+    serpapi: FakeSerpApi
+    models: FakeModels
+    fetcher: FakeFetcher
+
+    def calls(self) -> dict[str, int]:
+        return {
+            "serpapi_calls": self.serpapi.calls,
+            "model_calls": self.models.calls,
+            "page_fetches": self.fetcher.calls,
+        }
+
+
+@contextmanager
+def fake_backends(
+    results: int,
+    serp_latency: LatencyModel,
+    model_latency: LatencyModel,
+    fetch_latency: LatencyModel,
+) -> Any:
+    """
+    Swap SerpAPI, the genai client and the page fetcher for offline fakes.
+
+    :param results: Number of organic results the fake SERP holds
+    :return: The FakeBackends, whose counters track the calls made
+    """
+    from unittest import mock
+
+    from app.sub_agents.search_agent import agent as search_module
+    from app.utils import fetcher as fetcher_module
+    from app.utils import genai_clients
+
+    backends = FakeBackends(
+        serpapi=FakeSerpApi(results, serp_latency),
+        models=FakeModels(model_latency),
+        fetcher=FakeFetcher(fetch_latency),
+    )
+    client = types.SimpleNamespace(
+        aio=types.SimpleNamespace(models=backends.models, caches=FakeCaches())
+    )
+    with ExitStack() as stack:
+        stack.enter_context(
+            mock.patch.object(
+                search_module, "GoogleSearch", backends.serpapi.search_class()
+            )
+        )
+        stack.enter_context(mock.patch.object(genai_clients, "_client", client))
+        stack.enter_context(
+            mock.patch.object(fetcher_module, "_fetcher", backends.fetcher)
+        )
+        yield backends
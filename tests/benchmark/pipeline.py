@@ -0,0 +1,291 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline end-to-end benchmark of the pipeline and of each tool.
+
+SerpAPI, the genai client and the page fetcher are replaced by the stand-ins
+of fakes.py, so no network access or credentials are needed. Every scenario
+runs with cold caches, for each requested SERP size, and reports its wall
+time (median of --repeat runs), the calls made to each backend, and its peak
+Python memory (measured with tracemalloc in one extra run).
+
+Usage:
+    uv run python tests/benchmark/pipeline.py --results 10,50,100
+    uv run python tests/benchmark/pipeline.py --model-latency 0.5 --error-rate 0.05
+    uv run python tests/benchmark/pipeline.py --max-wall-ms root_agent@100=3000
+
+With --max-wall-ms, the exit status is 1 when the median wall time of a
+scenario (at a SERP size) exceeds its budget, so regressions can be gated.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from fakes import LatencyModel, fake_backends
+
+QUERY = "chaussures de running"
+
+# Offline runs: no credentials, no pacing, no cross-run caching.
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+os.environ.setdefault("SERPAPI_KEY", "benchmark-key")
+os.environ.setdefault("CACHE_PATH", os.path.join(tempfile.mkdtemp(), "cache.db"))
+os.environ.setdefault("LLM_CACHE", "false")
+os.environ.setdefault("GEMINI_QPS", "0")
+os.environ.setdefault("SERPAPI_QPS", "0")
+os.environ.setdefault("RATE_LIMIT_BASE_BACKOFF", "0.05")
+
+
+def clear_caches() -> None:
+    """Empty the stage caches so that every run starts cold."""
+    from app.sub_agents.company_info_agent import agent as company_module
+    from app.sub_agents.company_info_agent import prefilter
+    from app.sub_agents.gso_analyser_agent import agent as analyser_module
+    from app.sub_agents.search_agent import agent as search_module
+
+    for cache in (
+        search_module.serp_cache,
+        prefilter.domain_verdict_cache,
+        company_module.company_info_cache,
+        analyser_module.gso_url_analysis_cache,
+    ):
+        cache.clear()
+
+
+async def run_root_agent(state: dict[str, Any]) -> None:
+    """Run the whole pipeline through an ADK runner, as in production."""
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+
+    from app.agent import root_agent
+
+    runner = InMemoryRunner(agent=root_agent, app_name="benchmark")
+    session = await runner.session_service.create_session(
+        app_name="benchmark", user_id="benchmark"
+    )
+    message = types.Content(role="user", parts=[types.Part(text=QUERY)])
+    async for _ in runner.run_async(
+        user_id="benchmark", session_id=session.id, new_message=message
+    ):
+        pass
+
+
+def tool_scenarios() -> dict[str, Callable[[dict[str, Any]], Awaitable[Any]]]:
+    """Return the tool scenarios; each one reads its inputs from `state`."""
+    from app.sub_agents.company_info_agent import agent as company_module
+    from app.sub_agents.gso_analyser_agent import agent as analyser_module
+    from app.sub_agents.gso_improver import agent as improver_module
+    from app.sub_agents.search_agent import agent as search_module
+
+    async def search_google(state: dict[str, Any]) -> Any:
+        return search_module.search_google(QUERY, SimpleNamespace(state=state))
+
+    def tool(func: Callable[..., Awaitable[Any]]) -> Callable:
+        return lambda state: func(SimpleNamespace(state=state))
+
+    return {
+        "search_google": search_google,
+        "filter_product_pages": tool(company_module.filter_product_pages),
+        "get_infos_companies": tool(company_module.get_infos_companies),
+        "generate_gso_analysis": tool(analyser_module.generate_gso_analysis),
+        "generate_gso_recommendation": tool(
+            improver_module.generate_gso_recommendation
+        ),
+        "root_agent": run_root_agent,
+    }
+
+
+async def pipeline_state(
+    scenarios: dict[str, Callable], results: int
+) -> dict[str, Any]:
+    """Run the tools in order once, without latency, to get each tool's inputs."""
+    none = LatencyModel(0, "fixed")
+    state: dict[str, Any] = {}
+    clear_caches()
+    with fake_backends(results, none, none, none):
+        for name in ("search_google", "filter_product_pages", "get_infos_companies"):
+            await scenarios[name](state)
+        # Stored by the analyser agent's output_key rather than by the tool
+        state["summary_best_brands_content"] = await scenarios["generate_gso_analysis"](
+            state
+        )
+    return state
+
+
+async def measure(
+    scenario: Callable[[dict[str, Any]], Awaitable[Any]],
+    state: dict[str, Any],
+    results: int,
+    latency: dict[str, LatencyModel],
+    trace_memory: bool,
+) -> dict[str, Any]:
+    """Run a scenario once with cold caches and return its measurements."""
+    clear_caches()
+    with fake_backends(results, **latency) as backends:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        await scenario(dict(state))
+        wall_ms = (time.perf_counter() - start) * 1000
+        measurements = {"wall_ms": wall_ms, **backends.calls()}
+        if trace_memory:
+            measurements["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+    return measurements
+
+
+async def benchmark(
+    result_counts: list[int],
+    only: list[str] | None,
+    repeat: int,
+    latency: dict[str, LatencyModel],
+) -> list[dict[str, Any]]:
+    """
+    Measure every scenario at every SERP size.
+
+    :param result_counts: SERP sizes to run
+    :param only: Scenario names to run, or None for all
+    :param repeat: Timed runs per scenario and size
+    :param latency: Latency models of the serp, model and fetch backends
+    :return: One report row per scenario and size
+    """
+    scenarios = tool_scenarios()
+    rows = []
+    for results in result_counts:
+        state = await pipeline_state(scenarios, results)
+        for name, scenario in scenarios.items():
+            if only and name not in only:
+                continue
+            runs = [
+                await measure(scenario, state, results, latency, trace_memory=False)
+                for _ in range(repeat)
+            ]
+            traced = await measure(scenario, state, results, latency, trace_memory=True)
+            rows.append(
+                {
+                    "scenario": name,
+                    "results": results,
+                    "wall_ms_median": round(
+                        statistics.median(run["wall_ms"] for run in runs), 1
+                    ),
+                    "wall_ms_min": round(min(run["wall_ms"] for run in runs), 1),
+                    "model_calls": runs[-1]["model_calls"],
+                    "serpapi_calls": runs[-1]["serpapi_calls"],
+                    "page_fetches": runs[-1]["page_fetches"],
+                    "peak_memory_mb": round(traced["peak_memory_mb"], 2),
+                }
+            )
+    return rows
+
+
+def print_table(rows: list[dict[str, Any]]) -> None:
+    columns = list(rows[0])
+    widths = [max(len(col), *(len(str(row[col])) for row in rows)) for col in columns]
+    print(
+        "  ".join(col.ljust(width) for col, width in zip(columns, widths, strict=True))
+    )
+    for row in rows:
+        print(
+            "  ".join(
+                str(row[col]).ljust(width)
+                for col, width in zip(columns, widths, strict=True)
+            )
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--results", default="10,50,100", help="SERP sizes")
+    parser.add_argument("--only", help="Comma-separated scenarios to run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--serp-latency", type=float, default=0.3)
+    parser.add_argument("--model-latency", type=float, default=1.0)
+    parser.add_argument("--fetch-latency", type=float, default=0.1)
+    parser.add_argument(
+        "--distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--max-wall-ms",
+        action="append",
+        default=[],
+        metavar="SCENARIO@RESULTS=MS",
+        help="Fail when the median wall time of SCENARIO at RESULTS exceeds MS",
+    )
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # ADK closes its agent spans from another context when a run ends
+    logging.getLogger("opentelemetry.context").setLevel(logging.CRITICAL)
+    latency = {
+        f"{backend}_latency": LatencyModel(
+            mean, args.distribution, args.error_rate, seed=args.seed + index
+        )
+        for index, (backend, mean) in enumerate(
+            (
+                ("serp", args.serp_latency),
+                ("model", args.model_latency),
+                ("fetch", args.fetch_latency),
+            )
+        )
+    }
+    # The tools print model answers: keep the report readable.
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = asyncio.run(
+            benchmark(
+                [int(count) for count in args.results.split(",")],
+                args.only.split(",") if args.only else None,
+                args.repeat,
+                latency,
+            )
+        )
+    print_table(rows)
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, indent=2))
+
+    failed = False
+    for budget in args.max_wall_ms:
+        target, _, max_ms = budget.partition("=")
+        name, _, results = target.partition("@")
+        for row in rows:
+            if row["scenario"] == name and str(row["results"]) == results:
+                if row["wall_ms_median"] > float(max_ms):
+                    print(
+                        f"{target}: {row['wall_ms_median']} ms > {max_ms} ms",
+                        file=sys.stderr,
+                    )
+                    failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
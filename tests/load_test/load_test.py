@@ -15,7 +15,10 @@
 import json
 import logging
 import os
+import random
 import time
+import uuid
+from typing import Any
 
 from locust import HttpUser, between, task
 
@@ -25,9 +28,64 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize Vertex AI and load agent config
-with open("deployment_metadata.json") as f:
-    remote_agent_engine_id = json.load(f)["remote_agent_engine_id"]
+# SEO queries by locale: the head queries many users ask, and modifiers that
+# turn them into long-tail queries.
+QUERIES = {
+    "fr": [
+        "chaussures de running",
+        "meilleur aspirateur sans fil",
+        "matelas mémoire de forme",
+        "machine à café à grain",
+        "vélo électrique pliable",
+        "crème solaire bio",
+    ],
+    "en": [
+        "running shoes",
+        "best cordless vacuum",
+        "memory foam mattress",
+        "bean to cup coffee machine",
+        "folding electric bike",
+    ],
+    "de": [
+        "laufschuhe",
+        "akku staubsauger test",
+        "kaffeevollautomat",
+        "e-bike klappbar",
+    ],
+}
+MODIFIERS = {
+    "fr": ["pas cher", "avis", "pour femme", "promo", "comparatif", "made in france"],
+    "en": ["cheap", "review", "for women", "deals", "comparison", "uk"],
+    "de": ["günstig", "test", "damen", "angebot", "vergleich"],
+}
+
+# Share of requests repeating a head query (served by the pipeline cache once
+# computed); the others are long-tail queries seen once.
+REPEAT_RATIO = float(os.getenv("LOAD_TEST_REPEAT_RATIO", "0.5"))
+# Locale weights, e.g. "fr:3,en:1,de:1"
+LOCALE_WEIGHTS = {
+    locale: float(weight)
+    for locale, _, weight in (
+        item.partition(":")
+        for item in os.getenv("LOAD_TEST_LOCALES", "fr:3,en:1,de:1").split(",")
+    )
+}
+# Think time between two queries of a user, in seconds: "min,max"
+WAIT_MIN, WAIT_MAX = (
+    float(value) for value in os.getenv("LOAD_TEST_WAIT_TIME", "1,3").split(",")
+)
+
+# LOAD_TEST_HOST targets a local server (see local_server.py), which serves
+# the engine below, instead of the deployed agent engine.
+local_host = os.getenv("LOAD_TEST_HOST")
+if local_host:
+    remote_agent_engine_id = (
+        "projects/load-test-project/locations/us-central1/reasoningEngines/local"
+    )
+else:
+    # Initialize Vertex AI and load agent config
+    with open("deployment_metadata.json") as f:
+        remote_agent_engine_id = json.load(f)["remote_agent_engine_id"]
 
 parts = remote_agent_engine_id.split("/")
 project_id = parts[1]
@@ -35,7 +93,7 @@ location = parts[3]
 engine_id = parts[5]
 
 # Convert remote agent engine ID to streaming URL.
-base_url = f"https://{location}-aiplatform.googleapis.com"
+base_url = local_host or f"https://{location}-aiplatform.googleapis.com"
 url_path = f"/v1beta1/projects/{project_id}/locations/{location}/reasoningEngines/{engine_id}:streamQuery"
 
 logger.info("Using remote agent engine ID: %s", remote_agent_engine_id)
@@ -43,22 +101,69 @@ logger.info("Using base URL: %s", base_url)
 logger.info("Using URL path: %s", url_path)
 
 
+def pick_query(locale: str) -> str:
+    """Draw a query of `locale`, a repeated head query or a unique one."""
+    head = random.choice(QUERIES[locale])
+    if random.random() < REPEAT_RATIO:
+        return head
+    return f"{head} {random.choice(MODIFIERS[locale])} {uuid.uuid4().hex[:6]}"
+
+
+def parse_event(line: bytes) -> dict[str, Any] | None:
+    """Parse a streamed event, sent as a JSON line or as an SSE data line."""
+    text = line.decode("utf-8").strip()
+    if text.startswith("data:"):
+        text = text[len("data:") :].strip()
+    try:
+        event = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return event if isinstance(event, dict) else None
+
+
+def stage_name(event: dict[str, Any]) -> str:
+    """Name the pipeline stage of an event: the last part of its branch."""
+    branch = event.get("branch")
+    return branch.rsplit(".", 1)[-1] if branch else event.get("author", "unknown")
+
+
 class ChatStreamUser(HttpUser):
-    """Simulates a user interacting with the chat stream API."""
+    """Simulates an SEO analyst running queries through the stream API."""
 
-    wait_time = between(1, 3)  # Wait 1-3 seconds between tasks
+    wait_time = between(WAIT_MIN, WAIT_MAX)
     host = base_url  # Set the base host URL for Locust
 
+    def on_start(self) -> None:
+        self.locale = random.choices(
+            list(LOCALE_WEIGHTS), weights=list(LOCALE_WEIGHTS.values())
+        )[0]
+
+    def fire(self, name: str, response_time_ms: float, response: Any) -> None:
+        self.environment.events.request.fire(
+            request_type="POST",
+            name=name,
+            response_time=response_time_ms,
+            response_length=0,
+            response=response,
+            context={"locale": self.locale},
+        )
+
     @task
     def chat_stream(self) -> None:
-        """Simulates a chat stream interaction."""
+        """Runs one query and reports per-stage and end-to-end latencies.
+
+        Each stage is reported as "stage <name>" with the time from the request
+        to its last (non-partial) event, so its percentiles show when each
+        step of the pipeline completes under load.
+        """
         headers = {"Content-Type": "application/json"}
-        headers["Authorization"] = f"Bearer {os.environ['_AUTH_TOKEN']}"
+        if os.getenv("_AUTH_TOKEN"):
+            headers["Authorization"] = f"Bearer {os.environ['_AUTH_TOKEN']}"
 
         data = {
             "input": {
-                "message": "What's the weather in San Francisco?",
-                "user_id": "test",
+                "message": pick_query(self.locale),
+                "user_id": f"load-test-{self.locale}",
             }
         }
 
@@ -73,30 +178,46 @@ class ChatStreamUser(HttpUser):
             params={"alt": "sse"},
         ) as response:
             if response.status_code == 200:
-                events = []
+                events = 0
+                first_partial_ms = None
+                stage_done_ms: dict[str, float] = {}
+                pipeline_cache = None
                 for line in response.iter_lines():
-                    if line:
-                        line_str = line.decode("utf-8")
-                        events.append(line_str)
-
-                        if "429 Too Many Requests" in line_str:
-                            self.environment.events.request.fire(
-                                request_type="POST",
-                                name=f"{url_path} rate_limited 429s",
-                                response_time=0,
-                                response_length=len(line),
-                                response=response,
-                                context={},
+                    if not line:
+                        continue
+                    elapsed_ms = (time.time() - start_time) * 1000
+                    if b"429 Too Many Requests" in line:
+                        self.fire(f"{url_path} rate_limited 429s", 0, response)
+                    event = parse_event(line)
+                    if event is None:
+                        continue
+                    events += 1
+                    if events == 1:
+                        self.fire("/stream_messages first event", elapsed_ms, response)
+                    metadata = event.get("custom_metadata") or {}
+                    pipeline_cache = metadata.get("pipeline_cache", pipeline_cache)
+                    if "partial_result" in metadata:
+                        if first_partial_ms is None:
+                            first_partial_ms = elapsed_ms
+                            self.fire(
+                                "/stream_messages first partial result",
+                                elapsed_ms,
+                                response,
                             )
-                end_time = time.time()
-                total_time = end_time - start_time
+                        continue
+                    stage_done_ms[stage_name(event)] = elapsed_ms
+                if pipeline_cache is None:
+                    for stage, done_ms in stage_done_ms.items():
+                        self.fire(f"stage {stage}", done_ms, response)
+                total_time = time.time() - start_time
                 self.environment.events.request.fire(
                     request_type="POST",
-                    name="/stream_messages end",
+                    name="/stream_messages end"
+                    + (f" (pipeline cache {pipeline_cache})" if pipeline_cache else ""),
                     response_time=total_time * 1000,  # Convert to milliseconds
-                    response_length=len(events),
+                    response_length=events,
                     response=response,
-                    context={},
+                    context={"locale": self.locale},
                 )
             else:
                 response.failure(f"Unexpected status code: {response.status_code}")
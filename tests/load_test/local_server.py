@@ -0,0 +1,180 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local stand-in for the Agent Engine streamQuery endpoint.
+
+Serves AgentEngineApp over HTTP, at the same path as the deployed reasoning
+engine, with SerpAPI, Gemini and page fetches replaced by the simulated
+backends of tests/benchmark/fakes.py. Load tests can then measure the
+capacity of the app itself (scheduling, caches, rate limiting, worker
+count) without quota or cost.
+
+Usage:
+    uv run python tests/load_test/local_server.py --port 8080 --workers 1
+    uv run python tests/load_test/local_server.py --model-latency 2 --error-rate 0.02
+
+Each worker process hosts its own AgentEngineApp, like the NUM_WORKERS
+worker processes of a deployed instance. The backend latencies are read
+from the LOAD_TEST_* environment variables, which the options set.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from collections.abc import AsyncIterator
+from contextlib import ExitStack, asynccontextmanager
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "tests" / "benchmark"))
+
+from fakes import LatencyModel, fake_backends  # noqa: E402
+
+PROJECT = "load-test-project"
+LOCATION = "us-central1"
+ENGINE_ID = "local"
+STREAM_QUERY_PATH = (
+    f"/v1beta1/projects/{PROJECT}/locations/{LOCATION}"
+    f"/reasoningEngines/{ENGINE_ID}:streamQuery"
+)
+
+
+def _latency(backend: str, default_mean: float, seed: int) -> LatencyModel:
+    return LatencyModel(
+        mean=float(os.getenv(f"LOAD_TEST_{backend}_LATENCY", str(default_mean))),
+        distribution=os.getenv("LOAD_TEST_DISTRIBUTION", "lognormal"),
+        error_rate=float(os.getenv("LOAD_TEST_ERROR_RATE", "0")),
+        seed=seed,
+    )
+
+
+def create_app() -> FastAPI:
+    """
+    Build the HTTP app hosting an AgentEngineApp on simulated backends.
+
+    :return: The FastAPI app
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        import vertexai
+        from google.auth.credentials import AnonymousCredentials
+
+        from app.agent import root_agent
+        from app.agent_engine_app import AgentEngineApp
+
+        vertexai.init(
+            project=PROJECT, location=LOCATION, credentials=AnonymousCredentials()
+        )
+        # Different workers draw different latencies
+        seed = os.getpid()
+        with ExitStack() as stack:
+            stack.enter_context(
+                fake_backends(
+                    int(os.getenv("LOAD_TEST_RESULTS", "100")),
+                    serp_latency=_latency("SERP", 0.5, seed),
+                    model_latency=_latency("MODEL", 1.5, seed + 1),
+                    fetch_latency=_latency("FETCH", 0.3, seed + 2),
+                )
+            )
+            # No Cloud Logging, Cloud Trace or Cloud Storage calls
+            for target in (
+                "google.cloud.logging.Client",
+                "app.agent_engine_app.CloudTraceLoggingSpanExporter",
+            ):
+                stack.enter_context(mock.patch(target))
+            stack.enter_context(
+                mock.patch(
+                    "google.auth.default",
+                    return_value=(AnonymousCredentials(), PROJECT),
+                )
+            )
+            agent_engine = AgentEngineApp(agent=root_agent)
+            agent_engine.set_up()
+            app.state.agent_engine = agent_engine
+            yield
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.post(STREAM_QUERY_PATH)
+    async def stream_query(request: Request) -> StreamingResponse:
+        body = await request.json()
+        query: dict[str, Any] = body.get("input", {})
+        events = request.app.state.agent_engine.stream_query(**query)
+        # Sync iterators are consumed in Starlette's thread pool, like the
+        # blocking stream_query of a deployed engine.
+        return StreamingResponse(
+            (json.dumps(event) + "\n" for event in events),
+            media_type="application/json",
+        )
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("NUM_WORKERS", "1")),
+        help="Worker processes, as NUM_WORKERS in a deployed instance",
+    )
+    parser.add_argument("--results", type=int, help="Organic results per SERP")
+    parser.add_argument("--serp-latency", type=float)
+    parser.add_argument("--model-latency", type=float)
+    parser.add_argument("--fetch-latency", type=float)
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--error-rate", type=float)
+    args = parser.parse_args()
+
+    for option in (
+        "results",
+        "serp_latency",
+        "model_latency",
+        "fetch_latency",
+        "distribution",
+        "error_rate",
+    ):
+        value = getattr(args, option)
+        if value is not None:
+            os.environ[f"LOAD_TEST_{option.upper()}"] = str(value)
+    # Offline: no credentials, and caches private to this server
+    os.environ.setdefault("GOOGLE_API_KEY", "load-test-key")
+    os.environ.setdefault("SERPAPI_KEY", "load-test-key")
+    os.environ.setdefault("CACHE_PATH", os.path.join(tempfile.mkdtemp(), "cache.db"))
+
+    uvicorn.run(
+        "local_server:create_app",
+        factory=True,
+        app_dir=str(Path(__file__).parent),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
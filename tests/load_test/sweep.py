@@ -0,0 +1,114 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Throughput-vs-concurrency sweep of the load test.
+
+Runs load_test.py headless once per concurrency level, with every user
+spawned at once, and tabulates the completed queries per second and the
+end-to-end latency percentiles of each level. Throughput stops growing, and
+latency starts growing, where the server saturates: that knee is the
+capacity of one instance with its current NUM_WORKERS.
+
+Usage:
+    python tests/load_test/sweep.py --users 1,2,4,8,16 --duration 60s
+    LOAD_TEST_HOST=http://127.0.0.1:8080 python tests/load_test/sweep.py
+
+The locust runs inherit the environment (LOAD_TEST_HOST, LOAD_TEST_*,
+_AUTH_TOKEN), and keep their CSV stats under --output-dir.
+"""
+
+import argparse
+import csv
+import subprocess
+import sys
+from pathlib import Path
+
+LOCUSTFILE = Path(__file__).with_name("load_test.py")
+END_TO_END = "/stream_messages end"
+COLUMNS = ["users", "requests", "failures", "rps", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def run_level(users: int, duration: str, output_dir: Path) -> dict[str, float]:
+    """
+    Run the load test with `users` concurrent users.
+
+    :param users: Concurrent users
+    :param duration: Run time, e.g. "60s"
+    :param output_dir: Directory receiving the locust CSV files
+    :return: The throughput and latency of complete (uncached) queries
+    """
+    prefix = output_dir / f"users_{users}"
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "locust",
+            "-f",
+            str(LOCUSTFILE),
+            "--headless",
+            "--only-summary",
+            "-u",
+            str(users),
+            "-r",
+            str(users),
+            "-t",
+            duration,
+            "--csv",
+            str(prefix),
+        ],
+        check=True,
+        cwd=LOCUSTFILE.parents[2],
+    )
+    with open(f"{prefix}_stats.csv") as f:
+        rows = {row["Name"]: row for row in csv.DictReader(f)}
+    row = rows.get(END_TO_END)
+    if row is None:
+        return {"users": users, "requests": 0}
+    return {
+        "users": users,
+        "requests": int(row["Request Count"]),
+        "failures": int(row["Failure Count"]),
+        "rps": round(float(row["Requests/s"]), 3),
+        "p50_ms": float(row["50%"]),
+        "p95_ms": float(row["95%"]),
+        "p99_ms": float(row["99%"]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", default="1,2,4,8,16", help="Concurrency levels")
+    parser.add_argument("--duration", default="60s", help="Run time per level")
+    parser.add_argument(
+        "--output-dir", default="tests/load_test/.results/sweep", type=Path
+    )
+    args = parser.parse_args()
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    levels = [
+        run_level(int(users), args.duration, args.output_dir)
+        for users in args.users.split(",")
+    ]
+    with open(args.output_dir / "throughput.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, restval="")
+        writer.writeheader()
+        writer.writerows(levels)
+    print(" ".join(f"{column:>9}" for column in COLUMNS))
+    for level in levels:
+        print(" ".join(f"{level.get(column, ''):>9}" for column in COLUMNS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+# Building the shared genai client requires credentials, even if unused.
+os.environ.setdefault("GOOGLE_API_KEY", "unit-test-key")
+# Tools are called against in-process fakes: no need to pace them.
+os.environ.setdefault("GEMINI_QPS", "0")
+os.environ.setdefault("SERPAPI_QPS", "0")
+# Tests count model calls: do not answer them from the LLM response cache.
+os.environ.setdefault("LLM_CACHE", "false")
@@ -0,0 +1,102 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.utils import cache as cache_module
+from app.utils.cache import PersistentCache, make_key
+
+
+def test_persistent_cache_roundtrip_and_counters(tmp_path: Path) -> None:
+    cache = PersistentCache("test", ttl_seconds=60, path=str(tmp_path / "c.db"))
+    assert cache.get("a") is None
+    cache.set("a", {"value": [1, 2]})
+    assert cache.get("a") == {"value": [1, 2]}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_persistent_cache_expires_entries(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = PersistentCache("test", ttl_seconds=10, path=str(tmp_path / "c.db"))
+    cache.set("a", 1)
+    now[0] += 11
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_persistent_cache_evicts_least_recently_used(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = PersistentCache(
+        "test",
+        ttl_seconds=60,
+        max_entries=2,
+        path=str(tmp_path / "c.db"),
+        touch_interval=0,
+    )
+    for key in ("a", "b"):
+        now[0] += 1
+        cache.set(key, key)
+    now[0] += 1
+    cache.get("a")
+    now[0] += 1
+    cache.set("c", "c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+    assert cache.get("c") == "c"
+
+
+def test_hits_only_record_access_times_past_the_touch_interval(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = PersistentCache(
+        "test", ttl_seconds=600, path=str(tmp_path / "c.db"), touch_interval=60
+    )
+    cache.set("a", 1)
+
+    def accessed_at() -> float:
+        return (
+            cache._connection()
+            .execute("SELECT accessed_at FROM cache_entries WHERE key = 'a'")
+            .fetchone()[0]
+        )
+
+    now[0] += 30
+    assert cache.get("a") == 1
+    assert accessed_at() == 1000.0
+    now[0] += 31
+    assert asyncio.run(cache.aget("a")) == 1
+    assert accessed_at() == 1061.0
+
+
+def test_namespaces_are_isolated(tmp_path: Path) -> None:
+    path = str(tmp_path / "c.db")
+    PersistentCache("one", ttl_seconds=60, path=path).set("k", 1)
+    assert PersistentCache("two", ttl_seconds=60, path=path).get("k") is None
+
+
+def test_make_key_is_order_sensitive_and_stable() -> None:
+    assert make_key("q", 1) == make_key("q", 1)
+    assert make_key("q", 1) != make_key(1, "q")
@@ -0,0 +1,44 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+HEAVY_MODULES = ["bs4", "google.adk", "google.genai", "requests", "serpapi"]
+
+
+def loaded_heavy_modules(code: str) -> list[str]:
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import json, sys\n{code}\n"
+            f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))",
+        ],
+        cwd=Path(__file__).resolve().parents[2],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def test_import_app_defers_heavy_dependencies() -> None:
+    assert loaded_heavy_modules("import app") == []
+
+
+def test_root_agent_is_built_on_first_access() -> None:
+    assert "google.adk" in loaded_heavy_modules("import app\napp.root_agent")
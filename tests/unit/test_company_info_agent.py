@@ -0,0 +1,258 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.sub_agents.company_info_agent import agent as company_module
+from app.sub_agents.company_info_agent import prefilter
+from app.utils import genai_clients
+from app.utils.cache import PersistentCache
+from app.utils.streaming import collect_partial_results
+
+
+class FakeModels:
+    """Answers 'yes' for URLs containing 'shop', with random latency.
+
+    Batched calls get a JSON list of verdicts that leaves out URLs listed in
+    `omitted_urls`, with trailing slashes removed when `strip_slashes` is set,
+    or `batch_reply` when set.
+    """
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.omitted_urls: set[str] = set()
+        self.strip_slashes = False
+        self.batch_reply: str | None = None
+
+    async def generate_content(self, model: str, contents: str, config: Any) -> Any:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(random.uniform(0, 0.01))
+        self.in_flight -= 1
+        if getattr(config, "response_schema", None) is company_module.CompanyInfo:
+            return SimpleNamespace(
+                text=json.dumps(
+                    {"company_name": contents, "num_employees": "10", "email": ""}
+                )
+            )
+        if getattr(config, "response_schema", None) is not None:
+            if self.batch_reply is not None:
+                return SimpleNamespace(text=self.batch_reply)
+            urls = re.findall(r"URL: (\S+)", contents)
+            verdicts = [
+                {
+                    "url": url.rstrip("/") if self.strip_slashes else url,
+                    "is_product_page": "shop" in url,
+                }
+                for url in urls
+                if url not in self.omitted_urls
+            ]
+            return SimpleNamespace(text=json.dumps(verdicts))
+        return SimpleNamespace(text="yes" if "shop" in contents else "no")
+
+
+@pytest.fixture
+def fake_models(monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> FakeModels:
+    monkeypatch.setattr(
+        prefilter,
+        "domain_verdict_cache",
+        PersistentCache("domains", ttl_seconds=60, path=str(tmp_path / "cache.db")),
+    )
+    monkeypatch.setattr(
+        company_module,
+        "company_info_cache",
+        PersistentCache("companies", ttl_seconds=60, path=str(tmp_path / "cache.db")),
+    )
+    monkeypatch.setattr(company_module, "PREFILTER_FETCH_PAGES", False)
+    models = FakeModels()
+    fake_client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    monkeypatch.setattr(genai_clients, "_client", fake_client)
+    return models
+
+
+def test_filter_product_pages_keeps_serp_order(
+    fake_models: FakeModels, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(company_module, "PRODUCT_PAGE_MAX_CONCURRENCY", 3)
+    monkeypatch.setattr(company_module, "PRODUCT_PAGE_CLASSIFIER_MODE", "per_url")
+    other_results = [
+        {"position": i, "link": f"https://{'shop' if i % 2 else 'blog'}{i}.com/"}
+        for i in range(11, 41)
+    ]
+    tool_context = SimpleNamespace(state={"other_results": other_results})
+
+    asyncio.run(company_module.filter_product_pages(tool_context))
+
+    product_pages = tool_context.state["product_pages"]
+    assert [p["position"] for p in product_pages] == list(range(11, 41, 2))
+    assert fake_models.calls == 30
+    assert fake_models.max_in_flight <= 3
+
+
+def test_filter_product_pages_batches_urls(
+    fake_models: FakeModels, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(company_module, "PRODUCT_PAGE_CLASSIFIER_MODE", "batch")
+    monkeypatch.setattr(company_module, "PRODUCT_PAGE_BATCH_SIZE", 8)
+    other_results = [
+        {"position": i, "link": f"https://{'shop' if i % 2 else 'blog'}{i}.com/"}
+        for i in range(11, 41)
+    ]
+    fake_models.omitted_urls = {"https://shop13.com/"}
+    tool_context = SimpleNamespace(state={"other_results": other_results})
+
+    asyncio.run(company_module.filter_product_pages(tool_context))
+
+    product_pages = tool_context.state["product_pages"]
+    assert [p["position"] for p in product_pages] == list(range(11, 41, 2))
+    # 4 batches of at most 8 URLs, plus one fallback call for the omitted URL.
+    assert fake_models.calls == 5
+
+
+@pytest.mark.parametrize("batch_reply", ["not json", '[{"url": 1}]', "{}"])
+def test_malformed_batch_answers_fall_back_to_per_url_calls(
+    fake_models: FakeModels, monkeypatch: pytest.MonkeyPatch, batch_reply: str
+) -> None:
+    monkeypatch.setattr(company_module, "PRODUCT_PAGE_MAX_CONCURRENCY", 2)
+    fake_models.batch_reply = batch_reply
+    pages = [
+        {"link": f"https://{'shop' if i % 2 else 'blog'}{i}.com/"} for i in range(6)
+    ]
+
+    verdicts = asyncio.run(company_module.classify_product_pages_batch(pages))
+
+    assert verdicts == [False, True] * 3
+    # One batch call, then one call per URL, at most 2 at once.
+    assert fake_models.calls == 7
+    assert fake_models.max_in_flight <= 2
+
+
+def test_batch_verdicts_match_urls_leniently(fake_models: FakeModels) -> None:
+    fake_models.strip_slashes = True
+    pages = [{"link": "https://www.shop1.com/"}, {"link": "https://blog2.com/a/"}]
+
+    verdicts = asyncio.run(company_module.classify_product_pages_batch(pages))
+
+    assert verdicts == [True, False]
+    assert fake_models.calls == 1
+
+
+def test_filter_product_pages_short_circuits_known_urls(
+    fake_models: FakeModels, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(company_module, "PRODUCT_PAGE_CLASSIFIER_MODE", "per_url")
+    monkeypatch.setattr(company_module, "PREFILTER_FETCH_PAGES", True)
+
+    async def fake_fetch(url: str) -> str:
+        return "Add to cart - In stock" if "store" in url else ""
+
+    monkeypatch.setattr(company_module, "afetch_page_content", fake_fetch)
+    other_results = [
+        {"position": 11, "link": "https://fr.wikipedia.org/wiki/Shoe"},
+        {"position": 12, "link": "https://www.amazon.fr/shop-shoes"},
+        {"position": 13, "link": "https://store.example.com/p/1"},
+        {"position": 14, "link": "https://shop.brand.fr/"},
+        {"position": 15, "link": "https://shop.brand.fr/about"},
+        {"position": 16, "link": "https://news.blog.com/post"},
+    ]
+    tool_context = SimpleNamespace(state={"other_results": other_results})
+    asyncio.run(company_module.filter_product_pages(tool_context))
+
+    assert [p["position"] for p in tool_context.state["product_pages"]] == [13, 14, 15]
+    stats = tool_context.state["product_pages_prefilter"]
+    assert stats["rules"] == 2
+    assert stats["page_signals"] == 1
+    assert stats["sent_to_model"] == 2
+    assert fake_models.calls == 2
+
+    # Every domain now has a verdict: nothing goes to the model on the next run.
+    tool_context = SimpleNamespace(state={"other_results": other_results})
+    asyncio.run(company_module.filter_product_pages(tool_context))
+    assert fake_models.calls == 2
+    assert tool_context.state["product_pages_prefilter"]["short_circuited"] == 6
+
+
+def test_get_infos_companies_extracts_once_per_domain(fake_models: FakeModels) -> None:
+    product_pages = [
+        {"link": "https://shop.brand.fr/a"},
+        {"link": "https://www.brand.fr/b"},
+        {"link": "https://other.com/"},
+    ]
+    tool_context = SimpleNamespace(state={"product_pages": product_pages})
+    asyncio.run(company_module.get_infos_companies(tool_context))
+
+    companies = tool_context.state["companies_filtered"]
+    assert [c["url"] for c in companies] == [p["link"] for p in product_pages]
+    assert companies[0]["company_name"] == companies[1]["company_name"]
+    # Two calls (search, then structuring) per registrable domain.
+    assert fake_models.calls == 4
+
+    # Cached records are reused on the next run.
+    tool_context = SimpleNamespace(state={"product_pages": product_pages})
+    asyncio.run(company_module.get_infos_companies(tool_context))
+    assert fake_models.calls == 4
+    assert tool_context.state["companies_filtered"] == companies
+
+
+def test_get_infos_companies_publishes_each_company(fake_models: FakeModels) -> None:
+    product_pages = [{"link": "https://a.com/"}, {"link": "https://b.com/"}]
+    tool_context = SimpleNamespace(state={"product_pages": product_pages})
+
+    async def run() -> list:
+        with collect_partial_results() as partial_results:
+            await company_module.get_infos_companies(tool_context)
+        return [partial_results.get_nowait() for _ in range(partial_results.qsize())]
+
+    published = asyncio.run(run())
+    assert sorted(item["url"] for kind, item in published) == [
+        "https://a.com/",
+        "https://b.com/",
+    ]
+    assert {kind for kind, item in published} == {"company_info"}
+
+
+def test_get_infos_companies_keeps_other_domains_when_one_fails(
+    fake_models: FakeModels, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    extracted = []
+
+    async def extract(link: str) -> dict:
+        extracted.append(link)
+        if "bad" in link:
+            # e.g. an empty structured answer
+            return json.loads(None)  # type: ignore[arg-type]
+        return {"company_name": link, "num_employees": "", "email": ""}
+
+    monkeypatch.setattr(company_module, "_extract_company_info", extract)
+    product_pages = [{"link": "https://a.com/"}, {"link": "https://bad.com/"}]
+    tool_context = SimpleNamespace(state={"product_pages": product_pages})
+    asyncio.run(company_module.get_infos_companies(tool_context))
+
+    companies = tool_context.state["companies_filtered"]
+    assert [c["url"] for c in companies] == ["https://a.com/"]
+    assert company_module.company_info_cache.get("a.com") is not None
+
+    # Only the failed domain is extracted again.
+    asyncio.run(company_module.get_infos_companies(tool_context))
+    assert extracted == ["https://a.com/", "https://bad.com/", "https://bad.com/"]
@@ -0,0 +1,120 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import pytest
+import requests
+
+from app.utils.fetcher import PageFetcher
+
+PAGE = (
+    "<html><head><title>Shop</title><style>body{}</style></head><body>"
+    "<script>var x = 1;</script><p>Add to cart</p>"
+    + "<p>lorem ipsum</p>" * 5000
+    + "</body></html>"
+).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path == "/doc.pdf":
+            body, content_type = b"%PDF-1.4", "application/pdf"
+        else:
+            body, content_type = PAGE, "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_fetch_text_extracts_visible_text(base_url: str) -> None:
+    text = PageFetcher().fetch_text(f"{base_url}/", max_chars=40)
+    assert text.startswith("Shop Add to cart lorem ipsum")
+    assert "var x" not in text
+    assert len(text) == 40
+
+
+def test_fetch_caps_bytes_read(base_url: str) -> None:
+    chunks: list[str] = []
+    assert PageFetcher(max_bytes=1000).fetch(f"{base_url}/", chunks.append)
+    assert len("".join(chunks)) == 1000
+
+
+def test_fetch_stops_when_sink_has_enough(base_url: str) -> None:
+    chunks: list[str] = []
+
+    def sink(chunk: str) -> bool:
+        chunks.append(chunk)
+        return True
+
+    PageFetcher().fetch(f"{base_url}/", sink)
+    # The first chunk, then the decoder flush.
+    assert len(chunks) == 2
+
+
+def test_fetch_text_skips_non_html(base_url: str) -> None:
+    assert PageFetcher().fetch_text(f"{base_url}/doc.pdf") == ""
+
+
+def test_afetch_text(base_url: str) -> None:
+    text = asyncio.run(PageFetcher().afetch_text(f"{base_url}/", max_chars=4))
+    assert text == "Shop"
+
+
+def test_idle_host_slots_are_dropped(base_url: str) -> None:
+    fetcher = PageFetcher(per_host_limit=2)
+    threads = [
+        threading.Thread(target=fetcher.fetch_text, args=(f"{base_url}/",))
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fetcher._host_slots == {}
+    assert fetcher._host_users == {}
+
+
+def test_timed_out_host_is_skipped(monkeypatch: pytest.MonkeyPatch) -> None:
+    fetcher = PageFetcher(negative_ttl=60)
+    calls = []
+
+    def timeout(*args: Any, **kwargs: Any) -> None:
+        calls.append(args)
+        raise requests.Timeout("timed out")
+
+    monkeypatch.setattr(fetcher.session, "get", timeout)
+    assert fetcher.fetch_text("https://dead.example.com/a") == ""
+    assert fetcher.fetch_text("https://dead.example.com/b") == ""
+    assert len(calls) == 1
+    assert fetcher.is_host_dead("dead.example.com")
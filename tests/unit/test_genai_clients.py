@@ -0,0 +1,76 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.utils import genai_clients
+
+
+def test_client_is_created_once_and_shared(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(genai_clients, "_client", None)
+    monkeypatch.setenv("GENAI_TIMEOUT_MS", "5000")
+
+    client = genai_clients.get_client()
+
+    assert genai_clients.get_client() is client
+    assert genai_clients.get_async_client() is client.aio
+    assert client._api_client._http_options.timeout == 5000
+
+
+def test_async_client_uses_the_bounded_httpx_pool(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(genai_clients, "_client", None)
+    monkeypatch.setenv("GENAI_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("GENAI_MAX_KEEPALIVE", "3")
+
+    api_client = genai_clients.get_client()._api_client
+
+    assert not api_client._use_aiohttp()
+    pool = api_client._async_httpx_client._transport._pool
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+
+
+def test_stage_model_falls_back_to_model(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("MODEL", "model-a")
+    monkeypatch.setenv("MODEL_GSO_IMPROVER", "model-b")
+
+    assert genai_clients.stage_model("gso_improver") == "model-b"
+    assert genai_clients.stage_model("gso_analyzer") == "model-a"
+
+
+def test_agenerate_content_uses_the_stage_model(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[dict[str, Any]] = []
+
+    async def generate_content(**kwargs: Any) -> str:
+        calls.append(kwargs)
+        return "response"
+
+    fake_client = SimpleNamespace(
+        aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    )
+    monkeypatch.setattr(genai_clients, "_client", fake_client)
+    monkeypatch.setenv("MODEL_SEARCH_AGENT", "model-c")
+
+    response = asyncio.run(genai_clients.agenerate_content("search_agent", "hello"))
+
+    assert response == "response"
+    assert calls == [{"model": "model-c", "contents": "hello", "config": None}]
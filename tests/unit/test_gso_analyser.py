@@ -0,0 +1,105 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.sub_agents.gso_analyser_agent import agent as analyser_module
+from app.utils import genai_clients
+from app.utils.cache import PersistentCache
+
+
+class FakeModels:
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+
+    async def generate_content(
+        self, model: str, contents: str, config: Any = None
+    ) -> Any:
+        self.prompts.append(contents)
+        if "---Analyses:---" in contents:
+            return SimpleNamespace(text="## Summary of common themes")
+        return SimpleNamespace(text=f"## {contents.splitlines()[-1]}")
+
+
+class FakeFetcher:
+    def __init__(self) -> None:
+        self.pages: dict[str, str] = {}
+
+    async def afetch_text(self, url: str, max_chars: int = 3000) -> str:
+        return self.pages.get(url, f"content of {url}")
+
+
+@pytest.fixture
+def setup(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> tuple[FakeModels, FakeFetcher]:
+    models = FakeModels()
+    fetcher = FakeFetcher()
+    monkeypatch.setattr(
+        genai_clients, "_client", SimpleNamespace(aio=SimpleNamespace(models=models))
+    )
+    monkeypatch.setattr(analyser_module, "get_fetcher", lambda: fetcher)
+    monkeypatch.setattr(analyser_module, "GSO_ANALYSIS_MODE", "map_reduce")
+    monkeypatch.setattr(
+        analyser_module,
+        "gso_url_analysis_cache",
+        PersistentCache("gso", ttl_seconds=60, path=str(tmp_path / "cache.db")),
+    )
+    return models, fetcher
+
+
+def run_tool() -> str:
+    top_10 = [{"link": f"https://top{i}.com/"} for i in range(10)]
+    tool_context = SimpleNamespace(state={"top_10_results": top_10})
+    return asyncio.run(analyser_module.generate_gso_analysis(tool_context))
+
+
+def test_map_reduce_analysis(setup: tuple[FakeModels, FakeFetcher]) -> None:
+    models, _ = setup
+    report = run_tool()
+
+    assert len(models.prompts) == 11
+    assert report.index("## https://top0.com/") < report.index("## https://top9.com/")
+    assert report.endswith("## Summary of common themes")
+
+
+def test_unchanged_pages_reuse_cached_analyses(
+    setup: tuple[FakeModels, FakeFetcher],
+) -> None:
+    models, fetcher = setup
+    first_report = run_tool()
+    fetcher.pages["https://top3.com/"] = "new content"
+    models.prompts.clear()
+
+    assert run_tool() == first_report
+    # Only the changed page and the reduce step are sent again.
+    assert len(models.prompts) == 2
+
+
+def test_unavailable_pages_are_not_cached(
+    setup: tuple[FakeModels, FakeFetcher],
+) -> None:
+    models, fetcher = setup
+    fetcher.pages["https://top3.com/"] = ""
+    run_tool()
+    models.prompts.clear()
+
+    run_tool()
+    # The page that could not be fetched, and the reduce step.
+    assert len(models.prompts) == 2
@@ -0,0 +1,121 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import random
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.sub_agents.gso_improver import agent as improver_module
+from app.utils import genai_clients, llm_cache
+from app.utils.llm_cache import LLMResponseCache
+
+
+class FakeAio:
+    def __init__(self, cache_fails: bool = False) -> None:
+        self.cache_fails = cache_fails
+        self.created: list[Any] = []
+        self.deleted: list[str] = []
+        self.requests: list[tuple[str, Any]] = []
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+        self.caches = SimpleNamespace(create=self.create, delete=self.delete)
+
+    async def create(self, model: str, config: Any) -> Any:
+        if self.cache_fails:
+            raise RuntimeError("cached content is too small")
+        self.created.append(config)
+        return SimpleNamespace(name="cachedContents/123")
+
+    async def delete(self, name: str) -> None:
+        self.deleted.append(name)
+
+    async def generate_content(self, model: str, contents: str, config: Any) -> Any:
+        self.requests.append((contents, config))
+        await asyncio.sleep(random.uniform(0, 0.01))
+        return SimpleNamespace(text=f"advice for {contents.splitlines()[-1]}")
+
+
+def run_tool(monkeypatch: pytest.MonkeyPatch, aio: FakeAio, analysis: str) -> dict:
+    monkeypatch.setattr(genai_clients, "_client", SimpleNamespace(aio=aio))
+    companies = [
+        {"company_name": f"c{i}", "url": f"https://c{i}.com/"} for i in range(8)
+    ]
+    tool_context = SimpleNamespace(
+        state={"companies_filtered": companies, "summary_best_brands_content": analysis}
+    )
+    asyncio.run(improver_module.generate_gso_recommendation(tool_context))
+    return tool_context.state
+
+
+def test_recommendations_use_cached_prefix_and_keep_order(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    aio = FakeAio()
+    state = run_tool(monkeypatch, aio, "competitor analysis " * 1000)
+
+    assert [r["company_name"] for r in state["recommendations"]] == [
+        f"c{i}" for i in range(8)
+    ]
+    assert state["recommendations"][3]["gso_recommendation"].endswith("https://c3.com/")
+    assert len(aio.created) == 1
+    assert aio.deleted == ["cachedContents/123"]
+    for contents, config in aio.requests:
+        assert "competitor analysis" not in contents
+        assert config.cached_content == "cachedContents/123"
+
+
+def test_recommendations_fall_back_to_inline_prefix(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    aio = FakeAio(cache_fails=True)
+    state = run_tool(monkeypatch, aio, "competitor analysis " * 1000)
+
+    assert len(state["recommendations"]) == 8
+    assert aio.deleted == []
+    for contents, config in aio.requests:
+        assert "competitor analysis" in contents
+        assert config.cached_content is None
+
+
+def test_short_prefix_is_not_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    aio = FakeAio()
+    run_tool(monkeypatch, aio, "short analysis")
+    assert aio.created == []
+
+
+@pytest.mark.parametrize("analysis", ["competitor analysis " * 1000, "short"])
+def test_recommendations_are_not_served_from_the_llm_cache(
+    monkeypatch: pytest.MonkeyPatch, analysis: str
+) -> None:
+    # They read the live company pages, which the request does not capture.
+    monkeypatch.setattr(llm_cache, "_llm_cache", LLMResponseCache())
+    monkeypatch.setenv("LLM_CACHE", "true")
+    aio = FakeAio()
+
+    run_tool(monkeypatch, aio, analysis)
+    run_tool(monkeypatch, aio, analysis)
+
+    assert len(aio.requests) == 16
+
+
+def test_empty_inputs_still_write_recommendations() -> None:
+    for state in (
+        {"companies_filtered": [], "summary_best_brands_content": "analysis"},
+        {"companies_filtered": [{"url": "https://a.com/"}]},
+    ):
+        tool_context = SimpleNamespace(state=state)
+        asyncio.run(improver_module.generate_gso_recommendation(tool_context))
+        assert tool_context.state["recommendations"] == []
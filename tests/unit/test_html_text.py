@@ -0,0 +1,50 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app.utils.html_text import TextExtractor, extract_text
+
+HTML = """<html><head><title>Acme &amp; Co</title>
+<style>p { color: red; }</style><script>if (a < b) { document.write("<p>x</p>"); }</script>
+</head><body><noscript><p>Enable JS</p></noscript>
+<svg><text>logo</text></svg>
+<h1>  Running
+   shoes </h1><p>Add to cart</p><br/><p>Free shipping</p></body></html>"""
+
+
+def test_extract_text_skips_non_content_elements() -> None:
+    assert extract_text(HTML) == "Acme & Co Running shoes Add to cart Free shipping"
+
+
+def test_extract_text_truncates_to_budget() -> None:
+    assert extract_text(HTML, max_chars=9) == "Acme & Co"
+
+
+def test_chunked_feed_matches_whole_document() -> None:
+    extractor = TextExtractor()
+    for i in range(0, len(HTML), 7):
+        extractor.feed(HTML[i : i + 7])
+    extractor.close()
+    assert extractor.text() == extract_text(HTML)
+
+
+def test_feed_reports_done_once_budget_is_met() -> None:
+    extractor = TextExtractor(max_chars=20)
+    chunks = ["<p>" + "word " * 10 + "</p>"] * 100
+    fed = 0
+    for chunk in chunks:
+        fed += 1
+        if extractor.feed(chunk):
+            break
+    assert fed < len(chunks)
+    assert len(extractor.text()) == 20
@@ -0,0 +1,171 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from google.genai.types import GenerateContentConfig, GenerateContentResponse
+from pydantic import BaseModel
+
+from app.utils import genai_clients, llm_cache
+from app.utils.cache import PersistentCache
+from app.utils.llm_cache import LLMResponseCache, request_key
+
+
+class Answer(BaseModel):
+    ok: bool
+
+
+class OtherAnswer(BaseModel):
+    ok: str
+
+
+def response(text: str) -> GenerateContentResponse:
+    return GenerateContentResponse.model_validate(
+        {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+    )
+
+
+def test_request_key_covers_model_prompt_config_and_schema() -> None:
+    config = GenerateContentConfig(
+        response_mime_type="application/json", response_schema=list[Answer]
+    )
+    key = request_key("m", "prompt", config)
+
+    assert key == request_key(
+        "m",
+        "prompt",
+        GenerateContentConfig(
+            response_mime_type="application/json", response_schema=list[Answer]
+        ),
+    )
+    assert key != request_key("m2", "prompt", config)
+    assert key != request_key("m", "prompt 2", config)
+    assert key != request_key(
+        "m",
+        "prompt",
+        GenerateContentConfig(
+            response_mime_type="application/json", response_schema=list[OtherAnswer]
+        ),
+    )
+    assert key != request_key(
+        "m", "prompt", GenerateContentConfig(tools=[{"url_context": {}}])
+    )
+
+
+def test_disk_tier_survives_a_new_process(tmp_path: Any) -> None:
+    disk_path = str(tmp_path / "cache.db")
+    first = LLMResponseCache(disk=PersistentCache("llm", 60, path=disk_path))
+    first.set("key", response("hello"))
+    first.set("empty", response(""))
+
+    second = LLMResponseCache(disk=PersistentCache("llm", 60, path=disk_path))
+    assert second.get("stage", "key").text == "hello"
+    assert second.get("stage", "key").text == "hello"
+    assert second.get("stage", "empty") is None
+    assert second.stats()["stage"] == {
+        "memory_hits": 1,
+        "disk_hits": 1,
+        "misses": 1,
+        "hit_rate": 0.667,
+    }
+
+
+def test_async_access_reads_and_writes_the_disk_tier(tmp_path: Any) -> None:
+    disk_path = str(tmp_path / "cache.db")
+    first = LLMResponseCache(disk=PersistentCache("llm", 60, path=disk_path))
+    second = LLMResponseCache(disk=PersistentCache("llm", 60, path=disk_path))
+
+    async def run() -> list[Any]:
+        await first.aset("key", response("hello"))
+        return [await second.aget("stage", key) for key in ("key", "key", "other")]
+
+    hit, memory_hit, miss = asyncio.run(run())
+    assert hit.text == memory_hit.text == "hello"
+    assert miss is None
+    assert second.stats()["stage"]["disk_hits"] == 1
+    assert second.stats()["stage"]["memory_hits"] == 1
+
+
+def test_memory_tier_evicts_least_recently_used() -> None:
+    cache = LLMResponseCache(memory_entries=2)
+    for key in ("a", "b"):
+        cache.set(key, response(key))
+    cache.get("stage", "a")
+    cache.set("c", response("c"))
+
+    assert cache.get("stage", "b") is None
+    assert cache.get("stage", "a").text == "a"
+
+
+def test_agenerate_content_answers_repeated_requests_from_cache(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls = []
+
+    async def generate_content(**kwargs: Any) -> GenerateContentResponse:
+        calls.append(kwargs)
+        return response("generated")
+
+    fake_client = SimpleNamespace(
+        aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    )
+    monkeypatch.setattr(genai_clients, "_client", fake_client)
+    monkeypatch.setattr(llm_cache, "_llm_cache", LLMResponseCache())
+    monkeypatch.setenv("LLM_CACHE", "true")
+
+    async def run() -> list[str]:
+        return [
+            (await genai_clients.agenerate_content("gso_analyzer", "same")).text
+            for _ in range(3)
+        ]
+
+    assert asyncio.run(run()) == ["generated"] * 3
+    assert len(calls) == 1
+    assert llm_cache.get_llm_cache().stats()["gso_analyzer"]["memory_hits"] == 2
+
+    monkeypatch.setenv("LLM_CACHE", "false")
+    asyncio.run(genai_clients.agenerate_content("gso_analyzer", "same"))
+    assert len(calls) == 2
+
+
+def test_grounded_requests_are_only_cached_under_a_caller_key(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls = []
+
+    async def generate_content(**kwargs: Any) -> GenerateContentResponse:
+        calls.append(kwargs)
+        return response("generated")
+
+    fake_client = SimpleNamespace(
+        aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    )
+    monkeypatch.setattr(genai_clients, "_client", fake_client)
+    monkeypatch.setattr(llm_cache, "_llm_cache", LLMResponseCache())
+    monkeypatch.setenv("LLM_CACHE", "true")
+    config = GenerateContentConfig(tools=[{"url_context": {}}])
+
+    async def run(cache_key: str | None) -> None:
+        for _ in range(2):
+            await genai_clients.agenerate_content(
+                "gso_analyzer", "https://a.com/", config, cache_key=cache_key
+            )
+
+    asyncio.run(run(None))
+    assert len(calls) == 2
+    asyncio.run(run("content-hash"))
+    assert len(calls) == 3
@@ -0,0 +1,118 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+import vertexai
+from google.adk.agents import BaseAgent
+from google.auth.credentials import AnonymousCredentials
+from vertexai.preview.reasoning_engines import AdkApp
+
+from app.agent_engine_app import AgentEngineApp
+from app.utils import pipeline_cache as pipeline_cache_module
+from app.utils.pipeline_cache import OUTPUT_KEYS, PipelineResultCache
+
+OUTPUTS = {key: f"{key} value" for key in OUTPUT_KEYS}
+
+
+def make_cache(
+    tmp_path: Any, fresh: float = 60, stale: float = 60
+) -> PipelineResultCache:
+    return PipelineResultCache(
+        fresh_seconds=fresh, stale_seconds=stale, path=str(tmp_path / "cache.db")
+    )
+
+
+def test_entries_go_from_fresh_to_stale_to_miss(
+    tmp_path: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cache = make_cache(tmp_path, fresh=10, stale=20)
+    now = time.time()
+    monkeypatch.setattr(pipeline_cache_module.time, "time", lambda: now)
+    assert cache.set("Running Shoes", "en-fr", OUTPUTS)
+
+    assert cache.get("running  shoes", "en-fr") == (OUTPUTS, "fresh")
+    assert cache.get("running shoes", "en-us") == (None, "miss")
+    monkeypatch.setattr(pipeline_cache_module.time, "time", lambda: now + 15)
+    assert cache.get("running shoes", "en-fr") == (OUTPUTS, "stale")
+
+
+def test_incomplete_runs_and_other_versions_are_not_served(tmp_path: Any) -> None:
+    cache = make_cache(tmp_path)
+    assert not cache.set("shoes", "en-fr", {"top_10_results": []})
+    cache.set("shoes", "en-fr", OUTPUTS)
+
+    cache.version = "2"
+    assert cache.get("shoes", "en-fr") == (None, "miss")
+
+
+def test_only_one_background_refresh_per_key(tmp_path: Any) -> None:
+    cache = make_cache(tmp_path)
+    release = threading.Event()
+    runs = []
+
+    def run() -> dict:
+        runs.append(1)
+        release.wait(5)
+        return OUTPUTS
+
+    assert cache.refresh_in_background("shoes", "en-fr", run)
+    assert not cache.refresh_in_background("shoes", "en-fr", run)
+    release.set()
+    for _ in range(100):
+        if cache.get("shoes", "en-fr")[0] is not None:
+            break
+        time.sleep(0.01)
+    assert runs == [1]
+    assert cache.get("shoes", "en-fr") == (OUTPUTS, "fresh")
+
+
+class NoopAgent(BaseAgent):
+    pass
+
+
+def test_agent_engine_app_serves_repeated_queries_from_cache(
+    tmp_path: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    runs = []
+
+    def stream_query(self: AdkApp, **kwargs: Any) -> Iterator[dict]:
+        runs.append(kwargs["message"])
+        yield {"author": "seo_agent", "actions": {"state_delta": OUTPUTS}}
+
+    monkeypatch.setattr(AdkApp, "stream_query", stream_query)
+    vertexai.init(
+        project="test-project",
+        location="us-central1",
+        credentials=AnonymousCredentials(),
+    )
+    app = AgentEngineApp(agent=NoopAgent(name="seo_agent"))
+    app._tmpl_attrs["runner"] = object()
+    app.pipeline_cache = make_cache(tmp_path)
+
+    first = list(app.stream_query(message="Running shoes", user_id="u"))
+    second = list(app.stream_query(message="running shoes", user_id="u"))
+
+    assert runs == ["Running shoes"]
+    assert first == [{"author": "seo_agent", "actions": {"state_delta": OUTPUTS}}]
+    assert len(second) == 1
+    assert second[0]["actions"]["state_delta"] == OUTPUTS
+    assert second[0]["custom_metadata"] == {"pipeline_cache": "fresh"}
+    # Queries continuing a session always run the agent.
+    list(app.stream_query(message="running shoes", user_id="u", session_id="s"))
+    assert len(runs) == 2
@@ -0,0 +1,83 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+
+import pytest
+
+from app.utils import rate_limit
+from app.utils.rate_limit import AdaptiveRateLimiter
+
+
+class ThrottledError(Exception):
+    code = 429
+
+
+def test_bucket_paces_calls_beyond_the_burst() -> None:
+    limiter = AdaptiveRateLimiter("test", rate=20, burst=2)
+
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire_sync()
+    elapsed = time.monotonic() - start
+
+    # 2 calls from the burst, then 4 calls at 20/s
+    assert 0.15 < elapsed < 0.5
+    assert limiter.stats()["calls"] == 6
+    assert limiter.stats()["total_wait_seconds"] > 0.15
+
+
+def test_throttling_halves_the_rate_and_success_recovers_it() -> None:
+    limiter = AdaptiveRateLimiter("test", rate=10)
+
+    limiter.record_throttle()
+    limiter.record_throttle()
+    assert limiter.rate == 5
+    assert limiter.throttled == 2
+
+    for _ in range(100):
+        limiter.record_success()
+    assert limiter.rate == 10
+
+
+def test_call_with_retries_retries_throttled_calls(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(rate_limit, "BASE_BACKOFF", 0)
+    limiter = AdaptiveRateLimiter("test", rate=0)
+    attempts = []
+
+    async def call(value: str) -> str:
+        attempts.append(value)
+        if len(attempts) < 3:
+            raise ThrottledError("Too Many Requests")
+        return value
+
+    assert asyncio.run(rate_limit.call_with_retries(limiter, call, "ok")) == "ok"
+    assert len(attempts) == 3
+    assert limiter.stats()["retries"] == 2
+
+
+def test_call_with_retries_raises_non_retryable_errors() -> None:
+    limiter = AdaptiveRateLimiter("test", rate=0)
+    attempts = []
+
+    def call() -> None:
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        rate_limit.call_with_retries_sync(limiter, call)
+    assert len(attempts) == 1
@@ -0,0 +1,146 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+
+import pytest
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+from pydantic import Field
+
+from app.utils.scheduler import Stage, StageSchedulerAgent
+
+TIMELINE: dict[str, tuple[float, float]] = {}
+
+
+class SleepAgent(BaseAgent):
+    """Sleeps, then writes its output keys to the state."""
+
+    delay: float = 0.0
+    writes: list[str] = Field(default_factory=list)
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        start = time.monotonic()
+        await asyncio.sleep(self.delay)
+        TIMELINE[self.name] = (start, time.monotonic())
+        yield Event(
+            author=self.name,
+            branch=ctx.branch,
+            invocation_id=ctx.invocation_id,
+            actions=EventActions(state_delta=dict.fromkeys(self.writes, self.name)),
+        )
+
+
+def run(agent: BaseAgent, turns: int = 1) -> dict:
+    runner = InMemoryRunner(agent=agent, app_name="test")
+    session = runner.session_service.create_session_sync(
+        app_name="test", user_id="user"
+    )
+    message = types.Content(role="user", parts=[types.Part.from_text(text="go")])
+    for _ in range(turns):
+        list(runner.run(user_id="user", session_id=session.id, new_message=message))
+    return runner.session_service.get_session_sync(
+        app_name="test", user_id="user", session_id=session.id
+    ).state
+
+
+def test_independent_stages_overlap() -> None:
+    TIMELINE.clear()
+    agent = StageSchedulerAgent(
+        name="pipeline",
+        stages=[
+            Stage(
+                agent=SleepAgent(name="search", delay=0.05, writes=["a", "b"]),
+                outputs=["a", "b"],
+            ),
+            Stage(
+                agent=SleepAgent(name="left", delay=0.2, writes=["c"]),
+                inputs=["a"],
+                outputs=["c"],
+            ),
+            Stage(
+                agent=SleepAgent(name="right", delay=0.2, writes=["d"]),
+                inputs=["b"],
+                outputs=["d"],
+            ),
+            Stage(
+                agent=SleepAgent(name="join", writes=["e"]),
+                inputs=["c", "d"],
+                outputs=["e"],
+            ),
+        ],
+    )
+    state = run(agent)
+
+    assert state == {
+        "a": "search",
+        "b": "search",
+        "c": "left",
+        "d": "right",
+        "e": "join",
+    }
+    assert TIMELINE["left"][0] >= TIMELINE["search"][1]
+    assert TIMELINE["right"][0] < TIMELINE["left"][1]
+    assert TIMELINE["join"][0] >= max(TIMELINE["left"][1], TIMELINE["right"][1])
+    # Critical path (0.05 + 0.2), not the sum of the stages (0.45).
+    assert TIMELINE["join"][1] - TIMELINE["search"][0] < 0.4
+
+
+def test_later_turns_wait_for_fresh_inputs() -> None:
+    TIMELINE.clear()
+    agent = StageSchedulerAgent(
+        name="pipeline",
+        stages=[
+            Stage(
+                agent=SleepAgent(name="search", delay=0.1, writes=["a"]),
+                outputs=["a"],
+            ),
+            Stage(
+                agent=SleepAgent(name="analysis", writes=["b"]),
+                inputs=["a"],
+                outputs=["b"],
+            ),
+        ],
+    )
+
+    # The second turn finds "a" and "b" in the session state from the first.
+    run(agent, turns=2)
+
+    assert TIMELINE["analysis"][0] >= TIMELINE["search"][1]
+
+
+def test_unknown_inputs_are_rejected() -> None:
+    with pytest.raises(ValueError, match="which no stage produces"):
+        StageSchedulerAgent(
+            name="pipeline",
+            stages=[Stage(agent=SleepAgent(name="orphan"), inputs=["missing"])],
+        )
+
+
+def test_root_agent_wires_every_stage() -> None:
+    from app.agent import root_agent
+
+    assert [stage.agent.name for stage in root_agent.stages] == [
+        "search_agent",
+        "gso_analyzer",
+        "company_info_agent",
+        "gso_improver",
+    ]
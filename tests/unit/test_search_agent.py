@@ -0,0 +1,169 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+from typing import Any, ClassVar
+
+import pytest
+
+from app.sub_agents.search_agent import agent as search_module
+from app.utils import rate_limit
+from app.utils.cache import PersistentCache
+from app.utils.domains import registrable_domain
+
+
+class FakeGoogleSearch:
+    """Serves `total` synthetic organic results, page by page."""
+
+    total = 35
+    calls: ClassVar[list[int]] = []
+
+    def __init__(self, params: dict[str, Any]) -> None:
+        self.params = params
+
+    def get_dict(self) -> dict[str, Any]:
+        start = self.params["start"]
+        FakeGoogleSearch.calls.append(start)
+        if start >= self.total:
+            return {"error": "Google hasn't returned any results for this query."}
+        end = min(start + self.params["num"], self.total)
+        return {
+            "organic_results": [
+                {"position": i + 1, "title": f"r{i}", "link": f"https://site{i}.com/"}
+                for i in range(start, end)
+            ]
+        }
+
+
+@pytest.fixture(autouse=True)
+def fake_serpapi(monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> None:
+    FakeGoogleSearch.calls = []
+    monkeypatch.setattr(search_module, "GoogleSearch", FakeGoogleSearch)
+    monkeypatch.setattr(
+        search_module,
+        "serp_cache",
+        PersistentCache("serp", ttl_seconds=60, path=str(tmp_path / "cache.db")),
+    )
+
+
+def test_fetch_serp_results_merges_all_pages_in_order() -> None:
+    results = search_module.fetch_serp_results(
+        "shoes", api_key="k", max_results=100, max_concurrency=4
+    )
+    assert [r["position"] for r in results] == list(range(1, 36))
+    assert len({r["link"] for r in results}) == 35
+
+
+def test_fetch_serp_results_dedupes_by_position_and_link(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def duplicated_page(*args: Any) -> list[dict]:
+        return [
+            {"position": 1, "link": "https://a.com/"},
+            {"position": 1, "link": "https://b.com/"},
+            {"position": 2, "link": "https://a.com/"},
+        ]
+
+    monkeypatch.setattr(search_module, "_fetch_serp_page", duplicated_page)
+    results = search_module.fetch_serp_results("shoes", api_key="k", max_results=20)
+    assert results == [{"position": 1, "link": "https://a.com/"}]
+
+
+def test_fetch_serp_results_raises_on_first_page_error(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(FakeGoogleSearch, "total", 0)
+    with pytest.raises(Exception, match="SerpAPI error"):
+        search_module.fetch_serp_results("shoes", api_key="k")
+
+
+def test_fetch_serp_results_serves_repeat_queries_from_cache() -> None:
+    first = search_module.fetch_serp_results(
+        "Running  Shoes", api_key="k", max_results=40
+    )
+    assert len(FakeGoogleSearch.calls) == 4
+    second = search_module.fetch_serp_results(
+        "running shoes", api_key="k", max_results=40
+    )
+    assert second == first
+    assert len(FakeGoogleSearch.calls) == 4
+    assert search_module.serp_cache.hits == 4
+
+
+def test_group_by_domain_keeps_best_ranked_result_per_domain() -> None:
+    results = [
+        {"position": 11, "link": "https://www.brand.fr/p/1"},
+        {"position": 12, "link": "https://other.co.uk/"},
+        {"position": 13, "link": "https://blog.brand.fr/post"},
+        {"position": 14, "link": "https://shop.other.co.uk/x"},
+        {"position": 15, "link": "https://third.com/"},
+    ]
+    grouped = search_module.group_by_domain(results)
+    assert [g["position"] for g in grouped] == [11, 12, 15]
+    assert grouped[0]["domain"] == "brand.fr"
+    assert grouped[0]["member_urls"] == [
+        "https://www.brand.fr/p/1",
+        "https://blog.brand.fr/post",
+    ]
+    assert grouped[1]["member_urls"] == [
+        "https://other.co.uk/",
+        "https://shop.other.co.uk/x",
+    ]
+
+
+@pytest.mark.parametrize(
+    ("url", "domain"),
+    [
+        ("https://shop.example.co.uk/p/1", "example.co.uk"),
+        ("https://shop.example.com.fr/", "example.com.fr"),
+        ("https://a.myshopify.com/products/x", "a.myshopify.com"),
+        ("https://b.myshopify.com/", "b.myshopify.com"),
+        ("https://user.github.io/blog/", "user.github.io"),
+        ("https://brand.wixsite.com/store", "brand.wixsite.com"),
+        ("http://127.0.0.1:8080/", "127.0.0.1"),
+        ("http://localhost/", "localhost"),
+    ],
+)
+def test_registrable_domain_uses_the_public_suffix_list(url: str, domain: str) -> None:
+    assert registrable_domain(url) == domain
+
+
+def test_search_google_groups_other_results(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SERPAPI_KEY", "k")
+    monkeypatch.setattr(FakeGoogleSearch, "total", 30)
+    tool_context = SimpleNamespace(state={})
+    results = search_module.search_google("shoes", tool_context)
+    assert len(results) == 30
+    assert len(tool_context.state["top_10_results"]) == 10
+    assert len(tool_context.state["other_results"]) == 20
+    assert tool_context.state["other_results"][0]["member_urls"] == [
+        "https://site10.com/"
+    ]
+
+
+def test_throttled_searches_are_retried(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(rate_limit, "BASE_BACKOFF", 0)
+    throttled = []
+
+    def get_dict(self: FakeGoogleSearch) -> dict[str, Any]:
+        if not throttled:
+            throttled.append(self.params["start"])
+            return {"error": "Your account has exceeded the hourly throughput limit."}
+        return {"organic_results": [{"position": 1, "link": "https://a.com/"}]}
+
+    monkeypatch.setattr(FakeGoogleSearch, "get_dict", get_dict)
+    results = search_module.fetch_serp_results("shoes", api_key="k", max_results=10)
+
+    assert [r["link"] for r in results] == ["https://a.com/"]
+    assert throttled == [0]
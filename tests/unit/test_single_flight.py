@@ -0,0 +1,113 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_threads_share_one_call() -> None:
+    flight = SingleFlight("test")
+    calls = []
+
+    def compute(key: str) -> str:
+        calls.append(key)
+        time.sleep(0.2)
+        return key.upper()
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(lambda _: flight.do("q", compute, "q"), range(5)))
+
+    assert results == ["Q"] * 5
+    assert calls == ["q"]
+    assert flight.stats() == {"calls": 5, "coalesced": 4, "in_flight": 0}
+    # Once released, the key is computed again.
+    assert flight.do("q", compute, "q") == "Q"
+    assert len(calls) == 2
+
+
+def test_callers_from_another_event_loop_join_the_call() -> None:
+    flight = SingleFlight("test")
+    started = threading.Event()
+    calls = []
+
+    async def compute() -> int:
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.2)
+        return 42
+
+    def other_loop() -> int:
+        started.wait()
+        return asyncio.run(flight.ado("url", compute))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        joined = executor.submit(other_loop)
+        assert asyncio.run(flight.ado("url", compute)) == 42
+        assert joined.result() == 42
+    assert calls == [1]
+
+
+def test_waiters_receive_the_error_and_cancelling_one_spares_the_others() -> None:
+    flight = SingleFlight("test")
+
+    async def fail() -> None:
+        await asyncio.sleep(0.1)
+        raise ValueError("boom")
+
+    async def run() -> list:
+        leader = asyncio.ensure_future(flight.ado("k", fail))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(flight.ado("k", fail))
+        waiter = asyncio.ensure_future(flight.ado("k", fail))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await asyncio.gather(leader, cancelled, waiter, return_exceptions=True)
+
+    leader, cancelled, waiter = asyncio.run(run())
+    assert isinstance(leader, ValueError)
+    assert isinstance(cancelled, asyncio.CancelledError)
+    assert isinstance(waiter, ValueError)
+
+
+def test_identical_searches_share_one_fetch(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.sub_agents.search_agent import agent as search_module
+
+    fetches = []
+
+    def fetch(query: str, api_key: str) -> list[dict]:
+        fetches.append(query)
+        time.sleep(0.2)
+        return [{"position": i, "link": f"https://s{i}.com/"} for i in range(1, 15)]
+
+    monkeypatch.setenv("SERPAPI_KEY", "k")
+    monkeypatch.setattr(search_module, "fetch_serp_results", fetch)
+
+    def search(query: str) -> dict:
+        tool_context = type("ToolContext", (), {"state": {}})()
+        search_module.search_google(query, tool_context)
+        return tool_context.state
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        states = list(
+            executor.map(search, ["Running Shoes", "running  shoes", "RUNNING shoes"])
+        )
+
+    assert len(fetches) == 1
+    assert all(len(state["top_10_results"]) == 10 for state in states)
@@ -0,0 +1,166 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections.abc import Iterator
+from types import SimpleNamespace
+from typing import Any
+from unittest import mock
+
+import pytest
+from google.genai.types import GenerateContentResponse
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+
+from app.utils import genai_clients, rate_limit, telemetry
+from app.utils.tracing import CloudLoggingMetricExporter
+
+
+@pytest.fixture
+def recorded(
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[tuple[InMemorySpanExporter, InMemoryMetricReader]]:
+    spans = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(spans))
+    reader = InMemoryMetricReader()
+    meter = MeterProvider(metric_readers=[reader]).get_meter("test")
+    monkeypatch.setattr(telemetry, "tracer", tracer_provider.get_tracer("test"))
+    for name, metric in (
+        ("call_duration", "seo_agent.call.duration"),
+        ("rate_limit_wait", "seo_agent.rate_limit.wait"),
+    ):
+        monkeypatch.setattr(telemetry, name, meter.create_histogram(metric))
+    for name, metric in (
+        ("call_count", "seo_agent.calls"),
+        ("retry_count", "seo_agent.retries"),
+        ("token_count", "seo_agent.tokens"),
+    ):
+        monkeypatch.setattr(telemetry, name, meter.create_counter(metric))
+    yield spans, reader
+
+
+def _points(reader: InMemoryMetricReader, name: str) -> list[Any]:
+    data = reader.get_metrics_data()
+    return [
+        point
+        for resource_metrics in data.resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+        if metric.name == name
+        for point in metric.data.data_points
+    ]
+
+
+def test_traced_call_records_span_and_metrics(recorded: Any) -> None:
+    spans, reader = recorded
+
+    with telemetry.traced_call("fetch", "page", url="https://a.com/") as span:
+        span.set_attribute("cache_hit", True)
+    with pytest.raises(ValueError):
+        with telemetry.traced_call("fetch", "page", url="https://b.com/"):
+            raise ValueError("boom")
+
+    first, second = spans.get_finished_spans()
+    assert first.name == "fetch page"
+    assert first.attributes["url"] == "https://a.com/"
+    assert second.status.is_ok is False
+    counts = {
+        (point.attributes["error"], point.attributes["cache_hit"]): point.value
+        for point in _points(reader, "seo_agent.calls")
+    }
+    assert counts == {(False, True): 1, (True, False): 1}
+    assert sum(point.count for point in _points(reader, "seo_agent.call.duration")) == 2
+
+
+def test_model_call_span_has_model_tokens_and_retries(
+    recorded: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    spans, reader = recorded
+    monkeypatch.setattr(rate_limit, "BASE_BACKOFF", 0)
+    attempts = []
+
+    async def generate_content(**kwargs: Any) -> GenerateContentResponse:
+        attempts.append(kwargs)
+        if len(attempts) == 1:
+            raise Exception("429 RESOURCE_EXHAUSTED")
+        return GenerateContentResponse.model_validate(
+            {
+                "candidates": [{"content": {"parts": [{"text": "ok"}]}}],
+                "usage_metadata": {
+                    "prompt_token_count": 12,
+                    "candidates_token_count": 3,
+                },
+            }
+        )
+
+    fake_client = SimpleNamespace(
+        aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    )
+    monkeypatch.setattr(genai_clients, "_client", fake_client)
+
+    asyncio.run(genai_clients.agenerate_content("gso_analyzer", "hello"))
+
+    (span,) = spans.get_finished_spans()
+    assert span.name == "gemini gso_analyzer"
+    assert span.attributes["model"] == genai_clients.stage_model("gso_analyzer")
+    assert span.attributes["retry_count"] == 1
+    assert span.attributes["gen_ai.usage.input_tokens"] == 12
+    assert span.attributes["gen_ai.usage.output_tokens"] == 3
+    tokens = {
+        point.attributes["direction"]: point.value
+        for point in _points(reader, "seo_agent.tokens")
+    }
+    assert tokens == {"input": 12, "output": 3}
+    assert [point.value for point in _points(reader, "seo_agent.retries")] == [1]
+
+
+def test_rate_limiter_records_queue_wait(recorded: Any) -> None:
+    _, reader = recorded
+    limiter = rate_limit.AdaptiveRateLimiter("serpapi", rate=100, burst=1)
+
+    async def run() -> None:
+        for _ in range(3):
+            await limiter.acquire()
+
+    asyncio.run(run())
+
+    (point,) = _points(reader, "seo_agent.rate_limit.wait")
+    assert point.attributes == {"limiter": "serpapi"}
+    assert point.count == 3
+    # The burst of 1 lets the first call through, the others wait ~10 ms each.
+    assert point.min == 0
+    assert point.max > 0
+
+
+def test_metric_exporter_logs_data_points(recorded: Any) -> None:
+    _, reader = recorded
+    with telemetry.traced_call("tool", "search_google"):
+        pass
+    logger = mock.Mock()
+
+    CloudLoggingMetricExporter(logger).export(reader.get_metrics_data())
+
+    (call,) = logger.log_struct.call_args_list
+    entry = call.args[0]
+    assert call.kwargs["labels"]["type"] == "agent_metrics"
+    by_metric = {point["metric"]: point for point in entry["metrics"]}
+    assert by_metric["seo_agent.calls"]["value"] == 1
+    assert by_metric["seo_agent.call.duration"]["count"] == 1
+    assert by_metric["seo_agent.calls"]["attributes"]["name"] == "search_google"
@@ -0,0 +1,112 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+from google.adk.agents import LlmAgent
+from google.adk.runners import InMemoryRunner
+from google.adk.sessions import Session
+from google.adk.tools import ToolContext
+from google.genai import types
+
+from app.utils.streaming import emit_partial_result
+from app.utils.tool_runner import ToolRunnerAgent, build_stage_agent
+
+
+def search(query: str, tool_context: ToolContext) -> list[dict]:
+    results = [{"link": f"https://{word}.com/"} for word in query.split()]
+    tool_context.state["results"] = results
+    return results
+
+
+async def summarize(results: list[dict], tool_context: ToolContext) -> str:
+    return f"{len(results)} results"
+
+
+async def enrich(results: list[dict], tool_context: ToolContext) -> list[dict]:
+    async def one(result: dict) -> dict:
+        await asyncio.sleep(0.01 * len(result["link"]))
+        enriched = {**result, "done": True}
+        emit_partial_result("item", enriched)
+        return enriched
+
+    def from_thread() -> None:
+        emit_partial_result("thread_item", {"ok": True})
+
+    await asyncio.to_thread(from_thread)
+    enriched = list(await asyncio.gather(*(one(r) for r in results)))
+    tool_context.state["enriched"] = enriched
+    return enriched
+
+
+def run(agent: ToolRunnerAgent, text: str) -> tuple[list, Session]:
+    runner = InMemoryRunner(agent=agent, app_name="test")
+    session = runner.session_service.create_session_sync(
+        app_name="test", user_id="user"
+    )
+    message = types.Content(role="user", parts=[types.Part.from_text(text=text)])
+    events = list(
+        runner.run(user_id="user", session_id=session.id, new_message=message)
+    )
+    session = runner.session_service.get_session_sync(
+        app_name="test", user_id="user", session_id=session.id
+    )
+    return events, session
+
+
+def test_tool_runner_calls_tools_without_a_model() -> None:
+    agent = ToolRunnerAgent(
+        name="stage", tools=[search, summarize], output_key="summary"
+    )
+    events, session = run(agent, "a b c")
+    state = session.state
+
+    assert [event.content.parts[0].text for event in events] == [
+        '[{"link": "https://a.com/"}, {"link": "https://b.com/"}, {"link": "https://c.com/"}]',
+        "3 results",
+    ]
+    assert len(state["results"]) == 3
+    assert state["summary"] == "3 results"
+
+
+def test_tool_runner_streams_partial_results_before_the_final_event() -> None:
+    agent = ToolRunnerAgent(name="stage", tools=[search, enrich])
+    events, session = run(agent, "a bbbbbbbbbb c")
+    state = session.state
+
+    kinds = [(event.custom_metadata or {}).get("partial_result") for event in events]
+    assert kinds == [None, "thread_item", "item", "item", "item", None]
+    assert [bool(event.partial) for event in events] == [False] + [True] * 4 + [False]
+    # Only the user message and the final events of the tools are stored.
+    assert [event.partial for event in session.events] == [None] * 3
+    # Items arrive in completion order; the aggregated state keeps input order.
+    assert events[-2].content.parts[0].text == (
+        '{"link": "https://bbbbbbbbbb.com/", "done": true}'
+    )
+    assert [r["link"] for r in state["enriched"]] == [
+        "https://a.com/",
+        "https://bbbbbbbbbb.com/",
+        "https://c.com/",
+    ]
+
+
+def test_build_stage_agent_modes(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert isinstance(
+        build_stage_agent("stage", [search], "call search"), ToolRunnerAgent
+    )
+    monkeypatch.setenv("AGENT_MODE", "llm")
+    agent = build_stage_agent("stage", [search], "call search", output_key="out")
+    assert isinstance(agent, LlmAgent)
+    assert agent.output_key == "out"
@@ -0,0 +1,220 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+import threading
+from typing import Any
+from unittest import mock
+
+from opentelemetry.sdk.trace import TracerProvider
+
+from app.utils.tracing import (
+    BatchedLogWriter,
+    CloudTraceLoggingSpanExporter,
+    FlushingBatchSpanProcessor,
+)
+
+
+class FakeLogger:
+    """Records the entries of each bulk write."""
+
+    def __init__(self) -> None:
+        self.writes: list[list[dict]] = []
+        self.lock = threading.Lock()
+
+    def batch(self) -> Any:
+        logger = self
+        entries: list[dict] = []
+
+        class Batch:
+            def log_struct(self, info: dict, **kwargs: Any) -> None:
+                entries.append(info)
+
+            def commit(self) -> None:
+                with logger.lock:
+                    logger.writes.append(entries)
+
+        return Batch()
+
+
+def test_writer_sends_full_batches_in_bulk() -> None:
+    logger = FakeLogger()
+    writer = BatchedLogWriter(logger, batch_size=3, flush_interval=60)
+
+    for i in range(7):
+        writer.log_struct({"i": i})
+    writer.flush()
+
+    assert sorted(len(entries) for entries in logger.writes) == [1, 3, 3]
+    assert sorted(e["i"] for entries in logger.writes for e in entries) == list(
+        range(7)
+    )
+    assert writer.stats()["written"] == 7
+    writer.close()
+
+
+def test_writer_flushes_after_the_interval() -> None:
+    logger = FakeLogger()
+    writer = BatchedLogWriter(logger, batch_size=100, flush_interval=0.05)
+
+    writer.log_struct({"i": 0})
+    with writer._cond:
+        assert writer._cond.wait_for(lambda: writer._counts["writes"] == 1, 5)
+
+    assert logger.writes == [[{"i": 0}]]
+    writer.close()
+
+
+def test_writer_splits_batches_by_size() -> None:
+    logger = FakeLogger()
+    writer = BatchedLogWriter(
+        logger, batch_size=100, max_batch_bytes=1000, flush_interval=60
+    )
+
+    for i in range(4):
+        writer.log_struct({"i": i}, size=400)
+    writer.flush()
+
+    assert [len(entries) for entries in logger.writes] == [2, 2]
+    writer.close()
+
+
+def test_writer_drops_entries_when_the_buffer_is_full() -> None:
+    logger = FakeLogger()
+    writer = BatchedLogWriter(logger, batch_size=100, flush_interval=60, max_buffered=2)
+
+    accepted = [writer.log_struct({"i": i}) for i in range(3)]
+
+    assert accepted == [True, True, False]
+    assert writer.stats()["dropped"] == 1
+    writer.close()
+    assert writer.stats() == {
+        "written": 2,
+        "dropped": 1,
+        "failed": 0,
+        "writes": 1,
+        "buffered": 0,
+    }
+
+
+def test_writer_counts_failed_writes() -> None:
+    logger = mock.Mock()
+    logger.batch.return_value.commit.side_effect = RuntimeError("unavailable")
+    writer = BatchedLogWriter(logger, batch_size=100, flush_interval=60)
+
+    writer.log_struct({"i": 0})
+    writer.close()
+
+    assert writer.stats()["failed"] == 1
+
+
+def _exporter(logger: Any, bucket: Any | None = None) -> CloudTraceLoggingSpanExporter:
+    logging_client = mock.Mock()
+    logging_client.logger.return_value = logger
+    storage_client = mock.Mock()
+    storage_client.bucket.return_value = bucket or mock.Mock()
+    return CloudTraceLoggingSpanExporter(
+        project_id="test-project",
+        client=mock.Mock(),
+        logging_client=logging_client,
+        storage_client=storage_client,
+    )
+
+
+def test_provider_force_flush_writes_buffered_spans() -> None:
+    logger = FakeLogger()
+    exporter = _exporter(logger)
+    exporter.log_writer.flush_interval = 60
+    provider = TracerProvider()
+    provider.add_span_processor(
+        FlushingBatchSpanProcessor(exporter, schedule_delay_millis=60000)
+    )
+    tracer = provider.get_tracer("test")
+    for name in ("a", "b"):
+        with tracer.start_as_current_span(name):
+            pass
+
+    assert logger.writes == []
+    assert provider.force_flush()
+
+    (entries,) = logger.writes
+    assert [entry["name"] for entry in entries] == ["a", "b"]
+    assert entries[0]["trace"].startswith("projects/test-project/traces/")
+    assert exporter.log_writer.stats()["buffered"] == 0
+    provider.shutdown()
+
+
+def _span_dict(**attributes: Any) -> dict:
+    return {"name": "span", "attributes": attributes}
+
+
+def test_small_spans_are_not_offloaded() -> None:
+    bucket = mock.Mock()
+    exporter = _exporter(FakeLogger(), bucket)
+    span_dict = _span_dict(model="gemini", prompt="x" * 1000)
+
+    result = exporter._process_large_attributes(span_dict, "abc", span_size=2000)
+
+    assert result["attributes"] == span_dict["attributes"]
+    bucket.exists.assert_not_called()
+    exporter.shutdown()
+
+
+def test_only_the_largest_attributes_are_offloaded_gzipped() -> None:
+    bucket = mock.Mock()
+    bucket.exists.return_value = True
+    exporter = _exporter(FakeLogger(), bucket)
+    big = "y" * (300 * 1024)
+    span_dicts = [
+        _span_dict(model="gemini", prompt=big, response="ok") for _ in range(2)
+    ]
+
+    results = [
+        exporter._process_large_attributes(span_dict, f"span{i}")
+        for i, span_dict in enumerate(span_dicts)
+    ]
+    assert exporter.force_flush()
+
+    attributes = results[0]["attributes"]
+    assert attributes["model"] == "gemini"
+    assert attributes["response"] == "ok"
+    assert "prompt" not in attributes
+    assert attributes["offloaded_attributes"] == ["prompt"]
+    assert (
+        attributes["uri_payload"]
+        == "gs://test-project-seo-agent-logs-data/spans/span0.json"
+    )
+    bucket.exists.assert_called_once()
+    blob = bucket.blob.return_value
+    assert blob.content_encoding == "gzip"
+    payload = blob.upload_from_string.call_args.args[0]
+    assert json.loads(gzip.decompress(payload)) == {"prompt": big}
+    assert len(payload) < 10 * 1024
+    exporter.shutdown()
+
+
+def test_offloaded_attributes_are_dropped_without_a_bucket() -> None:
+    bucket = mock.Mock()
+    bucket.exists.return_value = False
+    exporter = _exporter(FakeLogger(), bucket)
+
+    result = exporter._process_large_attributes(
+        _span_dict(prompt="y" * (300 * 1024)), "abc"
+    )
+
+    assert result["attributes"]["uri_payload"] == "GCS bucket not found"
+    assert "prompt" not in result["attributes"]
+    bucket.blob.assert_not_called()
+    exporter.shutdown()